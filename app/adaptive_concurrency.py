@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Control adaptativo (AIMD) del número de peticiones Aura simultáneas.
+Sube la concurrencia de a uno mientras las respuestas son 200 y la latencia p95 se mantiene estable,
+y la reduce a la mitad ante un 429/503, un error de conexión o una subida de la p95.
+"""
+
+import math
+import os
+import threading
+
+
+# Respuestas que indican que el servidor está limitando las peticiones
+THROTTLE_STATUSES = (429, 503)
+
+
+def percentile(values, fraction):
+    """Percentil (0-1) de una lista de valores por el método nearest-rank."""
+    ordered = sorted(values)
+    rank = math.ceil(fraction * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class AIMDController:
+    """
+    Límite de concurrencia additive-increase / multiplicative-decrease.
+
+    Cada `window` respuestas 200 se calcula la p95 de latencia de la ventana:
+    - Si no supera baseline * latency_tolerance, el límite sube en 1 (hasta maximum)
+    - Si la supera, el límite se multiplica por decrease_factor (hasta minimum)
+    Un 429/503 o una excepción reducen el límite de inmediato; las respuestas de las peticiones
+    que ya estaban en vuelo con el límite anterior no vuelven a reducirlo.
+
+    Es thread-safe; los clientes (AuraClient / AsyncAuraClient) consultan `limit` antes de cada petición.
+    """
+
+    def __init__(self, initial=None, minimum=None, maximum=None, window=None,
+                 decrease_factor=0.5, latency_tolerance=1.5):
+        """
+        Args:
+            initial: Límite inicial (default: AURA_CONCURRENCY_INITIAL o 10)
+            minimum: Límite mínimo (default: AURA_CONCURRENCY_MIN o 2)
+            maximum: Límite máximo (default: AURA_CONCURRENCY_MAX o 32)
+            window: Respuestas por ventana de latencia (default: AURA_CONCURRENCY_WINDOW o 20)
+            decrease_factor: Factor aplicado al límite al retroceder
+            latency_tolerance: Subida de la p95 (respecto a la base) que se considera congestión
+        """
+        if initial is None:
+            initial = int(os.getenv('AURA_CONCURRENCY_INITIAL', '10'))
+        if minimum is None:
+            minimum = int(os.getenv('AURA_CONCURRENCY_MIN', '2'))
+        if maximum is None:
+            maximum = int(os.getenv('AURA_CONCURRENCY_MAX', '32'))
+        if window is None:
+            window = int(os.getenv('AURA_CONCURRENCY_WINDOW', '20'))
+
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.window = max(1, window)
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.baseline_p95 = None
+        self.last_p95 = None
+        self.peak = self.limit
+        self.throttled = 0
+        self.decreases = 0
+
+        self._lock = threading.Lock()
+        self._latencies = []
+        self._responses_since_decrease = 0
+        self._in_flight_at_decrease = 0
+
+    def record(self, status, latency):
+        """
+        Registra el resultado de una petición.
+
+        Args:
+            status: Código HTTP de la respuesta, o None si la petición lanzó una excepción
+            latency: Segundos que tardó la petición
+        """
+        with self._lock:
+            self._responses_since_decrease += 1
+
+            if status is None or status in THROTTLE_STATUSES:
+                self.throttled += 1
+                self._decrease()
+                return
+            if status != 200:
+                return
+
+            self._latencies.append(latency)
+            if len(self._latencies) < self.window:
+                return
+
+            p95 = percentile(self._latencies, 0.95)
+            self._latencies = []
+            self.last_p95 = p95
+
+            if self.baseline_p95 is not None and p95 > self.baseline_p95 * self.latency_tolerance:
+                self._decrease()
+                return
+
+            # Base con media móvil: se adapta a los cambios de carga del servidor a lo largo del día
+            self.baseline_p95 = p95 if self.baseline_p95 is None else 0.8 * self.baseline_p95 + 0.2 * p95
+            self.limit = min(self.maximum, self.limit + 1)
+            self.peak = max(self.peak, self.limit)
+
+    def _decrease(self):
+        # Las respuestas de las peticiones que seguían en vuelo en el último retroceso no cuentan otra vez
+        if self._responses_since_decrease <= self._in_flight_at_decrease:
+            return
+        self._in_flight_at_decrease = self.limit - 1
+        self.limit = max(self.minimum, int(self.limit * self.decrease_factor))
+        self.decreases += 1
+        self._latencies = []
+        self._responses_since_decrease = 0
+
+    def report(self):
+        """Estado del controlador para el status de la generación."""
+        with self._lock:
+            return {
+                'adaptive': True,
+                'limit': self.limit,
+                'peak': self.peak,
+                'min': self.minimum,
+                'max': self.maximum,
+                'p95_ms': round(self.last_p95 * 1000) if self.last_p95 is not None else None,
+                'throttled': self.throttled,
+                'decreases': self.decreases,
+            }
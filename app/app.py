@@ -8,7 +8,8 @@ import os
 import sys
 import json
 import re
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for
+import mimetypes
+from flask import Flask, Response, render_template, request, jsonify, send_file, redirect, url_for
 from flask_cors import CORS
 from pathlib import Path
 from dotenv import load_dotenv, set_key
@@ -28,6 +29,9 @@ sys.path.insert(0, scripts_dir)  # For scripts
 from generate_invoice import main as generate_invoice_main
 from update_credentials import update_credentials, update_ingenico_credentials
 from fetch_ingenico_closed_jobs import search_closed_jobs
+from run_catalog import INGENICO_CLOSED_JOBS, RUN_FOLDERS, VERIFONE_INVOICE, RunCatalog, run_file_name
+from run_compaction import ARCHIVE_FOLDER, read_run_file
+from charge_engine import INGENICO, VERIFONE, charge_rows
 from urllib.parse import unquote
 
 # Load environment variables from parent directory
@@ -240,7 +244,17 @@ def generate_invoice():
         'date_from': data.get('date_from'),
         'date_to': data.get('date_to'),
         'search_string': data.get('search_string', ''),
-        'record_limit': data.get('record_limit', 200)
+        'record_limit': data.get('record_limit', 200),
+        'engine': data.get('engine'),  # 'threads' (default) o 'asyncio'
+        'max_in_flight': data.get('max_in_flight'),
+        'detail_batch_size': data.get('detail_batch_size'),  # Work orders por POST getRecord
+        'pii_workers': data.get('pii_workers'),  # Workers de la etapa PII
+        'pii_queue_size': data.get('pii_queue_size'),  # Cola entre la etapa de detalle y la PII
+        'use_cache': data.get('use_cache'),  # False = ignorar el cache local de work orders
+        'adaptive_concurrency': data.get('adaptive_concurrency'),  # True = AIMD (default: AURA_ADAPTIVE_CONCURRENCY=0, fija)
+        'raw_capture': data.get('raw_capture'),  # 'off', 'errors', 'sampled' o 'full' (respuestas raw archivadas)
+        'raw_sample_every': data.get('raw_sample_every'),  # N del modo sampled (1 de cada N work orders)
+        'postprocess': data.get('postprocess')  # 'auto' (default), 'scalar' o 'columnar'
     }
 
     # Reset status
@@ -251,7 +265,9 @@ def generate_invoice():
         'message': 'Starting invoice generation...',
         'result_file': None,
         'errors': [],
-        'filters': filters
+        'filters': filters,
+        'concurrency': None,
+        'cache': None
     }
 
     # Run generation in a separate thread with filters
@@ -277,29 +293,70 @@ def viewer():
 @app.route('/api/get-latest-invoice')
 def get_latest_invoice():
     """Get the path to the latest generated invoice"""
-    verifone_folder = Path(__file__).parent.parent / 'VerifoneWorkOrders'
+    # Latest run with an HTML file, from the run catalog
+    with RunCatalog() as catalog:
+        latest = catalog.latest(VERIFONE_INVOICE)
 
-    if not verifone_folder.exists():
+    if latest is None:
         return jsonify({'error': 'No invoices found'}), 404
 
-    # Find the latest folder
-    invoice_folders = sorted(verifone_folder.glob('invoice_*'), reverse=True)
+    return jsonify({
+        'success': True,
+        'folder': latest['folder'],
+        'file': latest['html_file'],
+        'url': run_file_url(VERIFONE_INVOICE, latest, 'html_file')
+    })
 
-    if not invoice_folders:
-        return jsonify({'error': 'No invoices found'}), 404
 
-    # Find the HTML file in the latest folder
-    latest_folder = invoice_folders[0]
-    html_files = list(latest_folder.glob('*.html'))
+def run_file_url(kind, run, field):
+    """URL de /api/runs/... para run[field] (html_file / json_file) de una ejecución del catálogo, o None."""
+    name = run_file_name(run, field)
+    if name is None:
+        return None
+    return url_for('get_run_file', kind=kind, folder=Path(run['folder']).name, name=name)
 
-    if not html_files:
-        return jsonify({'error': 'No HTML file found in latest invoice folder'}), 404
 
-    return jsonify({
-        'success': True,
-        'folder': str(latest_folder),
-        'file': str(html_files[0])
-    })
+@app.route('/api/runs/<kind>/<folder>/<path:name>')
+def get_run_file(kind, folder, name):
+    """
+    Archivo (HTML / JSON) de una ejecución del catálogo. Las ejecuciones compactadas por
+    run_compaction.py ya no tienen carpeta: el archivo se lee del archivo mensual.
+    """
+    base_folder = RUN_FOLDERS.get(kind)
+    if base_folder is None or folder in ('.', '..', ARCHIVE_FOLDER):
+        return jsonify({'success': False, 'error': 'File not found'}), 404
+
+    content = read_run_file(Path(base_folder) / folder, name)
+    if content is None:
+        return jsonify({'success': False, 'error': 'File not found'}), 404
+    return Response(content, mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+
+
+@app.route('/api/calculate-charges', methods=['POST'])
+def calculate_charges():
+    """
+    Area y Charge (charge_engine.py) de trabajos cargados en el viewer que no los traen calculados:
+    invoices generados antes del motor de cobro y HTML del Closed Job List de Ingenico.
+
+    Expected JSON:
+    {
+        "company": "verifone" | "ingenico",
+        "jobs": [{"job_type", "device_type", "postcode", "suburb", "weekend", "after_hour",
+                  "multiple_job_id", "billable", "fix"}, ...]
+    }
+
+    Returns:
+    {"success": true, "charges": [{"area": "1", "charge": 28.0}, ...]}  (mismo orden que jobs)
+    """
+    data = request.get_json(silent=True) or {}
+    company = data.get('company')
+    jobs = data.get('jobs')
+    if company not in (VERIFONE, INGENICO) or not isinstance(jobs, list):
+        return jsonify({'success': False, 'error': 'company (verifone/ingenico) and jobs are required'}), 400
+
+    rows = charge_rows(company, [job if isinstance(job, dict) else {} for job in jobs])
+    charges = [{'area': area, 'charge': charge} for area, charge in rows]
+    return jsonify({'success': True, 'charges': charges})
 
 
 def convert_browser_request_to_curl(request_text):
@@ -528,12 +585,14 @@ def run_invoice_generation(filters=None):
     """Run invoice generation in background with optional filters"""
     global generation_status
 
-    def progress_callback(message, progress, total, errors):
+    def progress_callback(message, progress, total, errors, concurrency=None, cache=None):
         """Callback function to update progress"""
         generation_status['message'] = message
         generation_status['progress'] = progress
         generation_status['total'] = total
         generation_status['errors'] = errors[:10]  # Keep only last 10 errors
+        generation_status['concurrency'] = concurrency  # Peticiones simultáneas actuales (AIMD)
+        generation_status['cache'] = cache  # Work orders reutilizados del cache local (None = cache desactivado)
 
     try:
         generation_status['message'] = 'Generating invoice...'
@@ -543,14 +602,10 @@ def run_invoice_generation(filters=None):
 
         # Find the generated file if not returned
         if not result_file:
-            verifone_folder = Path(__file__).parent.parent / 'VerifoneWorkOrders'
-            invoice_folders = sorted(verifone_folder.glob('invoice_*'), reverse=True)
-
-            if invoice_folders:
-                latest_folder = invoice_folders[0]
-                html_files = list(latest_folder.glob('*.html'))
-                if html_files:
-                    result_file = str(html_files[0])
+            with RunCatalog() as catalog:
+                latest = catalog.latest(VERIFONE_INVOICE)
+            if latest is not None:
+                result_file = latest['html_file']
 
         if result_file:
             generation_status['result_file'] = str(result_file)
@@ -891,11 +946,18 @@ def update_ingenico_credentials_endpoint():
 @app.route('/api/ingenico/list-downloads')
 def list_ingenico_downloads():
     """
-    Lista todas las descargas previas de Closed Jobs de Ingenico.
+    Lista las descargas previas de Closed Jobs de Ingenico (desde el catálogo de ejecuciones).
+
+    Query params:
+        limit: Descargas por página (máximo 500; sin limit se devuelven todas)
+        offset: Descargas a saltar (default 0)
 
     Returns:
     {
         "success": true,
+        "total": 120,
+        "limit": 50,
+        "offset": 0,
         "downloads": [
             {
                 "folder": "20251102_220530_01-10-25to31-10-25",
@@ -903,51 +965,37 @@ def list_ingenico_downloads():
                 "date_range": "01/10/25 - 31/10/25",
                 "total_jobs": 35,
                 "json_file": "...",
-                "html_file": "..."
+                "html_file": "...",
+                "json_url": "/api/runs/ingenico_closed_jobs/20251102_220530_01-10-25to31-10-25/closed_jobs_....json",
+                "html_url": "/api/runs/ingenico_closed_jobs/20251102_220530_01-10-25to31-10-25/closed_jobs_....html"
             },
             ...
         ]
     }
     """
     try:
-        base_folder = Path(__file__).parent.parent / 'closedJobIngenico'
-
-        if not base_folder.exists():
-            return jsonify({'success': True, 'downloads': []})
-
-        downloads = []
-
-        # Iterar carpetas ordenadas por fecha (más reciente primero)
-        for folder in sorted(base_folder.glob('*'), reverse=True):
-            if not folder.is_dir():
-                continue
-
-            # Buscar archivos JSON
-            json_files = list(folder.glob('*.json'))
-            if not json_files:
-                continue
-
-            json_file = json_files[0]
-
-            # Leer metadata del JSON
-            try:
-                with open(json_file, 'r') as f:
-                    data = json.load(f)
-                    metadata = data.get('metadata', {})
-
-                    downloads.append({
-                        'folder': folder.name,
-                        'timestamp': metadata.get('fetch_timestamp', ''),
-                        'date_range': f"{metadata.get('filters', {}).get('from_date', '')} - {metadata.get('filters', {}).get('to_date', '')}",
-                        'total_jobs': metadata.get('total_jobs', 0),
-                        'json_file': str(json_file),
-                        'html_file': str(json_file).replace('.json', '.html')
-                    })
-            except Exception as e:
-                print(f"Error leyendo {json_file}: {e}")
-                continue
-
-        return jsonify({'success': True, 'downloads': downloads})
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = min(max(limit, 1), 500)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+
+        # Más reciente primero; el catálogo indexa el historial existente la primera vez
+        with RunCatalog() as catalog:
+            runs, total = catalog.list_runs(INGENICO_CLOSED_JOBS, limit, offset)
+
+        downloads = [{
+            'folder': Path(run['folder']).name,
+            'timestamp': run['timestamp'],
+            'date_range': run['date_range'],
+            'total_jobs': run['total'],
+            'json_file': run['json_file'],
+            'html_file': run['html_file'],
+            # Las descargas compactadas ya no tienen carpeta: el navegador las abre por estas URLs
+            'json_url': run_file_url(INGENICO_CLOSED_JOBS, run, 'json_file'),
+            'html_url': run_file_url(INGENICO_CLOSED_JOBS, run, 'html_file')
+        } for run in runs]
+
+        return jsonify({'success': True, 'total': total, 'limit': limit, 'offset': offset, 'downloads': downloads})
 
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
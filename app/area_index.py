@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Área de cobro ('1', '2', '3', ...) por postcode y suburb, para Verifone e Ingenico.
+
+El índice (data/area_index.json) se carga una sola vez por proceso en dos dicts:
+postcode -> área y postcode -> excepciones por suburb (Salisbury Heights, Greenwith; el suburb
+del trabajo debe contener el de la excepción, igual que el includes() del viewer). Resolver un
+trabajo es una búsqueda más las pocas excepciones de su postcode, sin importar cuántos postcodes
+tenga el archivo; el Area del invoice sale de aquí y no del Zone__c de Salesforce.
+"""
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_AREA_INDEX_PATH = PROJECT_ROOT / 'data' / 'area_index.json'
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+# Estado o postcode al final del suburb ("Greenwith SA 5125")
+_TRAILING_STATE = re.compile(r'(?: (?:sa|nsw|vic|qld|wa|tas|nt|act))?(?: \d{4})?$')
+
+
+def normalize_postcode(postcode):
+    """Postcode sin espacios ('' si no hay)."""
+    return str(postcode).strip() if postcode is not None else ''
+
+
+def normalize_suburb(suburb):
+    """Suburb en minúsculas, sin puntuación, espacios repetidos ni estado / postcode al final."""
+    if not suburb:
+        return ''
+    suburb = _NON_ALNUM.sub(' ', str(suburb).lower()).strip()
+    return _TRAILING_STATE.sub('', suburb)
+
+
+class AreaIndex:
+    """Índice postcode -> área con excepciones por (postcode, suburb que contiene)."""
+
+    def __init__(self, spec, source=None):
+        """
+        Args:
+            spec: dict con el contenido de area_index.json
+            source: Ruta del archivo (solo para los mensajes)
+
+        Raises:
+            ValueError: Si un postcode aparece en dos áreas o falta un campo
+        """
+        where = f" ({source})" if source else ''
+        try:
+            self.default_area = str(spec['default_area'])
+            postcodes = {}
+            for area, area_postcodes in spec.get('areas', {}).items():
+                for postcode in area_postcodes:
+                    postcode = normalize_postcode(postcode)
+                    if postcodes.get(postcode, area) != area:
+                        raise ValueError(f"Índice de áreas inválido{where}: postcode {postcode} en dos áreas")
+                    postcodes[postcode] = str(area)
+            overrides = {}
+            for override in spec.get('suburb_overrides', ()):
+                overrides.setdefault(normalize_postcode(override['postcode']), []).append(
+                    (normalize_suburb(override['suburb']), str(override['area'])))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Índice de áreas inválido{where}: {e!r}") from e
+
+        self.source = source
+        self.postcodes = postcodes
+        # Solo estos postcodes necesitan normalizar el suburb
+        self.overrides = {postcode: tuple(suburbs) for postcode, suburbs in overrides.items()}
+
+    def __len__(self):
+        return len(self.postcodes)
+
+    def resolve(self, postcode, suburb=''):
+        """Área según postcode y suburb; '' si no hay postcode."""
+        postcode = normalize_postcode(postcode)
+        if not postcode:
+            return ''
+        overrides = self.overrides.get(postcode)
+        if overrides:
+            suburb = normalize_suburb(suburb)
+            for override_suburb, area in overrides:
+                # "Salisbury Heights East" también es Salisbury Heights
+                if override_suburb in suburb:
+                    return area
+        return self.postcodes.get(postcode, self.default_area)
+
+    def resolve_many(self, locations):
+        """
+        Áreas de varios trabajos.
+
+        Args:
+            locations: Iterable de (postcode, suburb)
+
+        Returns:
+            list de áreas en el mismo orden (cada (postcode, suburb) distinto se resuelve una vez)
+        """
+        resolved = {}
+        areas = []
+        for location in locations:
+            try:
+                area = resolved.get(location)
+                if area is None:
+                    area = resolved[location] = self.resolve(*location)
+            except TypeError:  # valores no hashables (JSON del viewer)
+                area = self.resolve(*location)
+            areas.append(area)
+        return areas
+
+    @classmethod
+    def load(cls, path):
+        """Carga un archivo de índice de áreas."""
+        path = Path(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+        return cls(spec, source=str(path))
+
+
+_area_indexes = {}
+_area_indexes_lock = threading.Lock()
+
+
+def get_area_index(path=None):
+    """
+    Índice de áreas del proceso (se carga la primera vez que se usa).
+
+    Args:
+        path: Archivo del índice (default: AREA_INDEX_PATH o data/area_index.json)
+    """
+    if path is None:
+        path = os.getenv('AREA_INDEX_PATH') or DEFAULT_AREA_INDEX_PATH
+    path = str(path)
+    index = _area_indexes.get(path)
+    if index is None:
+        with _area_indexes_lock:
+            index = _area_indexes.get(path)
+            if index is None:
+                index = _area_indexes[path] = AreaIndex.load(path)
+    return index
+
+
+def resolve_areas(locations):
+    """Áreas de varios (postcode, suburb) con el índice por defecto (mismo orden)."""
+    return get_area_index().resolve_many(locations)
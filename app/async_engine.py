@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Motor asyncio para las peticiones Aura (alternativa al ThreadPoolExecutor de generate_invoice.main).
+Las peticiones Header, Detail y PII se ejecutan como coroutines sobre una única sesión aiohttp,
+limitadas por un semáforo de peticiones en vuelo en lugar de un thread por petición.
+Detalle y PII se procesan como dos etapas conectadas por una cola acotada (WorkOrderPipeline).
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+
+from generate_invoice import (
+    build_header_request,
+    request_factory_for,
+    split_batched_detail_response,
+    extract_work_order_ids,
+    WorkOrderIdPager,
+    parse_work_order_data,
+    parse_pii_details,
+    save_raw_response,
+    merge_pii_data,
+    pii_parse_failed,
+    build_work_order_result,
+    WorkOrderFetchError,
+    AuraRequestFactory,
+)
+from raw_writer import RawResponseWriter
+from resilience import RetryPolicy
+from work_order_cache import extract_work_order_signatures
+
+
+# Peticiones simultáneas por defecto (sin un thread del sistema por cada una)
+DEFAULT_MAX_IN_FLIGHT = 100
+
+
+class AsyncAuraClient:
+    """
+    Sesión aiohttp compartida con semáforo de peticiones en vuelo y timeouts por petición.
+    Con un controller (AIMDController) las peticiones en vuelo se limitan además a controller.limit.
+    Con resilience (RequestResilience) se reintenta igual que en AuraClient.post.
+    """
+
+    def __init__(self, max_in_flight=None, connect_timeout=None, read_timeout=None, controller=None,
+                 resilience=None, request_factory=None):
+        if max_in_flight is None:
+            max_in_flight = int(os.getenv('AURA_MAX_IN_FLIGHT', str(DEFAULT_MAX_IN_FLIGHT)))
+        if connect_timeout is None:
+            connect_timeout = float(os.getenv('AURA_CONNECT_TIMEOUT', '10'))
+        if read_timeout is None:
+            read_timeout = float(os.getenv('AURA_READ_TIMEOUT', '60'))
+
+        self.max_in_flight = max(1, max_in_flight)
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.controller = controller
+        self.resilience = resilience
+        # Plantillas de petición congeladas de la ejecución (generate_invoice.AuraRequestFactory)
+        self.request_factory = request_factory
+        self._in_flight = 0
+        self._gate = asyncio.Condition()
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=self.max_in_flight),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        )
+
+    async def post_json(self, url, headers=None, data=None, endpoint=None):
+        """
+        Hace un POST y decodifica la respuesta JSON (con reintentos si hay resilience).
+
+        Returns:
+            tuple: (status, json_response o None, texto de la respuesta)
+        """
+        # requests omite los valores None de headers y form data; aiohttp no los acepta
+        headers = {key: value for key, value in (headers or {}).items() if value is not None}
+        data = {key: value for key, value in (data or {}).items() if value is not None}
+
+        if self.resilience is None:
+            return await self._send(url, headers, data)
+
+        guard = self.resilience.endpoint(endpoint or 'default')
+        attempt = 0
+        while True:
+            # Circuito abierto: la etapa queda en pausa hasta que pase el cooldown (y en half-open,
+            # hasta que responda la petición de prueba)
+            pause, probe = guard.breaker.admit()
+            while pause:
+                await asyncio.sleep(pause)
+                pause, probe = guard.breaker.admit()
+
+            try:
+                result = await self._send(url, headers, data)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                guard.record(None, probe)
+                if not guard.should_retry(None, attempt):
+                    raise
+            else:
+                guard.record(result[0], probe)
+                if not guard.should_retry(result[0], attempt):
+                    return result
+
+            await asyncio.sleep(guard.policy.delay(attempt))
+            attempt += 1
+
+    async def _send(self, url, headers, data):
+        """Un único POST, limitado por el semáforo y el controlador de concurrencia."""
+        async with self.semaphore:
+            if self.controller is None:
+                return await self._post(url, headers, data)
+
+            # Esperar a que haya hueco según el límite actual del controlador
+            async with self._gate:
+                await self._gate.wait_for(lambda: self._in_flight < self.controller.limit)
+                self._in_flight += 1
+
+            status = None
+            start = time.monotonic()
+            try:
+                result = await self._post(url, headers, data)
+                status = result[0]
+                return result
+            finally:
+                self.controller.record(status, time.monotonic() - start)
+                async with self._gate:
+                    self._in_flight -= 1
+                    self._gate.notify_all()
+
+    async def _post(self, url, headers, data):
+        async with self.session.post(url, headers=headers, data=data) as response:
+            text = await response.text()
+            if response.status != 200:
+                return response.status, None, text
+            try:
+                return response.status, json.loads(text), text
+            except json.JSONDecodeError:
+                return response.status, None, text
+
+    async def close(self):
+        await self.session.close()
+
+
+async def fetch_work_order_id_page_async(client, search_string='', page_size=None, offset=0):
+    """Versión asyncio de generate_invoice.fetch_work_order_id_page. Retorna (ids, json_response)."""
+    url, headers, data = build_header_request(search_string, page_size, offset)
+
+    try:
+        print(f"   Haciendo petición Header para obtener IDs (offset {offset})...")
+        status, json_response, _ = await client.post_json(url, headers=headers, data=data, endpoint='header')
+
+        if status != 200:
+            print(f"   ✗ Error HTTP {status}")
+            return [], None
+        if json_response is None:
+            print("   ✗ Error al decodificar JSON")
+            return [], None
+        return extract_work_order_ids(json_response), json_response
+    except Exception as e:
+        print(f"   ✗ Error en petición Header: {e}")
+        return [], None
+
+
+async def iter_work_order_id_pages_async(client, search_string='', page_size=None, max_records=0, should_stop=None):
+    """Versión asyncio de generate_invoice.iter_work_order_id_pages (async generator)."""
+    pager = WorkOrderIdPager(page_size, max_records, should_stop)
+
+    while pager.has_more():
+        page_ids, json_response = await fetch_work_order_id_page_async(client, search_string, pager.page_size, pager.offset)
+        if json_response is None:
+            return
+        yield pager.accept(page_ids), json_response
+
+
+async def fetch_all_work_order_ids_async(client, search_string='', page_size=None, max_records=0):
+    """Versión asyncio de generate_invoice.fetch_all_work_order_ids. Retorna (ids, json_response)."""
+    work_order_ids = []
+    first_response = None
+
+    async for page_ids, json_response in iter_work_order_id_pages_async(client, search_string, page_size, max_records):
+        work_order_ids.extend(page_ids)
+        if first_response is None:
+            first_response = json_response
+
+    return work_order_ids, first_response
+
+
+async def fetch_work_order_detail_async(client, work_order_id):
+    """Versión asyncio de generate_invoice.fetch_work_order_detail."""
+    url, headers, data = request_factory_for(client).detail_request(work_order_id)
+
+    try:
+        _, json_response, _ = await client.post_json(url, headers=headers, data=data, endpoint='detail')
+        return json_response
+    except Exception:
+        # Silenciar excepciones en modo paralelo, se reportan en fetch_detail_stage_async
+        return None
+
+
+async def fetch_work_order_details_batch_async(client, work_order_ids):
+    """Versión asyncio de generate_invoice.fetch_work_order_details_batch."""
+    url, headers, data = request_factory_for(client).detail_batch_request(work_order_ids)
+
+    try:
+        status, json_response, _ = await client.post_json(url, headers=headers, data=data, endpoint='detail_batch')
+        if json_response is None:
+            print(f"   ⚠️  Batch de {len(work_order_ids)} work orders falló (Status {status}), se usarán peticiones individuales")
+        return split_batched_detail_response(json_response, work_order_ids)
+    except Exception as e:
+        print(f"   ⚠️  Excepción en batch de {len(work_order_ids)} work orders: {e}, se usarán peticiones individuales")
+        return split_batched_detail_response(None, work_order_ids)
+
+
+async def fetch_work_order_pii_details_async(client, work_order_id):
+    """Versión asyncio de generate_invoice.fetch_work_order_pii_details."""
+    url, headers, data = request_factory_for(client).pii_request(work_order_id)
+
+    try:
+        status, json_response, text = await client.post_json(url, headers=headers, data=data, endpoint='pii')
+
+        if status != 200:
+            print(f"   ⚠️  Error en petición PII para {work_order_id}: Status {status}")
+            print(f"       Response: {text[:200]}")
+            return None
+        if json_response is None:
+            print(f"   ⚠️  Error decodificando JSON en PII para {work_order_id}")
+        return json_response
+    except Exception as e:
+        print(f"   ⚠️  Excepción en petición PII para {work_order_id}: {e}")
+        return None
+
+
+async def fetch_detail_stage_async(client, wo_id, output_folder, api_response=None, raise_on_failure=False):
+    """Versión asyncio de generate_invoice.fetch_detail_stage."""
+    if api_response is None:
+        api_response = await fetch_work_order_detail_async(client, wo_id)
+        if api_response is None and raise_on_failure:
+            raise WorkOrderFetchError(f"Sin respuesta de detalle para {wo_id}")
+    parsed_data = parse_work_order_data(api_response, wo_id)
+    save_raw_response(output_folder, 'detail', wo_id, api_response, failed=parsed_data is None)
+    return parsed_data
+
+
+async def fetch_pii_stage_async(client, wo_id, parsed_data, output_folder, cache=None, signature=None,
+                                raise_on_failure=False):
+    """Versión asyncio de generate_invoice.fetch_pii_stage."""
+    pii_response = await fetch_work_order_pii_details_async(client, wo_id)
+    if pii_response is None and raise_on_failure:
+        raise WorkOrderFetchError(f"Sin respuesta PII para {wo_id}")
+    pii_data = parse_pii_details(pii_response, wo_id)
+    merge_pii_data(parsed_data, pii_data)
+    save_raw_response(output_folder, 'pii', wo_id, pii_response, failed=pii_parse_failed(pii_data))
+
+    if cache is not None and pii_response:
+        cache.put(wo_id, signature, parsed_data)
+    return parsed_data
+
+
+class WorkOrderPipeline:
+    """
+    Pipeline de dos etapas (detalle → PII) conectadas por un asyncio.Queue acotado.
+
+    La etapa de detalle se limita con su propio semáforo (max_in_flight) y la etapa PII
+    con pii_workers consumidores; cuando la cola está llena la etapa de detalle espera.
+    Los work orders vigentes en el cache se entregan sin pasar por ninguna etapa.
+    Un work order sin respuesta de detalle o PII se re-encola en su etapa tras un backoff (hasta requeue_limit veces).
+    """
+
+    def __init__(self, client, output_folder, on_result, detail_batch_size=1, pii_workers=None, pii_queue_size=None,
+                 cache=None, requeue_limit=None):
+        if requeue_limit is None:
+            requeue_limit = int(os.getenv('WO_REQUEUE_LIMIT', '2'))
+
+        self.client = client
+        self.requeue_limit = requeue_limit
+        self.requeue_policy = RetryPolicy(base_delay=float(os.getenv('WO_REQUEUE_DELAY', '2')))
+        self.requeued = 0
+        self.cache = cache
+        self.signatures = {}
+        self.output_folder = output_folder
+        self.on_result = on_result
+        self.detail_batch_size = max(1, detail_batch_size)
+        self.pii_workers = pii_workers or client.max_in_flight
+        self.detail_semaphore = asyncio.Semaphore(client.max_in_flight)
+        self.queue = asyncio.Queue(maxsize=pii_queue_size or 2 * self.pii_workers)
+        self.tasks = []
+        self.consumers = []
+
+    def start(self):
+        self.consumers = [asyncio.ensure_future(self._pii_worker()) for _ in range(self.pii_workers)]
+
+    def schedule(self, work_order_ids, start, total):
+        """Lanza la etapa de detalle de work_order_ids (índices desde start + 1)."""
+        pending = []
+        for i, wo_id in enumerate(work_order_ids, start + 1):
+            cached_data = self.cache.get(wo_id, self.signatures.get(wo_id)) if self.cache is not None else None
+            if cached_data is not None:
+                self.on_result(build_work_order_result(wo_id, i, total, cached_data))
+            else:
+                pending.append((i, wo_id))
+
+        if self.detail_batch_size > 1:
+            for offset in range(0, len(pending), self.detail_batch_size):
+                batch = pending[offset:offset + self.detail_batch_size]
+                self.tasks.append(asyncio.ensure_future(self._detail_batch(batch, total)))
+        else:
+            for i, wo_id in pending:
+                self.tasks.append(asyncio.ensure_future(self._detail(wo_id, i, total)))
+
+    async def join(self):
+        """Espera a que terminen las dos etapas (incluidos los re-encolados) y detiene los consumidores PII."""
+        try:
+            while self.tasks:
+                tasks, self.tasks = self.tasks, []
+                await asyncio.gather(*tasks)
+                await self.queue.join()
+        finally:
+            for consumer in self.consumers:
+                consumer.cancel()
+            await asyncio.gather(*self.consumers, return_exceptions=True)
+
+    async def _detail(self, wo_id, index, total, api_response=None, attempt=0):
+        try:
+            async with self.detail_semaphore:
+                parsed_data = await fetch_detail_stage_async(self.client, wo_id, self.output_folder, api_response,
+                                                             attempt < self.requeue_limit)
+        except WorkOrderFetchError:
+            self._requeue(self._detail(wo_id, index, total, None, attempt + 1), wo_id, attempt)
+            return
+        except Exception as e:
+            print(f"   ⚠️  Error procesando {wo_id}: {e}")
+            self.on_result(build_work_order_result(wo_id, index, total, None, str(e)))
+            return
+
+        if parsed_data:
+            # Espera si la etapa PII va atrasada (cola llena)
+            await self.queue.put((wo_id, index, total, parsed_data, 0))
+        else:
+            self.on_result(build_work_order_result(wo_id, index, total, None))
+
+    async def _detail_batch(self, batch, total):
+        async with self.detail_semaphore:
+            responses = await fetch_work_order_details_batch_async(self.client, [wo_id for _, wo_id in batch])
+        await asyncio.gather(*[
+            self._detail(wo_id, index, total, responses.get(wo_id))
+            for index, wo_id in batch
+        ])
+
+    async def _pii_worker(self):
+        while True:
+            wo_id, index, total, parsed_data, attempt = await self.queue.get()
+            result = None
+            try:
+                await fetch_pii_stage_async(self.client, wo_id, parsed_data, self.output_folder,
+                                            self.cache, self.signatures.get(wo_id), attempt < self.requeue_limit)
+                result = build_work_order_result(wo_id, index, total, parsed_data)
+            except WorkOrderFetchError:
+                # Se registra antes de task_done para que join() espere al re-encolado
+                self._requeue(self.queue.put((wo_id, index, total, parsed_data, attempt + 1)), wo_id, attempt)
+            except Exception as e:
+                print(f"   ⚠️  Error procesando {wo_id}: {e}")
+                result = build_work_order_result(wo_id, index, total, None, str(e))
+            finally:
+                self.queue.task_done()
+            if result is not None:
+                self.on_result(result)
+
+    def _requeue(self, coroutine, wo_id, attempt):
+        """Ejecuta coroutine (re-encolar el work order) después del backoff, sin ocupar la etapa."""
+        self.requeued += 1
+        delay = self.requeue_policy.delay(attempt)
+        print(f"   ↻ {wo_id} re-encolado (intento {attempt + 2}) en {delay:.1f}s")
+        self.tasks.append(asyncio.ensure_future(self._delayed(coroutine, delay)))
+
+    @staticmethod
+    async def _delayed(coroutine, delay):
+        await asyncio.sleep(delay)
+        await coroutine
+
+
+async def process_work_orders_async(client, work_order_ids, output_folder, on_result,
+                                    detail_batch_size=1, pii_workers=None, pii_queue_size=None, cache=None,
+                                    requeue_limit=None):
+    """Procesa los work orders con el pipeline detalle → PII y llama on_result(result) a medida que terminan."""
+    pipeline = WorkOrderPipeline(client, output_folder, on_result, detail_batch_size, pii_workers, pii_queue_size,
+                                 cache, requeue_limit)
+    pipeline.start()
+    pipeline.schedule(work_order_ids, 0, len(work_order_ids))
+    await pipeline.join()
+
+
+async def list_and_process_work_orders_async(client, search_string, page_size, max_records, output_folder,
+                                             on_page, on_result, detail_batch_size=1,
+                                             pii_workers=None, pii_queue_size=None, cache=None,
+                                             requeue_limit=None, should_stop=None):
+    """
+    Lista los work orders página por página y lanza la etapa de detalle de cada página en cuanto llega,
+    solapando el listado con las peticiones de detalle/PII.
+    """
+    pipeline = WorkOrderPipeline(client, output_folder, on_result, detail_batch_size, pii_workers, pii_queue_size,
+                                 cache, requeue_limit)
+    pipeline.start()
+    total = 0
+
+    try:
+        async for page_ids, json_response in iter_work_order_id_pages_async(client, search_string, page_size, max_records,
+                                                                            should_stop):
+            pipeline.signatures.update(extract_work_order_signatures(json_response))
+            page_ids = on_page(page_ids, json_response)
+            start = total
+            total += len(page_ids)
+            pipeline.schedule(page_ids, start, total)
+    finally:
+        await pipeline.join()
+
+
+class AsyncFetchEngine:
+    """
+    Fachada síncrona del motor asyncio con la misma interfaz que ThreadedFetchEngine.
+    Mantiene un event loop propio para que la sesión aiohttp se reutilice entre la
+    petición Header y las peticiones de cada work order.
+    """
+
+    def __init__(self, max_in_flight=None, detail_batch_size=1, pii_workers=None, pii_queue_size=None, cache=None,
+                 controller=None, resilience=None, requeue_limit=None, capture=None):
+        self.detail_batch_size = max(1, detail_batch_size)
+        self.capture = capture
+        self.requeue_limit = requeue_limit
+        self.cache = cache
+        self.pii_workers = pii_workers
+        self.pii_queue_size = pii_queue_size
+        self.controller = controller
+        if max_in_flight is None and controller is not None:
+            max_in_flight = controller.maximum
+        self.loop = asyncio.new_event_loop()
+        self.client = self.loop.run_until_complete(self._create_client(max_in_flight, controller, resilience))
+
+    async def _create_client(self, max_in_flight, controller, resilience):
+        # La sesión aiohttp debe crearse dentro del event loop que la usará
+        return AsyncAuraClient(max_in_flight=max_in_flight, controller=controller, resilience=resilience,
+                               request_factory=AuraRequestFactory())
+
+    def concurrency_report(self):
+        """Concurrencia usada (la del controlador adaptativo si lo hay)."""
+        if self.controller is not None:
+            return self.controller.report()
+        return {'adaptive': False, 'limit': self.client.max_in_flight}
+
+    def fetch_all_work_order_ids(self, search_string='', page_size=None, max_records=0):
+        return self.loop.run_until_complete(
+            fetch_all_work_order_ids_async(self.client, search_string, page_size, max_records)
+        )
+
+    def list_and_process_work_orders(self, search_string, page_size, max_records, output_folder, on_page, on_result,
+                                     should_stop=None):
+        # Las respuestas raw se escriben desde un thread aparte para no bloquear el event loop
+        with RawResponseWriter(output_folder, capture=self.capture):
+            self.loop.run_until_complete(list_and_process_work_orders_async(
+                self.client, search_string, page_size, max_records, output_folder,
+                on_page, on_result, self.detail_batch_size, self.pii_workers, self.pii_queue_size, self.cache,
+                self.requeue_limit, should_stop
+            ))
+
+    def process_work_orders(self, work_order_ids, output_folder, on_result):
+        with RawResponseWriter(output_folder, capture=self.capture):
+            self.loop.run_until_complete(
+                process_work_orders_async(self.client, work_order_ids, output_folder, on_result,
+                                          self.detail_batch_size, self.pii_workers, self.pii_queue_size, self.cache,
+                                          self.requeue_limit)
+            )
+
+    def close(self):
+        if not self.loop.is_closed():
+            self.loop.run_until_complete(self.client.close())
+            self.loop.close()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Cliente HTTP compartido para las peticiones Aura (Header, Detail y PII).
+Mantiene un requests.Session con pool de conexiones keep-alive y timeouts por petición.
+"""
+
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+from resilience import RequestResilience
+
+
+# Número de workers por defecto (coincide con el límite de threads de generate_invoice.main)
+DEFAULT_POOL_SIZE = 10
+
+
+class AuraClient:
+    """
+    Cliente Aura con un requests.Session reutilizable.
+
+    El pool de conexiones se dimensiona según el número de workers, de forma que cada
+    thread reutiliza una conexión TCP+TLS ya abierta en lugar de negociar una nueva por
+    petición. Con pool_block=True nunca se abren más de pool_size conexiones por host.
+
+    Con un controller (AIMDController) las peticiones simultáneas se limitan además a
+    controller.limit, que se ajusta según el status y la latencia de cada respuesta.
+
+    Con resilience (RequestResilience) los 429/5xx y errores de conexión se reintentan con backoff,
+    dentro del presupuesto de reintentos y el circuit breaker del endpoint de cada petición.
+    """
+
+    def __init__(self, pool_size=None, connect_timeout=None, read_timeout=None, max_hosts=None, controller=None,
+                 resilience=None, request_factory=None):
+        """
+        Args:
+            pool_size: Conexiones simultáneas por host (default: AURA_POOL_SIZE o 10)
+            connect_timeout: Segundos para establecer la conexión (default: AURA_CONNECT_TIMEOUT o 10)
+            read_timeout: Segundos de espera por la respuesta (default: AURA_READ_TIMEOUT o 60)
+            max_hosts: Número de hosts distintos cuyo pool se mantiene (default: AURA_POOL_HOSTS o 4)
+            controller: AIMDController opcional para la concurrencia adaptativa
+            resilience: RequestResilience opcional (reintentos, presupuesto y circuit breaker por endpoint)
+            request_factory: Plantillas de petición congeladas de la ejecución (generate_invoice.AuraRequestFactory);
+                sin ella las peticiones se construyen con las variables de entorno actuales
+        """
+        if pool_size is None:
+            pool_size = int(os.getenv('AURA_POOL_SIZE', str(DEFAULT_POOL_SIZE)))
+        if connect_timeout is None:
+            connect_timeout = float(os.getenv('AURA_CONNECT_TIMEOUT', '10'))
+        if read_timeout is None:
+            read_timeout = float(os.getenv('AURA_READ_TIMEOUT', '60'))
+        if max_hosts is None:
+            max_hosts = int(os.getenv('AURA_POOL_HOSTS', '4'))
+
+        self.pool_size = max(1, pool_size)
+        self.timeout = (connect_timeout, read_timeout)
+        self.controller = controller
+        self.resilience = resilience
+        self.request_factory = request_factory
+        self._in_flight = 0
+        self._gate = threading.Condition()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max_hosts,
+            pool_maxsize=self.pool_size,
+            pool_block=True
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def post(self, url, headers=None, data=None, timeout=None, endpoint=None):
+        """
+        Hace un POST reutilizando el pool de conexiones. Lanza requests.RequestException en error.
+
+        endpoint identifica el tipo de petición ('header', 'detail', 'detail_batch', 'pii') para
+        los reintentos; se retorna la última respuesta (o excepción) cuando ya no se reintenta.
+        """
+        if self.resilience is None:
+            return self._send(url, headers, data, timeout)
+
+        guard = self.resilience.endpoint(endpoint or 'default')
+        attempt = 0
+        while True:
+            # Circuito abierto: la etapa queda en pausa hasta que pase el cooldown (y en half-open,
+            # hasta que responda la petición de prueba)
+            pause, probe = guard.breaker.admit()
+            while pause:
+                time.sleep(pause)
+                pause, probe = guard.breaker.admit()
+
+            try:
+                response = self._send(url, headers, data, timeout)
+            except requests.RequestException:
+                guard.record(None, probe)
+                if not guard.should_retry(None, attempt):
+                    raise
+            else:
+                guard.record(response.status_code, probe)
+                if not guard.should_retry(response.status_code, attempt):
+                    return response
+
+            time.sleep(guard.policy.delay(attempt))
+            attempt += 1
+
+    def _send(self, url, headers, data, timeout):
+        """Un único POST, limitado por el controlador de concurrencia si lo hay."""
+        if self.controller is None:
+            return self.session.post(url, headers=headers, data=data, timeout=timeout or self.timeout)
+
+        # Esperar a que haya hueco según el límite actual del controlador
+        with self._gate:
+            self._gate.wait_for(lambda: self._in_flight < self.controller.limit)
+            self._in_flight += 1
+
+        status = None
+        start = time.monotonic()
+        try:
+            response = self.session.post(url, headers=headers, data=data, timeout=timeout or self.timeout)
+            status = response.status_code
+            return response
+        finally:
+            self.controller.record(status, time.monotonic() - start)
+            with self._gate:
+                self._in_flight -= 1
+                self._gate.notify_all()
+
+    def close(self):
+        """Cierra todas las conexiones del pool."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """
+    Retorna el cliente Aura compartido del proceso (se crea la primera vez que se usa).
+    Lo usan las funciones fetch_* cuando no reciben un cliente explícito.
+    """
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = AuraClient(resilience=RequestResilience())
+    return _default_client
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Motor de cobro: Area (por postcode/suburb) y Charge de cada trabajo de Verifone e Ingenico.
+
+Reemplaza calculateCharge / calculateArea de templates/viewer.html: generate_invoice.main() y
+save_results (Ingenico) calculan los valores una sola vez al generar y los guardan con los
+registros; el viewer solo los muestra (y pide /api/calculate-charges para archivos antiguos).
+
+Las tarifas y las clases de servicio vienen del tarifario (rate_card.py, data/rate_card.json):
+las funciones por lote obtienen el tarifario vigente una vez y cobran cada fila con una búsqueda.
+El Area sale del índice de postcodes (area_index.py, data/area_index.json), resuelto por lote.
+"""
+
+from area_index import get_area_index
+from rate_card import BILLABLE, OTHER, current_rate_card
+
+VERIFONE = 'verifone'
+INGENICO = 'ingenico'
+
+# Columnas de una fila del Closed Job List de Ingenico (parse_html_table) que usa el cálculo
+INGENICO_COLUMNS = {
+    'job_type': 'JobType',
+    'device_type': 'DeviceType',
+    'postcode': 'Postcode',
+    'suburb': 'Suburb',
+    'weekend': 'Weekend',
+    'after_hour': 'AfterHour',
+    'multiple_job_id': 'MultipleJobID',
+    'billable': 'Billable',
+    'fix': 'Fix',
+}
+
+
+def calculate_area(postcode, suburb=''):
+    """Area ('1', '2' o '3') según postcode y suburb (area_index.py); '' si no hay postcode."""
+    return get_area_index().resolve(postcode, suburb)
+
+
+def _text(value):
+    """Valor como texto ('' si no hay): el JSON del viewer puede traer números o booleanos."""
+    return '' if value is None else str(value)
+
+
+def _flag(value):
+    value = _text(value).lower()
+    return 'yes' in value or 'true' in value
+
+
+def calculate_charge(company, job_type='', device_type='', area='', weekend='', after_hour='',
+                     multiple_job_id='', billable='', fix='', rate_card=None):
+    """
+    Charge de un trabajo según el tarifario (mismas reglas que tenía calculateCharge en el viewer).
+
+    Args:
+        company: VERIFONE o INGENICO
+        area: Area calculada con calculate_area ('' = Area 1)
+        weekend / after_hour: 'YES' / 'NO' (también acepta 'true')
+        fix: Status del work order (Verifone solo cobra Completed, Failed, Futile y On Site)
+        rate_card: Tarifario a usar (default: current_rate_card())
+
+    Returns:
+        float con el cobro (0 si no se cobra)
+    """
+    rate_card = rate_card or current_rate_card()
+    billable = _text(billable).lower()
+
+    # No facturable, o Status que no se cobra (Verifone: nunca Cancelled)
+    if not rate_card.is_billed(company, billable, _text(fix).lower()):
+        return 0.0
+
+    service_class = rate_card.classify(company, _text(job_type), _text(device_type))
+    # Facturable sin servicio identificado: tarifa de lunes a viernes
+    if service_class == OTHER and billable in rate_card.billable:
+        service_class = BILLABLE
+
+    is_multiple = _text(multiple_job_id).strip() != ''
+    return rate_card.rate(company, service_class, _flag(after_hour), _flag(weekend), area, is_multiple)
+
+
+def charge_rows(company, jobs, rate_card=None, area_index=None):
+    """
+    (area, charge) de varios trabajos, en el mismo orden. Cada trabajo es un dict con las claves de
+    INGENICO_COLUMNS (job_type, device_type, postcode, suburb, weekend, after_hour, multiple_job_id,
+    billable, fix).
+
+    Las áreas se resuelven en bloque con el índice de postcodes y el tarifario se obtiene una vez.
+    """
+    rate_card = rate_card or current_rate_card()
+    area_index = area_index or get_area_index()
+    areas = area_index.resolve_many((job.get('postcode'), job.get('suburb')) for job in jobs)
+    return [
+        (area, calculate_charge(company, job.get('job_type'), job.get('device_type'), area, job.get('weekend'),
+                                job.get('after_hour'), job.get('multiple_job_id'), job.get('billable'), job.get('fix'),
+                                rate_card=rate_card))
+        for area, job in zip(areas, jobs)
+    ]
+
+
+def apply_verifone_charges(work_orders_data, rate_card=None):
+    """
+    Guarda 'area' y 'charge' en los work orders de Verifone (después de MultipleJobID).
+    El 'area' del índice de postcodes reemplaza al Zone__c del detalle.
+    """
+    records = [wo for wo in work_orders_data if wo]
+    for wo, (area, charge) in zip(records, charge_rows(VERIFONE, records, rate_card)):
+        wo['area'], wo['charge'] = area, charge
+    return work_orders_data
+
+
+def apply_ingenico_charges(jobs, rate_card=None):
+    """Agrega 'Area' y 'Charge' a las filas del Closed Job List de Ingenico (parse_html_table)."""
+    rows = [{name: job.get(column, '') for name, column in INGENICO_COLUMNS.items()} for job in jobs]
+    for job, (area, charge) in zip(jobs, charge_rows(INGENICO, rows, rate_card)):
+        job['Area'], job['Charge'] = area, charge
+    return jobs
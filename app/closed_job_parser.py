@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Extracción de las filas de la tabla del Closed Job List de Ingenico (ctl00_ContentPlaceHolder1_grdJob).
+
+parse_html_table (scripts/fetch_ingenico_closed_jobs.py) arma los trabajos a partir de las filas;
+aquí solo se leen las filas, con uno de estos parsers:
+
+- 'bs4': árbol completo de BeautifulSoup con html.parser (el comportamiento original).
+- 'stream': eventos de html.parser (sin árbol); empieza en la tabla y deja de leer al cerrarla.
+- 'lxml': árbol de lxml (libxml2, en C) desde la tabla; solo si lxml está instalado.
+
+Los tres entregan lo mismo que el árbol de BeautifulSoup: cada <tr> de la tabla (también los
+anidados, en orden de documento) con sus clases y cada <td> descendiente con su texto
+(get_text(strip=True)) y el texto del primer <a> que contenga. La única diferencia es con HTML
+mal formado: lxml cierra los <td> / <tr> sin cierre como un navegador, html.parser no; por eso
+'auto' usa 'stream' y lxml se elige explícitamente.
+"""
+
+import os
+import re
+from html.parser import HTMLParser
+
+try:
+    import lxml.html
+except ImportError:  # lxml es opcional
+    lxml = None
+
+GRID_TABLE_ID = 'ctl00_ContentPlaceHolder1_grdJob'
+HEADER_ROW_CLASS = 'FormGridHeaderCell'
+PAGER_ROW_CLASS = 'FormGridPagerCell'
+
+PARSERS = ('auto', 'bs4', 'stream', 'lxml')
+
+# Inicio de la tabla en el HTML crudo (sin encontrarla se recorre el documento completo)
+_GRID_TABLE_START = re.compile(
+    r'<table\b[^>]*\bid\s*=\s*(["\']?)' + re.escape(GRID_TABLE_ID) + r'\1[\s/>]', re.IGNORECASE)
+
+# Elementos vacíos: BeautifulSoup los cierra al abrirlos
+_VOID_ELEMENTS = frozenset((
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image', 'img',
+    'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer',
+    'track', 'wbr',
+))
+
+# Texto que get_text() no incluye (strings especiales de BeautifulSoup)
+_HIDDEN_TEXT_ELEMENTS = frozenset(('script', 'style', 'template', 'rt', 'rp'))
+_LXML_HIDDEN_TEXT = './/script|.//style|.//template|.//rt|.//rp'
+_LXML_VISIBLE_TEXT = (
+    './/text()[not(ancestor::script or ancestor::style or ancestor::template or ancestor::rt or ancestor::rp)]')
+
+_FEED_CHUNK = 64 * 1024
+
+
+def resolve_parser(parser=None):
+    """
+    'bs4', 'stream' o 'lxml'.
+
+    Args:
+        parser: 'auto', 'bs4', 'stream' o 'lxml' (default: INGENICO_HTML_PARSER o 'auto' = stream)
+    """
+    if not parser:
+        parser = os.getenv('INGENICO_HTML_PARSER') or 'auto'
+    parser = parser.strip().lower()
+    if parser not in PARSERS:
+        raise ValueError(f"Parser HTML desconocido: {parser} (opciones: {', '.join(PARSERS)})")
+    if parser == 'auto':
+        return 'stream'
+    if parser == 'lxml' and lxml is None:
+        raise ValueError("El parser lxml requiere el paquete lxml (pip install lxml)")
+    return parser
+
+
+def _grid_fragment(html_content):
+    """HTML desde el inicio de la tabla (o el documento completo si no se encuentra)."""
+    match = _GRID_TABLE_START.search(html_content)
+    return html_content[match.start():] if match else html_content
+
+
+def _rows_bs4(html_content):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    table = soup.find('table', {'id': GRID_TABLE_ID})
+    if not table:
+        return None
+
+    rows = []
+    for row in table.find_all('tr'):
+        cells = []
+        for cell in row.find_all('td'):
+            link = cell.find('a')
+            cells.append((cell.get_text(strip=True), link.get_text(strip=True) if link else None))
+        rows.append((tuple(row.get('class', [])), cells))
+    return rows
+
+
+class _GridTableParser(HTMLParser):
+    """
+    Sigue solo la tabla de trabajos con los eventos de html.parser, con las mismas reglas de
+    anidamiento que el árbol de BeautifulSoup: un cierre cierra hasta la última apertura de ese
+    elemento (sin apertura se ignora) y los elementos vacíos se cierran solos.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = None        # None = la tabla todavía no apareció
+        self.done = False
+        self._stack = []        # (nombre, registro de fila / celda / link o None) de los elementos abiertos
+        self._open_rows = []
+        self._open_cells = []   # [textos, textos del primer link]
+        self._open_links = []
+        self._hidden = 0
+        self._data = []
+
+    def _flush(self):
+        # Los fragmentos de texto entre dos etiquetas forman un solo string (igual que en el árbol)
+        if self._data:
+            text = ''.join(self._data).strip()
+            self._data = []
+            if text and not self._hidden:
+                for cell in self._open_cells:
+                    cell[0].append(text)
+                for link in self._open_links:
+                    link.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if self.rows is None:
+            if tag != 'table' or dict(attrs).get('id') != GRID_TABLE_ID:
+                return
+            self.rows = []
+        self._flush()
+        if tag in _VOID_ELEMENTS:
+            return
+
+        record = None
+        if tag == 'tr':
+            classes = dict(attrs).get('class') or ''
+            record = [tuple(classes.split()), []]
+            self.rows.append(record)
+            self._open_rows.append(record)
+        elif tag == 'td':
+            record = [[], None]
+            for row in self._open_rows:
+                row[1].append(record)
+            self._open_cells.append(record)
+        elif tag == 'a':
+            record = []
+            for cell in self._open_cells:
+                if cell[1] is None:
+                    cell[1] = record
+            self._open_links.append(record)
+        elif tag in _HIDDEN_TEXT_ELEMENTS:
+            self._hidden += 1
+        self._stack.append((tag, record))
+
+    def handle_endtag(self, tag):
+        if self.done or self.rows is None:
+            return
+        self._flush()
+        for position in range(len(self._stack) - 1, -1, -1):
+            if self._stack[position][0] == tag:
+                break
+        else:
+            return
+
+        # Los registros abiertos están en el mismo orden que la pila: el que se cierra es el último
+        while len(self._stack) > position:
+            name, _ = self._stack.pop()
+            if name == 'tr':
+                self._open_rows.pop()
+            elif name == 'td':
+                self._open_cells.pop()
+            elif name == 'a':
+                self._open_links.pop()
+            elif name in _HIDDEN_TEXT_ELEMENTS:
+                self._hidden -= 1
+        if not self._stack:
+            self.done = True
+
+    def handle_data(self, data):
+        if self.rows is not None and not self.done:
+            self._data.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        # <![CDATA[...]]>: BeautifulSoup lo incluye en get_text()
+        if data.startswith('CDATA['):
+            self._data.append(data[6:])
+            self._flush()
+
+
+def _rows_stream(html_content):
+    parser = _GridTableParser()
+    fragment = _grid_fragment(html_content)
+    for start in range(0, len(fragment), _FEED_CHUNK):
+        parser.feed(fragment[start:start + _FEED_CHUNK])
+        if parser.done:
+            break
+    else:
+        parser.close()
+        parser._flush()
+
+    if parser.rows is None:
+        return None
+    return [
+        (classes, [(''.join(texts), None if link is None else ''.join(link)) for texts, link in cells])
+        for classes, cells in parser.rows
+    ]
+
+
+def _lxml_text(element, visible_only):
+    texts = element.xpath(_LXML_VISIBLE_TEXT) if visible_only else element.itertext()
+    return ''.join(text.strip() for text in texts)
+
+
+def _rows_lxml(html_content):
+    fragment = _grid_fragment(html_content)
+    if not fragment.strip():
+        return None
+    root = lxml.html.fromstring(fragment)
+    tables = root.xpath('//table[@id=$table_id]', table_id=GRID_TABLE_ID)
+    if not tables:
+        return None
+
+    # itertext() incluye el texto de script / style: solo se filtra si la tabla los tiene
+    visible_only = bool(tables[0].xpath(_LXML_HIDDEN_TEXT))
+    rows = []
+    for row in tables[0].iter('tr'):
+        cells = []
+        for cell in row.iter('td'):
+            link = next(cell.iter('a'), None)
+            cells.append((_lxml_text(cell, visible_only),
+                          _lxml_text(link, visible_only) if link is not None else None))
+        rows.append((tuple((row.get('class') or '').split()), cells))
+    return rows
+
+
+_ROW_EXTRACTORS = {'bs4': _rows_bs4, 'stream': _rows_stream, 'lxml': _rows_lxml}
+
+
+def extract_grid_rows(html_content, parser=None):
+    """
+    Filas de la tabla de trabajos.
+
+    Args:
+        html_content: str con el HTML crudo de la página
+        parser: 'auto', 'bs4', 'stream' o 'lxml' (ver resolve_parser)
+
+    Returns:
+        list de (clases de la fila, [(texto de la celda, texto del primer link o None), ...]),
+        o None si la página no tiene la tabla
+    """
+    return _ROW_EXTRACTORS[resolve_parser(parser)](html_content)
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Post-proceso columnar de lotes grandes de work orders (reprocesar un trimestre o un año de historial).
+
+Después del fetch, filter_by_date_range, After Hour / Weekend y calculate_multiple_job_ids recorren
+los registros uno por uno. Aquí se extraen una vez las columnas necesarias (fecha del filtro,
+OnSiteDateTime, JobID) y se calculan en bloque la máscara del rango de fechas, los flags
+After Hour / Weekend y los grupos misma fecha + misma dirección (location_key).
+
+Con NumPy instalado las columnas son arrays de NumPy; sin él, arrays del módulo array y listas.
+El resultado es idéntico al del camino escalar (postprocess_work_orders con mode='scalar').
+"""
+
+import os
+from array import array
+from datetime import date, datetime
+from itertools import compress
+from operator import attrgetter
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+from generate_invoice import (
+    calculate_multiple_job_ids,
+    filter_by_date_range,
+    get_filter_date,
+    make_location_key,
+    normalize_address,
+    onsite_timestamp,
+)
+from work_order_record import WorkOrder
+
+
+POSTPROCESS_MODES = ('auto', 'scalar', 'columnar')
+
+# En modo auto, lotes desde este tamaño usan el camino columnar
+COLUMNAR_MIN_RECORDS = 5000
+
+# Códigos de los flags After Hour / Weekend
+FLAG_VALUES = ('NO', 'YES', 'N/A')
+_NO, _YES, _NA = range(3)
+
+# Día sin fecha en las columnas de días (queda fuera de cualquier rango)
+_NO_DAY = -(1 << 62)
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def resolve_postprocess_mode(mode=None, count=0):
+    """
+    'scalar' o 'columnar' para un lote de count registros.
+
+    Args:
+        mode: 'auto', 'scalar' o 'columnar' (default: POSTPROCESS_MODE o 'auto')
+        count: Número de work orders del lote (modo auto: columnar desde POSTPROCESS_COLUMNAR_MIN)
+    """
+    if not mode:
+        mode = os.getenv('POSTPROCESS_MODE') or 'auto'
+    mode = mode.strip().lower()
+    if mode not in POSTPROCESS_MODES:
+        raise ValueError(f"Modo de post-proceso desconocido: {mode} (opciones: {', '.join(POSTPROCESS_MODES)})")
+    if mode == 'auto':
+        min_records = int(os.getenv('POSTPROCESS_COLUMNAR_MIN') or COLUMNAR_MIN_RECORDS)
+        mode = 'columnar' if count >= min_records else 'scalar'
+    return mode
+
+
+class WorkOrderColumns:
+    """
+    Columnas de un lote de work orders (sin None), extraídas una sola vez:
+    onsite_timestamp, fecha del filtro y JobID.
+    """
+
+    def __init__(self, records, timestamps=None, filter_dates=None, job_ids=None):
+        self.records = records
+        if timestamps is not None:
+            self.timestamps, self.filter_dates, self.job_ids = timestamps, filter_dates, job_ids
+            self.compact = all(type(wo) is WorkOrder for wo in records)
+            return
+
+        # Registros compactos (WorkOrder): una sola lectura de los slots por registro
+        self.compact = all(type(wo) is WorkOrder for wo in records)
+        if self.compact:
+            self.timestamps, self.filter_dates, self.job_ids = (
+                list(map(attrgetter(name), records)) for name in ('onsite_timestamp', 'filter_date', 'job_id'))
+        else:
+            self.timestamps = [wo.get('onsite_timestamp') for wo in records]
+            self.filter_dates = [wo.get('filter_date') for wo in records]
+            self.job_ids = [wo.get('job_id', '') for wo in records]
+
+        # Registros sin los valores precalculados (cache antiguo): se calculan como en el camino escalar
+        if None in self.timestamps or None in self.filter_dates:
+            for i, wo in enumerate(records):
+                if self.timestamps[i] is None:
+                    self.timestamps[i] = onsite_timestamp(wo)
+                if self.filter_dates[i] is None:
+                    self.filter_dates[i] = _computed_filter_date(wo)
+
+    def __len__(self):
+        return len(self.records)
+
+    def select(self, mask):
+        """Columnas de los registros con mask True."""
+        return WorkOrderColumns(*(list(compress(column, mask)) for column in (
+            self.records, self.timestamps, self.filter_dates, self.job_ids)))
+
+    def location_keys(self):
+        """
+        location_key de cada registro (la que ya tiene guardada o calculada aquí, con
+        normalize_address una vez por dirección distinta).
+        """
+        if self.compact:
+            keys = list(map(attrgetter('location_key'), self.records))
+        else:
+            keys = [wo.get('location_key') for wo in self.records]
+        if None in keys:
+            normalized = {}
+            for i, key in enumerate(keys):
+                if key is None:
+                    street = self.records[i].get('street', '')
+                    address = normalized.get(street)
+                    if address is None:
+                        address = normalized[street] = normalize_address(street)
+                    keys[i] = make_location_key(self.timestamps[i][:10], address)
+        return keys
+
+
+def _computed_filter_date(wo):
+    """Fecha del filtro de un registro sin 'filter_date' ('' = sin fecha o no parseable: se excluye)."""
+    try:
+        filter_date = get_filter_date(wo.get('onsite_end_time_iso'), wo.get('onsite_start_time_iso'))
+    except (ValueError, AttributeError):
+        return ''
+    return filter_date.isoformat() if filter_date else ''
+
+
+def _day_numbers(iso_dates):
+    """Días desde 1970-01-01 de una columna 'YYYY-MM-DD' (_NO_DAY si está vacía o es inválida)."""
+    days = array('q')
+    for value in iso_dates:
+        try:
+            days.append(date.fromisoformat(value).toordinal() - _EPOCH_ORDINAL if value else _NO_DAY)
+        except ValueError:
+            days.append(_NO_DAY)
+    return days
+
+
+def _numpy_days(iso_dates, unit):
+    """
+    Columna datetime64 (NaT si está vacía); None si algún valor no tiene exactamente el formato
+    'YYYY-MM-DD' (unit 'D') o 'YYYY-MM-DDTHH:MM' (unit 'm') y hay que usar el camino sin NumPy.
+    """
+    if not set(map(len, iso_dates)) <= {0, 10 if unit == 'D' else 16}:
+        return None
+    try:
+        return np.array([value or 'NaT' for value in iso_dates], dtype=f'datetime64[{unit}]')
+    except ValueError:
+        return None
+
+
+def date_range_mask(filter_dates, from_date, to_date):
+    """
+    Máscara (list de bool) de las fechas de filtro ('YYYY-MM-DD') dentro de [from_date, to_date].
+    Las vacías (sin fecha o no parseable) quedan fuera, igual que en filter_by_date_range.
+    """
+    if np is not None:
+        days = _numpy_days(filter_dates, 'D')
+        if days is not None:
+            # Las comparaciones con NaT son False
+            return ((days >= np.datetime64(from_date)) & (days <= np.datetime64(to_date))).tolist()
+
+    first = from_date.toordinal() - _EPOCH_ORDINAL
+    last = to_date.toordinal() - _EPOCH_ORDINAL
+    return [first <= day <= last for day in _day_numbers(filter_dates)]
+
+
+def onsite_flags(timestamps):
+    """
+    Flags After Hour (6pm a 6am) y Weekend (sábado o domingo) de una columna de onsite_timestamp
+    ('YYYY-MM-DDTHH:MM' o '').
+
+    Returns:
+        tuple: (list de after_hour, list de weekend) con 'YES', 'NO' o 'N/A'
+    """
+    if np is not None:
+        minutes = _numpy_days(timestamps, 'm')
+        if minutes is not None:
+            valid = ~np.isnat(minutes)
+            days = minutes.astype('datetime64[D]')
+            hours = (minutes - days).astype(np.int64) // 60
+            # 1970-01-01 fue jueves (weekday 3)
+            weekdays = (days.astype(np.int64) + 3) % 7
+            after_hour = np.where(valid, (hours >= 18) | (hours < 6), _NA).astype(np.int8)
+            weekend = np.where(valid, weekdays >= 5, _NA).astype(np.int8)
+            return ([FLAG_VALUES[code] for code in after_hour.tolist()],
+                    [FLAG_VALUES[code] for code in weekend.tolist()])
+
+    after_hour = array('b')
+    weekend = array('b')
+    for timestamp, day in zip(timestamps, _day_numbers([timestamp[:10] for timestamp in timestamps])):
+        if day == _NO_DAY:
+            after_hour.append(_NA)
+            weekend.append(_NA)
+            continue
+        hour = int(timestamp[11:13])
+        after_hour.append(_YES if hour >= 18 or hour < 6 else _NO)
+        weekend.append(_YES if (day + 3) % 7 >= 5 else _NO)
+    return [FLAG_VALUES[code] for code in after_hour], [FLAG_VALUES[code] for code in weekend]
+
+
+def multiple_job_ids(columns, keys=None):
+    """
+    MultipleJobID de cada registro: grupos con la misma fecha (día del OnSiteDateTime) y la misma
+    dirección normalizada. El menor JobID del grupo (principal) queda vacío; los demás llevan el
+    JobID del principal. Igual que calculate_multiple_job_ids.
+
+    Args:
+        keys: location_key de cada registro (default: columns.location_keys())
+    """
+    if keys is None:
+        keys = columns.location_keys()
+    # Código de grupo por registro (-1 = sin fecha o sin dirección: no se agrupa)
+    group_codes = {}
+    codes = array('q')
+    for key in keys:
+        if key:
+            codes.append(group_codes.setdefault(key, len(group_codes)))
+        else:
+            codes.append(-1)
+
+    job_ids = columns.job_ids
+    result = [''] * len(job_ids)
+    if not group_codes:
+        return result
+
+    if np is not None:
+        codes = np.frombuffer(codes, dtype=np.int64)
+        grouped = np.flatnonzero(codes >= 0)
+        group_of = codes[grouped]
+        # Rango de cada JobID en orden de comparación de strings (el menor rango es el principal)
+        unique_ids, ranks = np.unique(np.array(job_ids, dtype=object)[grouped], return_inverse=True)
+        ranks = ranks.reshape(-1)
+        principal = np.full(len(group_codes), len(unique_ids), dtype=np.int64)
+        np.minimum.at(principal, group_of, ranks)
+        sizes = np.bincount(group_of, minlength=len(group_codes))
+        principal_of = principal[group_of]
+        secondary = (sizes[group_of] > 1) & (ranks != principal_of)
+        for position, rank in zip(grouped[secondary].tolist(), principal_of[secondary].tolist()):
+            result[position] = unique_ids[rank]
+        return result
+
+    principal = {}
+    sizes = array('q', [0]) * len(group_codes)
+    for code, job_id in zip(codes, job_ids):
+        if code >= 0:
+            sizes[code] += 1
+            if code not in principal or job_id < principal[code]:
+                principal[code] = job_id
+    for position, (code, job_id) in enumerate(zip(codes, job_ids)):
+        if code >= 0 and sizes[code] > 1 and job_id != principal[code]:
+            result[position] = principal[code]
+    return result
+
+
+def postprocess_columnar(work_orders_data, date_from=None, date_to=None):
+    """Filtro por fecha, After Hour / Weekend y MultipleJobID en bloque (ver módulo)."""
+    columns = WorkOrderColumns([wo for wo in work_orders_data if wo])
+    # Sin filtro de fecha (o con fechas inválidas) la lista se conserva, igual que filter_by_date_range
+    records = work_orders_data
+
+    if date_from and date_to:
+        try:
+            from_date = datetime.strptime(date_from, '%Y-%m-%d').date()
+            to_date = datetime.strptime(date_to, '%Y-%m-%d').date()
+        except ValueError as e:
+            print(f"   ⚠️  Error en formato de fechas: {e}")
+        else:
+            columns = columns.select(date_range_mask(columns.filter_dates, from_date, to_date))
+            records = columns.records
+            print(f"\n   Filtrado por fecha aplicado (columnar):")
+            print(f"   - Rango: {date_from} a {date_to}")
+            print(f"   - Work orders antes del filtro: {len(work_orders_data)}")
+            print(f"   - Work orders después del filtro: {len(records)}")
+
+    keys = columns.location_keys()
+    rows = zip(columns.records, *onsite_flags(columns.timestamps), multiple_job_ids(columns, keys), keys)
+    if columns.compact:
+        # Escritura directa en los slots (los flags son constantes, ya internadas)
+        for wo, after_hour, weekend, multiple_job_id, key in rows:
+            wo.after_hour = after_hour
+            wo.weekend = weekend
+            wo.multiple_job_id = multiple_job_id
+            wo.location_key = key
+    else:
+        for wo, after_hour, weekend, multiple_job_id, key in rows:
+            wo['after_hour'] = after_hour
+            wo['weekend'] = weekend
+            wo['multiple_job_id'] = multiple_job_id
+            wo['location_key'] = key
+    return records
+
+
+def postprocess_work_orders(work_orders_data, date_from=None, date_to=None, mode=None):
+    """
+    Post-proceso de los work orders obtenidos: filtro por rango de fechas (si se especificó) y
+    MultipleJobID. Lotes grandes usan el camino columnar; el resultado es el mismo.
+
+    Args:
+        work_orders_data: Lista de work orders parseados
+        date_from: Fecha inicial YYYY-MM-DD (opcional)
+        date_to: Fecha final YYYY-MM-DD (opcional)
+        mode: 'auto', 'scalar' o 'columnar' (ver resolve_postprocess_mode)
+
+    Returns:
+        Lista de work orders (filtrada si hay rango de fechas)
+    """
+    if resolve_postprocess_mode(mode, len(work_orders_data)) == 'columnar':
+        return postprocess_columnar(work_orders_data, date_from, date_to)
+
+    if date_from and date_to:
+        work_orders_data = filter_by_date_range(work_orders_data, date_from, date_to)
+    if work_orders_data:
+        work_orders_data = calculate_multiple_job_ids(work_orders_data)
+    return work_orders_data
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Extractores de campos compilados a partir de un mapeo declarativo.
+
+parse_work_order_data y parse_pii_details ya no llaman a extract_field_value /
+extract_field_display_value campo por campo: el mapeo (DETAIL_FIELDS, PII_FIELDS) se compila
+una sola vez al importar el módulo en una función que recorre el record en una sola pasada
+(cada campo de origen se busca una vez, aunque alimente varias columnas).
+
+Agregar una columna es agregar una línea al mapeo; si además se quiere como slot del registro
+compacto, se agrega el nombre a FIELDS de work_order_record.py.
+"""
+
+# Modos de lectura de un campo del record de Aura
+VALUE = 'value'            # field['value'] (igual que extract_field_value)
+DISPLAY = 'display'        # field['displayValue'] con fallback a value (igual que extract_field_display_value)
+
+# Valor de un campo que no viene en el record
+MISSING = 'N/A'
+
+# Mapeo de los campos del detalle (WorkOrder -> record -> fields): (columna, campo de Aura, modo)
+DETAIL_FIELDS = (
+    ('job_id', 'WorkOrderNumber', VALUE),
+    ('client_id', 'Bank_Brand__r', DISPLAY),
+    ('job_type', 'Work_Order_Type__c', DISPLAY),
+    ('area', 'Zone__c', DISPLAY),
+    ('onsite_datetime', 'On_Site_Start_Time__c', DISPLAY),
+    ('onsite_end_time_iso', 'On_Site_End_Time__c', VALUE),      # ISO, filtro por fecha
+    ('onsite_start_time_iso', 'On_Site_Start_Time__c', VALUE),  # ISO, fallback de los trabajos "On Site"
+    ('device_type', 'WorkType', DISPLAY),
+    ('fix', 'Status', DISPLAY),                                 # Status del work order
+)
+
+# Mapeo del PII (actions[0].returnValue.response.outputVariables): (columna, índice de la variable, clave)
+# Índice None = columna que el flow no entrega (por ahora vacía)
+PII_FIELDS = (
+    ('terminal_id', 0, 'terminal_id_c__c'),
+    ('merchant_name', None, None),
+    ('suburb', 1, 'City'),
+    ('postcode', 1, 'PostalCode'),
+    ('street', 0, 'street__c'),
+)
+
+
+def read_value(field):
+    """Lectura VALUE de un campo presente en el record."""
+    if isinstance(field, dict) and 'value' in field:
+        return field['value']
+    return field
+
+
+def read_display_value(field):
+    """Lectura DISPLAY de un campo presente en el record."""
+    if isinstance(field, dict) and 'displayValue' in field:
+        display_value = field['displayValue']
+        if display_value is not None:
+            return display_value
+        # Si displayValue es None, intentar obtener el value
+        if 'value' in field:
+            value = field['value']
+            # Si value es un dict con Name (lookup), extraerlo
+            if isinstance(value, dict) and 'fields' in value:
+                name_field = value['fields'].get('Name', {})
+                if isinstance(name_field, dict) and 'value' in name_field:
+                    return name_field['value']
+            return value
+        return MISSING
+    return field
+
+
+_READERS = {VALUE: read_value, DISPLAY: read_display_value}
+
+
+def _compile(name, lines, namespace):
+    """Compila el código generado de un extractor y retorna la función."""
+    source = '\n'.join(lines)
+    exec(compile(source, f'<{name}>', 'exec'), namespace)
+    return namespace[name]
+
+
+def compile_record_extractor(spec, name='extract_record_fields'):
+    """
+    Compila un mapeo [(columna, campo de Aura, VALUE | DISPLAY)] en una función fields -> dict.
+
+    El código generado busca cada campo de origen una sola vez y arma el dict de salida en una
+    sola expresión, en el orden del mapeo. Los campos ausentes valen MISSING ('N/A').
+    """
+    sources = {}
+    for column, source, mode in spec:
+        if mode not in _READERS:
+            raise ValueError(f"Modo de lectura desconocido para {column}: {mode}")
+        sources.setdefault(source, f'f{len(sources)}')
+
+    display_sources = {source for _, source, mode in spec if mode == DISPLAY}
+
+    # El caso común (dict con displayValue / value) va en línea; el resto pasa por read_value /
+    # read_display_value, que tienen la semántica completa
+    namespace = {'_absent': object(), '_missing': MISSING,
+                 '_read_value': read_value, '_read_display_value': read_display_value}
+    lines = [f'def {name}(fields):', '    get = fields.get']
+    for source, var in sources.items():
+        lines.append(f'    {var} = get({source!r}, _absent)')
+        if source in display_sources:
+            lines.append(f"    d{var} = {var}.get('displayValue') if {var}.__class__ is dict else None")
+    lines.append('    return {')
+    for column, source, mode in spec:
+        var = sources[source]
+        if mode == VALUE:
+            value = (f"{var}['value'] if {var}.__class__ is dict and 'value' in {var} "
+                     f"else _missing if {var} is _absent else _read_value({var})")
+        else:
+            value = f"d{var} if d{var} is not None else _missing if {var} is _absent else _read_display_value({var})"
+        lines.append(f'        {column!r}: {value},')
+    lines.append('    }')
+    return _compile(name, lines, namespace)
+
+
+def compile_output_variables_extractor(spec, name='extract_output_variables'):
+    """
+    Compila un mapeo [(columna, índice de outputVariables, clave)] en una función
+    output_variables -> dict. Las variables o claves que faltan (o vienen vacías) valen ''.
+    """
+    indexes = sorted({index for _, index, _ in spec if index is not None})
+
+    namespace = {'_empty': {}}
+    lines = [f'def {name}(output_variables):', '    count = len(output_variables)']
+    for index in indexes:
+        lines.append(f"    v{index} = output_variables[{index}].get('value', _empty) if count > {index} else _empty")
+    lines.append('    return {')
+    for column, index, key in spec:
+        value = "''" if index is None else f"v{index}.get({key!r}, '') or ''"
+        lines.append(f'        {column!r}: {value},')
+    lines.append('    }')
+    return _compile(name, lines, namespace)
+
+
+def empty_pii_details():
+    """Resultado de parse_pii_details cuando no hay respuesta PII utilizable."""
+    return {column: '' for column, _, _ in PII_FIELDS}
+
+
+# Compilados una sola vez al importar
+extract_detail_fields = compile_record_extractor(DETAIL_FIELDS, 'extract_detail_fields')
+extract_pii_fields = compile_output_variables_extractor(PII_FIELDS, 'extract_pii_fields')
+
+PII_COLUMNS = tuple(column for column, _, _ in PII_FIELDS)
@@ -4,28 +4,57 @@ Script para generar facturas desde datos de work orders.
 Hace peticiones al servidor para obtener detalles de cada trabajo y genera un HTML con los resultados.
 """
 
+import hashlib
 import json
 import os
-import requests
-from datetime import datetime
+import re
+from datetime import date, datetime
 from pathlib import Path
+from types import MappingProxyType
 from urllib.parse import urlencode
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
 import time
+from aura_client import AuraClient, get_default_client
+from charge_engine import apply_verifone_charges
+from adaptive_concurrency import AIMDController
+from resilience import RequestResilience, RetryPolicy
+from field_extractor import PII_COLUMNS, empty_pii_details, extract_detail_fields, extract_pii_fields
+from raw_archive import ARCHIVE_NAME, append_raw_response
+from raw_capture import RawCapturePolicy
+from raw_writer import RawResponseWriter, get_raw_writer
+from run_catalog import VERIFONE_INVOICE, record_run
+from work_order_cache import WorkOrderCache, extract_work_order_signatures, list_view_fields
+from work_order_record import WorkOrder
 
 # Cargar variables de entorno desde .env
 load_dotenv()
 
+# Número máximo de workers (threads) para las peticiones de detalle/PII
+MAX_WORKERS = 10
 
-def fetch_all_work_order_ids(search_string='', page_size=None):
+# Descriptor de la action getRecord (detalle de un work order)
+GET_RECORD_DESCRIPTOR = "serviceComponent://ui.force.components.controllers.recordGlobalValueProvider.RecordGvpController/ACTION$getRecord"
+
+
+class WorkOrderFetchError(Exception):
+    """La petición de detalle o PII de un work order no obtuvo respuesta (después de los reintentos)."""
+    pass
+
+
+def build_header_request(search_string='', page_size=None, offset=0):
     """
-    Hace una petición al servidor para obtener todos los IDs de work orders.
-    Los IDs se encuentran en: context.globalValueProviders[1].values.records
+    Construye la petición Header (lista de work orders).
 
     Args:
         search_string: Texto para filtrar por nombre de cliente, merchant, etc.
         page_size: Número de registros a obtener (default: desde .env o 50)
+        offset: Posición del primer registro de la página
+
+    Returns:
+        tuple: (url, headers, data) listos para enviar con POST
     """
     url = os.getenv('API_URL_HEADER')
     origin = os.getenv('ORIGIN_URL')
@@ -89,7 +118,7 @@ def fetch_all_work_order_ids(search_string='', page_size=None):
                     "sortBy": None,
                     "getCount": False,
                     "enableRowActions": False,
-                    "offset": 0,
+                    "offset": offset,
                     "searchString": search_string if search_string else None
                 },
                 "storable": True
@@ -129,28 +158,53 @@ def fetch_all_work_order_ids(search_string='', page_size=None):
         'aura.token': os.getenv('AURA_TOKEN_HEADER')
     }
 
+    return url, headers, data
+
+
+def extract_work_order_ids(json_response):
+    """
+    Extrae los IDs de work orders de la respuesta Header.
+    Los IDs son las claves de: context.globalValueProviders[2].values.records
+    """
+    context = json_response.get('context', {})
+    global_value_providers = context.get('globalValueProviders', [])
+
+    if len(global_value_providers) >= 3:
+        # Los records están en el índice 2 (tercer elemento)
+        records = global_value_providers[2].get('values', {}).get('records', {})
+        # Las claves del diccionario 'records' son los IDs
+        work_order_ids = list(records.keys())
+        print(f"   ✓ {len(work_order_ids)} IDs obtenidos desde Header (context.globalValueProviders[2].values.records)")
+        return work_order_ids
+    else:
+        print(f"   ✗ Error: estructura de respuesta inesperada (globalValueProviders tiene {len(global_value_providers)} elementos, se esperaban al menos 3)")
+        return []
+
+
+def fetch_work_order_id_page(search_string='', page_size=None, offset=0, client=None):
+    """
+    Hace una petición Header para obtener una página de IDs de work orders.
+    Los IDs se encuentran en: context.globalValueProviders[2].values.records
+
+    Args:
+        search_string: Texto para filtrar por nombre de cliente, merchant, etc.
+        page_size: Número de registros de la página (default: desde .env o 50)
+        offset: Posición del primer registro de la página
+        client: AuraClient a usar (default: cliente compartido del proceso)
+
+    Returns:
+        tuple: (ids, json_response); ([], None) si la petición falló
+    """
+    url, headers, data = build_header_request(search_string, page_size, offset)
+
     try:
-        print("   Haciendo petición Header para obtener IDs...")
-        response = requests.post(url, headers=headers, data=data)
+        print(f"   Haciendo petición Header para obtener IDs (offset {offset})...")
+        response = (client or get_default_client()).post(url, headers=headers, data=data, endpoint='header')
 
         if response.status_code == 200:
             try:
                 json_response = response.json()
-
-                # Extraer IDs de: context.globalValueProviders[2].values.records
-                context = json_response.get('context', {})
-                global_value_providers = context.get('globalValueProviders', [])
-
-                if len(global_value_providers) >= 3:
-                    # Los records están en el índice 2 (tercer elemento)
-                    records = global_value_providers[2].get('values', {}).get('records', {})
-                    # Las claves del diccionario 'records' son los IDs
-                    work_order_ids = list(records.keys())
-                    print(f"   ✓ {len(work_order_ids)} IDs obtenidos desde Header (context.globalValueProviders[2].values.records)")
-                    return work_order_ids, json_response
-                else:
-                    print(f"   ✗ Error: estructura de respuesta inesperada (globalValueProviders tiene {len(global_value_providers)} elementos, se esperaban al menos 3)")
-                    return [], json_response
+                return extract_work_order_ids(json_response), json_response
             except json.JSONDecodeError as e:
                 print(f"   ✗ Error al decodificar JSON: {e}")
                 return [], None
@@ -162,6 +216,87 @@ def fetch_all_work_order_ids(search_string='', page_size=None):
         return [], None
 
 
+class WorkOrderIdPager:
+    """
+    Estado de la paginación de la lista de work orders (getItems con offset).
+    Lo comparten el iterador síncrono y el asyncio para decidir cuándo parar.
+    """
+
+    def __init__(self, page_size=None, max_records=0, should_stop=None):
+        """
+        Args:
+            page_size: Registros por página (default: HEADER_PAGE_SIZE o 50)
+            max_records: Máximo total de IDs a listar (0 = hasta agotar la lista)
+            should_stop: Callable sin argumentos; si retorna True no se piden más páginas
+                (ej: ya se alcanzó MAX_WORK_ORDERS después del filtro por fecha)
+        """
+        if page_size is None:
+            page_size = int(os.getenv('HEADER_PAGE_SIZE', '50'))
+        if max_records:
+            page_size = min(page_size, max_records)
+        self.page_size = page_size
+        self.max_records = max_records
+        self.should_stop = should_stop
+        self.offset = 0
+        self.seen = set()
+        self.done = False
+
+    def accept(self, page_ids):
+        """Registra una página recibida y retorna los IDs nuevos (sin duplicados y sin pasar max_records)."""
+        new_ids = [wo_id for wo_id in page_ids if wo_id not in self.seen]
+        if self.max_records:
+            new_ids = new_ids[:self.max_records - len(self.seen)]
+        self.seen.update(new_ids)
+
+        if len(page_ids) < self.page_size or not new_ids:
+            # Página incompleta o sin IDs nuevos: la lista se agotó
+            self.done = True
+        elif self.max_records and len(self.seen) >= self.max_records:
+            print(f"   ⚠️  Límite de {self.max_records} registros alcanzado, puede haber más work orders en la lista")
+            self.done = True
+
+        self.offset += self.page_size
+        return new_ids
+
+    def has_more(self):
+        """True mientras haya que pedir otra página."""
+        if not self.done and self.should_stop is not None and self.should_stop():
+            self.done = True
+        return not self.done
+
+
+def iter_work_order_id_pages(search_string='', page_size=None, max_records=0, client=None, should_stop=None):
+    """
+    Recorre la lista de work orders página por página hasta agotarla (o hasta que should_stop() retorne True).
+    Genera (ids_nuevos, json_response) por cada página a medida que llega.
+    """
+    pager = WorkOrderIdPager(page_size, max_records, should_stop)
+
+    while pager.has_more():
+        page_ids, json_response = fetch_work_order_id_page(search_string, pager.page_size, pager.offset, client)
+        if json_response is None:
+            return
+        yield pager.accept(page_ids), json_response
+
+
+def fetch_all_work_order_ids(search_string='', page_size=None, client=None, max_records=0):
+    """
+    Obtiene todos los IDs de work orders recorriendo todas las páginas de la lista.
+
+    Returns:
+        tuple: (ids, json_response de la primera página)
+    """
+    work_order_ids = []
+    first_response = None
+
+    for page_ids, json_response in iter_work_order_id_pages(search_string, page_size, max_records, client):
+        work_order_ids.extend(page_ids)
+        if first_response is None:
+            first_response = json_response
+
+    return work_order_ids, first_response
+
+
 def load_work_order_ids(filename='allWO.json'):
     """Carga los IDs de work orders desde el archivo JSON (método legacy)."""
     with open(filename, 'r') as f:
@@ -206,63 +341,98 @@ def build_cookie_string():
     return cookie_string
 
 
-def fetch_work_order_detail(work_order_id):
-    """Hace una petición al servidor para obtener los detalles de un work order."""
+def build_get_record_action(work_order_id, action_id="199;a"):
+    """Construye una action getRecord para un work order."""
+    return {
+        "id": action_id,
+        "descriptor": GET_RECORD_DESCRIPTOR,
+        "callingDescriptor": "UNKNOWN",
+        "params": {
+            "recordDescriptor": f"{work_order_id}.undefined.FULL.null.null.null.VIEW.true.null.null.null"
+        }
+    }
 
-    url = os.getenv('API_URL')
-    origin = os.getenv('ORIGIN_URL')
-    referer_base = os.getenv('REFERER_BASE_URL')
 
-    headers = {
-        'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
-        'Accept': '*/*',
-        'Origin': origin,
-        'Referer': f'{referer_base}{work_order_id}',
-        'Accept-Language': os.getenv('ACCEPT_LANGUAGE'),
-        'User-Agent': os.getenv('USER_AGENT'),
-        'Cookie': build_cookie_string()
-    }
+def split_batched_detail_response(batch_response, work_order_ids):
+    """
+    Separa la respuesta de un batch getRecord en una respuesta por work order, con la misma
+    estructura que la de una petición individual (la que espera parse_work_order_data).
 
-    # Construir el mensaje con el ID específico
-    message = {
-        "actions": [{
-            "id": "199;a",
-            "descriptor": "serviceComponent://ui.force.components.controllers.recordGlobalValueProvider.RecordGvpController/ACTION$getRecord",
-            "callingDescriptor": "UNKNOWN",
-            "params": {
-                "recordDescriptor": f"{work_order_id}.undefined.FULL.null.null.null.VIEW.true.null.null.null"
-            }
-        }]
-    }
+    Returns:
+        dict: work_order_id -> respuesta, o None si ese ID se debe reintentar con una petición individual
+    """
+    responses = {wo_id: None for wo_id in work_order_ids}
+    if not batch_response:
+        return responses
+
+    actions_by_id = {action.get('id'): action for action in batch_response.get('actions', [])}
+
+    records = {}
+    record_errors = {}
+    for provider in batch_response.get('context', {}).get('globalValueProviders', []):
+        if provider.get('type') == '$Record':
+            records.update(provider.get('values', {}).get('records', {}))
+            record_errors.update(provider.get('values', {}).get('recordErrors', {}))
+
+    for i, wo_id in enumerate(work_order_ids):
+        action = actions_by_id.get(f"{199 + i};a")
+        # La action falló o no vino en la respuesta: se reintentará de forma individual
+        if action is None or action.get('state') not in (None, 'SUCCESS'):
+            continue
+        if wo_id not in records and wo_id not in record_errors:
+            continue
 
-    aura_context = {
-        "mode": "PROD",
-        "fwuid": os.getenv('AURA_FWUID'),
-        "app": "siteforce:communityApp",
-        "loaded": {
-            "APPLICATION@markup://siteforce:communityApp": os.getenv('AURA_APP_VERSION')
-        },
-        "dn": [],
-        "globals": {},
-        "uad": True
-    }
+        values = {'records': {}, 'recordErrors': {}}
+        if wo_id in records:
+            values['records'][wo_id] = records[wo_id]
+        if wo_id in record_errors:
+            values['recordErrors'][wo_id] = record_errors[wo_id]
 
-    # Construir el cuerpo de la petición
-    data = {
-        'message': json.dumps(message),
-        'aura.context': json.dumps(aura_context),
-        'aura.pageURI': f'{os.getenv("AURA_PAGE_URI_BASE")}{work_order_id}',
-        'aura.token': os.getenv('AURA_TOKEN')
-    }
+        responses[wo_id] = {
+            'actions': [action],
+            'context': {'globalValueProviders': [{'type': '$Record', 'values': values}]}
+        }
+
+    return responses
+
+
+def fetch_work_order_details_batch(work_order_ids, client=None):
+    """
+    Obtiene el detalle de varios work orders en un solo POST.
+
+    Returns:
+        dict: work_order_id -> respuesta (None para los IDs que deben pedirse individualmente)
+    """
+    url, headers, data = request_factory_for(client).detail_batch_request(work_order_ids)
 
     try:
-        response = requests.post(url, headers=headers, data=data)
+        response = (client or get_default_client()).post(url, headers=headers, data=data, endpoint='detail_batch')
+
+        if response.status_code == 200:
+            try:
+                return split_batched_detail_response(response.json(), work_order_ids)
+            except json.JSONDecodeError as e:
+                print(f"   ⚠️  Error decodificando JSON del batch de {len(work_order_ids)} work orders: {e}, se usarán peticiones individuales")
+        else:
+            print(f"   ⚠️  Batch de {len(work_order_ids)} work orders falló (Status {response.status_code}), se usarán peticiones individuales")
+    except Exception as e:
+        print(f"   ⚠️  Excepción en batch de {len(work_order_ids)} work orders: {e}, se usarán peticiones individuales")
+
+    return split_batched_detail_response(None, work_order_ids)
+
+
+def fetch_work_order_detail(work_order_id, client=None):
+    """Hace una petición al servidor para obtener los detalles de un work order."""
+    url, headers, data = request_factory_for(client).detail_request(work_order_id)
+
+    try:
+        response = (client or get_default_client()).post(url, headers=headers, data=data, endpoint='detail')
 
         if response.status_code == 200:
             try:
                 return response.json()
             except json.JSONDecodeError as e:
-                # Silenciar errores en modo paralelo, se reportarán en process_single_work_order
+                # Silenciar errores en modo paralelo, se reportan en fetch_detail_stage
                 return None
         else:
             return None
@@ -271,71 +441,174 @@ def fetch_work_order_detail(work_order_id):
         return None
 
 
-def fetch_work_order_pii_details(work_order_id):
-    """Hace una segunda petición al servidor para obtener los detalles PII de un work order."""
+class AuraRequestFactory:
+    """
+    Plantillas de las peticiones Detail (getRecord) y PII (startFlow) congeladas para una ejecución.
 
-    url = os.getenv('API_URL_PII')
-    origin = os.getenv('ORIGIN_URL')
+    Las variables de entorno, las cookies y el aura.context (JSON) se leen una sola vez, la primera
+    vez que se usa cada tipo de petición; por cada work order solo se insertan los campos que
+    dependen del ID (mensaje, Referer, pageURI y nonce). Los motores crean una al empezar la
+    ejecución y la comparten a través del cliente (client.request_factory).
+    """
 
-    # Generar nonce único para esta petición
-    import hashlib
-    import time
-    nonce = hashlib.sha256(f"{work_order_id}{time.time()}".encode()).hexdigest()
+    # Marcador que se reemplaza por el ID del work order en los mensajes serializados
+    ID_PLACEHOLDER = '__WORK_ORDER_ID__'
+    ACTION_ID_PLACEHOLDER = '__ACTION_ID__'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._detail = None
+        self._pii = None
+
+    def _detail_template(self):
+        with self._lock:
+            if self._detail is None:
+                aura_context = {
+                    "mode": "PROD",
+                    "fwuid": os.getenv('AURA_FWUID'),
+                    "app": "siteforce:communityApp",
+                    "loaded": {
+                        "APPLICATION@markup://siteforce:communityApp": os.getenv('AURA_APP_VERSION')
+                    },
+                    "dn": [],
+                    "globals": {},
+                    "uad": True
+                }
+                message = json.dumps({"actions": [build_get_record_action(self.ID_PLACEHOLDER)]})
+                action = json.dumps(build_get_record_action(self.ID_PLACEHOLDER, self.ACTION_ID_PLACEHOLDER))
+                self._detail = {
+                    'url': os.getenv('API_URL'),
+                    'headers': MappingProxyType({
+                        'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+                        'Accept': '*/*',
+                        'Origin': os.getenv('ORIGIN_URL'),
+                        'Accept-Language': os.getenv('ACCEPT_LANGUAGE'),
+                        'User-Agent': os.getenv('USER_AGENT'),
+                        'Cookie': build_cookie_string()
+                    }),
+                    'referer_base': os.getenv('REFERER_BASE_URL'),
+                    'message': tuple(message.split(self.ID_PLACEHOLDER)),
+                    'action': action,
+                    'context': json.dumps(aura_context),
+                    'page_uri_base': os.getenv("AURA_PAGE_URI_BASE"),
+                    'token': os.getenv('AURA_TOKEN')
+                }
+            return self._detail
+
+    def _pii_template(self):
+        with self._lock:
+            if self._pii is None:
+                app_pii = os.getenv('AURA_APP_PII')
+                aura_context = {
+                    "mode": "PROD",
+                    "fwuid": os.getenv('AURA_FWUID_PII'),
+                    "app": app_pii,
+                    "loaded": {
+                        f"APPLICATION@markup://{app_pii}": os.getenv('AURA_APP_VERSION_PII')
+                    },
+                    "dn": [],
+                    "globals": {},
+                    "uad": True
+                }
+                message = {
+                    "actions": [{
+                        "id": "69;a",
+                        "descriptor": "aura://FlowRuntimeConnectController/ACTION$startFlow",
+                        "callingDescriptor": "UNKNOWN",
+                        "params": {
+                            "flowDevName": os.getenv('FLOW_DEV_NAME'),
+                            "arguments": f'[{{"name":"recordId","type":"String","value":"{self.ID_PLACEHOLDER}"}}]',
+                            "enableTrace": False,
+                            "enableRollbackMode": False,
+                            "debugAsUserId": "",
+                            "useLatestSubflow": False,
+                            "isBuilderDebug": False
+                        }
+                    }]
+                }
+                origin = os.getenv('ORIGIN_URL')
+                self._pii = {
+                    'url': os.getenv('API_URL_PII'),
+                    'origin': origin,
+                    'headers': MappingProxyType({
+                        'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+                        'Accept': '*/*',
+                        'Origin': origin,
+                        'Accept-Language': os.getenv('ACCEPT_LANGUAGE'),
+                        'User-Agent': os.getenv('USER_AGENT'),
+                        'Cookie': build_cookie_string()
+                    }),
+                    'message': tuple(json.dumps(message).split(self.ID_PLACEHOLDER)),
+                    'context': json.dumps(aura_context),
+                    'token': os.getenv('AURA_TOKEN_PII')
+                }
+            return self._pii
 
-    # Construir pageURI completo con todos los parámetros
-    page_uri = f"/verifonefs/VF_DisplayPIIDetailsWorkOrderPage?id={work_order_id}&tour=&isdtp=p1&sfdcIFrameOrigin={origin}&sfdcIFrameHost=web&nonce={nonce}&ltn_app_id=&clc=0"
-    referer = f"{origin}{page_uri}"
+    def detail_request(self, work_order_id):
+        """Petición de detalle (getRecord) de un work order. Retorna (url, headers, data)."""
+        template = self._detail_template()
 
-    headers = {
-        'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
-        'Accept': '*/*',
-        'Origin': origin,
-        'Referer': referer,
-        'Accept-Language': os.getenv('ACCEPT_LANGUAGE'),
-        'User-Agent': os.getenv('USER_AGENT'),
-        'Cookie': build_cookie_string()
-    }
+        headers = dict(template['headers'])
+        headers['Referer'] = f"{template['referer_base']}{work_order_id}"
 
-    # Construir el mensaje con el ID específico para la petición PII
-    message = {
-        "actions": [{
-            "id": "69;a",
-            "descriptor": "aura://FlowRuntimeConnectController/ACTION$startFlow",
-            "callingDescriptor": "UNKNOWN",
-            "params": {
-                "flowDevName": os.getenv('FLOW_DEV_NAME'),
-                "arguments": f'[{{"name":"recordId","type":"String","value":"{work_order_id}"}}]',
-                "enableTrace": False,
-                "enableRollbackMode": False,
-                "debugAsUserId": "",
-                "useLatestSubflow": False,
-                "isBuilderDebug": False
-            }
-        }]
-    }
+        data = {
+            'message': work_order_id.join(template['message']),
+            'aura.context': template['context'],
+            'aura.pageURI': f"{template['page_uri_base']}{work_order_id}",
+            'aura.token': template['token']
+        }
+        return template['url'], headers, data
 
-    aura_context = {
-        "mode": "PROD",
-        "fwuid": os.getenv('AURA_FWUID_PII'),
-        "app": os.getenv('AURA_APP_PII'),
-        "loaded": {
-            f"APPLICATION@markup://{os.getenv('AURA_APP_PII')}": os.getenv('AURA_APP_VERSION_PII')
-        },
-        "dn": [],
-        "globals": {},
-        "uad": True
-    }
+    def detail_batch_request(self, work_order_ids):
+        """Una petición getRecord con una action "<199 + i>;a" por work order. Retorna (url, headers, data)."""
+        # Headers, contexto y pageURI se toman del primer work order del batch
+        url, headers, data = self.detail_request(work_order_ids[0])
+
+        action = self._detail_template()['action']
+        actions = [
+            action.replace(self.ID_PLACEHOLDER, wo_id).replace(self.ACTION_ID_PLACEHOLDER, f"{199 + i};a")
+            for i, wo_id in enumerate(work_order_ids)
+        ]
+        data['message'] = '{"actions": [' + ', '.join(actions) + ']}'
+        return url, headers, data
+
+    def pii_request(self, work_order_id):
+        """Petición PII (flow VF_DisplayPIIDetailsWorkOrderPage) de un work order. Retorna (url, headers, data)."""
+        template = self._pii_template()
+        origin = template['origin']
+
+        # Generar nonce único para esta petición
+        nonce = hashlib.sha256(f"{work_order_id}{time.time()}".encode()).hexdigest()
+
+        # Construir pageURI completo con todos los parámetros
+        page_uri = f"/verifonefs/VF_DisplayPIIDetailsWorkOrderPage?id={work_order_id}&tour=&isdtp=p1&sfdcIFrameOrigin={origin}&sfdcIFrameHost=web&nonce={nonce}&ltn_app_id=&clc=0"
+
+        headers = dict(template['headers'])
+        headers['Referer'] = f"{origin}{page_uri}"
+
+        data = {
+            'message': work_order_id.join(template['message']),
+            'aura.context': template['context'],
+            'aura.pageURI': page_uri,
+            'aura.token': template['token']
+        }
+        return template['url'], headers, data
+
+
+def request_factory_for(client):
+    """
+    Fábrica de peticiones de la ejecución asociada al cliente. Sin cliente de ejecución (cliente
+    compartido del proceso) se crea una nueva, de forma que siempre se usan las credenciales actuales.
+    """
+    return getattr(client, 'request_factory', None) or AuraRequestFactory()
 
-    # Construir el cuerpo de la petición
-    data = {
-        'message': json.dumps(message),
-        'aura.context': json.dumps(aura_context),
-        'aura.pageURI': page_uri,
-        'aura.token': os.getenv('AURA_TOKEN_PII')
-    }
+
+def fetch_work_order_pii_details(work_order_id, client=None):
+    """Hace una segunda petición al servidor para obtener los detalles PII de un work order."""
+    url, headers, data = request_factory_for(client).pii_request(work_order_id)
 
     try:
-        response = requests.post(url, headers=headers, data=data)
+        response = (client or get_default_client()).post(url, headers=headers, data=data, endpoint='pii')
 
         if response.status_code == 200:
             try:
@@ -352,76 +625,103 @@ def fetch_work_order_pii_details(work_order_id):
         return None
 
 
-def calculate_after_hour(onsite_datetime_str):
+def parse_onsite_datetime(onsite_datetime_str):
+    """
+    Parser dedicado del formato fijo de OnSiteDateTime: "26/08/2025 3:46 PM".
+    Equivale a datetime.strptime(s, '%d/%m/%Y %I:%M %p') pero sin el costo de strptime.
+
+    Returns:
+        datetime, o None si el string está vacío, es 'N/A' o no tiene el formato esperado
+    """
+    if not onsite_datetime_str or onsite_datetime_str == 'N/A' or onsite_datetime_str != onsite_datetime_str.strip():
+        return None
+
+    try:
+        date_part, time_part, meridiem = onsite_datetime_str.split()
+        day, month, year = date_part.split('/')
+        hour, minute = time_part.split(':')
+        # Mismos campos que acepta strptime: solo dígitos ASCII (int() acepta signos, '_' y dígitos
+        # Unicode), día / mes / hora / minuto de 1 o 2 dígitos y año de 4
+        for field, max_length in ((day, 2), (month, 2), (year, 4), (hour, 2), (minute, 2)):
+            if not (field.isascii() and field.isdigit()) or len(field) > max_length:
+                return None
+        hour = int(hour)
+        meridiem = meridiem.upper()
+        if len(year) != 4 or not 1 <= hour <= 12 or meridiem not in ('AM', 'PM'):
+            return None
+
+        # 12 AM = 00 h, 12 PM = 12 h
+        hour = hour % 12 + (12 if meridiem == 'PM' else 0)
+        # El constructor valida rangos (ej: 31/02)
+        return datetime(int(year), int(month), int(day), hour, int(minute))
+    except ValueError:
+        return None
+
+
+def onsite_timestamp(wo):
+    """
+    OnSiteDateTime del work order como 'YYYY-MM-DDTHH:MM' ('' si no tiene fecha válida).
+
+    parse_work_order_data lo calcula una sola vez ('onsite_timestamp'); los registros guardados
+    antes (cache) se parsean aquí.
+    """
+    timestamp = wo.get('onsite_timestamp')
+    if timestamp is None:
+        dt = parse_onsite_datetime(wo.get('onsite_datetime', ''))
+        timestamp = dt.isoformat(timespec='minutes') if dt else ''
+    return timestamp
+
+
+def calculate_after_hour(onsite_datetime):
     """
     Calcula si el trabajo fue fuera de horario (after hours).
     After hour = entre 6pm y 6am
+
+    Args:
+        onsite_datetime: String "26/08/2025 3:46 PM" o datetime ya parseado
     """
-    if not onsite_datetime_str or onsite_datetime_str == 'N/A':
+    dt = onsite_datetime if isinstance(onsite_datetime, datetime) else parse_onsite_datetime(onsite_datetime)
+    if dt is None:
         return 'N/A'
 
-    try:
-        from datetime import datetime
-        # El formato es: "26/08/2025 3:46 PM"
-        dt = datetime.strptime(onsite_datetime_str, '%d/%m/%Y %I:%M %p')
-        hour = dt.hour
-
-        # After hours: >= 18:00 (6pm) o < 6:00 (6am)
-        if hour >= 18 or hour < 6:
-            return 'YES'
-        else:
-            return 'NO'
-    except:
-        return 'N/A'
+    # After hours: >= 18:00 (6pm) o < 6:00 (6am)
+    if dt.hour >= 18 or dt.hour < 6:
+        return 'YES'
+    else:
+        return 'NO'
 
 
-def calculate_weekend(onsite_datetime_str):
+def calculate_weekend(onsite_datetime):
     """
     Calcula si el trabajo fue en fin de semana.
     Weekend = Sábado (5) o Domingo (6)
+
+    Args:
+        onsite_datetime: String "26/08/2025 3:46 PM" o datetime ya parseado
     """
-    if not onsite_datetime_str or onsite_datetime_str == 'N/A':
+    dt = onsite_datetime if isinstance(onsite_datetime, datetime) else parse_onsite_datetime(onsite_datetime)
+    if dt is None:
         return 'N/A'
 
-    try:
-        from datetime import datetime
-        # El formato es: "26/08/2025 3:46 PM"
-        dt = datetime.strptime(onsite_datetime_str, '%d/%m/%Y %I:%M %p')
-        weekday = dt.weekday()  # 0=Monday, 6=Sunday
-
-        # Weekend: Sábado (5) o Domingo (6)
-        if weekday >= 5:
-            return 'YES'
-        else:
-            return 'NO'
-    except:
-        return 'N/A'
+    # Weekend: Sábado (5) o Domingo (6)
+    if dt.weekday() >= 5:
+        return 'YES'
+    else:
+        return 'NO'
 
 
 def parse_pii_details(pii_response, work_order_id=''):
-    """Extrae la información PII de la segunda petición."""
+    """Extrae la información PII de la segunda petición (mapeo PII_FIELDS de field_extractor.py)."""
     if not pii_response:
         print(f"   ⚠️  No hay respuesta PII para {work_order_id}")
-        return {
-            'terminal_id': '',
-            'merchant_name': '',
-            'suburb': '',
-            'postcode': '',
-            'street': ''
-        }
+        return empty_pii_details()
 
     try:
         # Navegar por la estructura: actions[0].returnValue.response.outputVariables
         actions = pii_response.get('actions', [])
         if not actions:
             print(f"   ⚠️  No hay 'actions' en respuesta PII para {work_order_id}")
-            return {
-                'terminal_id': '',
-                'merchant_name': '',
-                'suburb': '',
-                'postcode': '',
-                'street': ''
-            }
+            return empty_pii_details()
 
         return_value = actions[0].get('returnValue', {})
         response = return_value.get('response', {})
@@ -431,47 +731,18 @@ def parse_pii_details(pii_response, work_order_id=''):
         if not output_variables:
             print(f"   ⚠️  No hay 'outputVariables' en respuesta PII para {work_order_id}")
 
-        # Extraer los datos según el mapeo especificado
-        terminal_id = ''
-        suburb = ''
-        postcode = ''
-        merchant_name = ''  # Por ahora vacío según especificación
-        street = ''
-
-        # outputVariables[0] contiene terminal_id_c__c y street__c
-        if len(output_variables) > 0:
-            var_0_value = output_variables[0].get('value', {})
-            terminal_id = var_0_value.get('terminal_id_c__c', '')
-            street = var_0_value.get('street__c', '')
-
-        # outputVariables[1] contiene City y PostalCode
-        if len(output_variables) > 1:
-            var_1_value = output_variables[1].get('value', {})
-            suburb = var_1_value.get('City', '')
-            postcode = var_1_value.get('PostalCode', '')
+        # outputVariables[0] contiene terminal_id_c__c y street__c; outputVariables[1] City y PostalCode
+        pii_data = extract_pii_fields(output_variables)
 
         # Debug: mostrar lo que se extrajo
-        extracted_count = sum([1 for x in [terminal_id, street, suburb, postcode] if x])
-        if extracted_count == 0:
+        if not any(pii_data.values()):
             print(f"   ⚠️  No se extrajeron datos PII para {work_order_id} (outputVariables: {len(output_variables)})")
 
-        return {
-            'terminal_id': terminal_id if terminal_id else '',
-            'merchant_name': merchant_name,
-            'suburb': suburb if suburb else '',
-            'postcode': postcode if postcode else '',
-            'street': street if street else ''
-        }
+        return pii_data
 
     except Exception as e:
         print(f"   ⚠️  Error parseando PII para {work_order_id}: {e}")
-        return {
-            'terminal_id': '',
-            'merchant_name': '',
-            'suburb': '',
-            'postcode': '',
-            'street': ''
-        }
+        return empty_pii_details()
 
 
 def parse_work_order_data(api_response, work_order_id):
@@ -488,7 +759,7 @@ def parse_work_order_data(api_response, work_order_id):
             if provider.get('type') == '$Record':
                 record_errors = provider.get('values', {}).get('recordErrors', {})
                 if work_order_id in record_errors:
-                    # Error de acceso - será reportado por process_single_work_order
+                    # Error de acceso - será reportado por fetch_detail_stage
                     return None
 
                 # Buscar el record en records
@@ -500,84 +771,44 @@ def parse_work_order_data(api_response, work_order_id):
                     record = work_order.get('record', {})
                     fields = record.get('fields', {})
 
-                    # Extraer los campos según el mapeo especificado
-                    job_id = extract_field_value(fields, 'WorkOrderNumber')
-                    fsp = ''  # Vacío por ahora
-                    client_id = extract_field_display_value(fields, 'Bank_Brand__r')
-                    job_type = extract_field_display_value(fields, 'Work_Order_Type__c')
-                    # terminal_id, suburb, postcode y merchant_name se obtendrán de la segunda petición
-                    terminal_id = ''
-                    required_by = ''  # Vacío por ahora
-                    merchant_name = ''
-                    suburb = ''
-                    postcode = ''
-                    area = extract_field_display_value(fields, 'Zone__c')
-                    onsite_datetime = extract_field_display_value(fields, 'On_Site_Start_Time__c')
-
-                    # Extract On_Site_End_Time__c value (ISO format) for date filtering
-                    onsite_end_time_iso = extract_field_value(fields, 'On_Site_End_Time__c')
-
-                    # Extract On_Site_Start_Time__c value (ISO format) as fallback for "On Site" jobs
-                    onsite_start_time_iso = extract_field_value(fields, 'On_Site_Start_Time__c')
-
-                    device_type = extract_field_display_value(fields, 'WorkType')
-                    project_no = ''  # Vacío por ahora
-                    billable = ''  # Vacío por ahora
-                    fix = extract_field_display_value(fields, 'Status')  # Status del work order
-                    sla_met = ''  # Vacío por ahora
-                    multiple_job_id = ''  # Vacío por ahora
-                    extra_time = ''  # Vacío por ahora
+                    # Extraer los campos según el mapeo DETAIL_FIELDS (una sola pasada por el record).
+                    # terminal_id, suburb, postcode, merchant_name y street se obtienen de la segunda
+                    # petición; fsp, required_by, project_no, billable, ... quedan vacíos por ahora
+                    result = extract_detail_fields(fields)
+                    client_id = result['client_id']
+                    device_type = result['device_type']
 
                     # Si ClientID está vacío, es "N/A", o es "NONE", usar las 3 primeras letras de DeviceType
                     # Esto ocurre comúnmente con el banco CBA
                     if (not client_id or client_id == 'N/A' or client_id.upper() == 'NONE') and device_type and device_type != 'N/A':
-                        client_id = device_type[:3].upper()
+                        result['client_id'] = device_type[:3].upper()
+
+                    # OnSiteDateTime se parsea una sola vez; las etapas siguientes usan onsite_timestamp
+                    onsite_dt = parse_onsite_datetime(result['onsite_datetime'])
+                    result['onsite_timestamp'] = onsite_dt.isoformat(timespec='minutes') if onsite_dt else ''
 
                     # Calcular After Hour y Weekend basados en OnSiteDateTime
-                    after_hour = calculate_after_hour(onsite_datetime)
-                    weekend = calculate_weekend(onsite_datetime)
+                    result['after_hour'] = calculate_after_hour(onsite_dt)
+                    result['weekend'] = calculate_weekend(onsite_dt)
 
-                    extratime_block = ''  # Vacío por ahora
-                    charge = ''  # Vacío por ahora
+                    # Fecha del filtro por rango (YYYY-MM-DD, '' sin fecha, None si no se pudo parsear)
+                    try:
+                        filter_date = get_filter_date(result['onsite_end_time_iso'], result['onsite_start_time_iso'])
+                        result['filter_date'] = filter_date.isoformat() if filter_date else ''
+                    except (ValueError, AttributeError):
+                        result['filter_date'] = None
 
                     # Detectar si el trabajo está en estado "On Site"
-                    is_onsite = (fix == 'On Site')
-
-                    result = {
-                        'job_id': job_id,
-                        'fsp': fsp,
-                        'client_id': client_id,
-                        'job_type': job_type,
-                        'terminal_id': terminal_id,
-                        'required_by': required_by,
-                        'merchant_name': merchant_name,
-                        'suburb': suburb,
-                        'postcode': postcode,
-                        'area': area,
-                        'onsite_datetime': onsite_datetime,
-                        'onsite_end_time_iso': onsite_end_time_iso,  # ISO format for filtering
-                        'onsite_start_time_iso': onsite_start_time_iso,  # Fallback for "On Site" jobs
-                        'device_type': device_type,
-                        'project_no': project_no,
-                        'billable': billable,
-                        'fix': fix,
-                        'is_onsite': is_onsite,  # Flag para identificar trabajos onsite
-                        'sla_met': sla_met,
-                        'multiple_job_id': multiple_job_id,
-                        'extra_time': extra_time,
-                        'after_hour': after_hour,
-                        'weekend': weekend,
-                        'extratime_block': extratime_block,
-                        'charge': charge,
-                        'street': ''  # Se llenará con la segunda petición
-                    }
-                    return result
+                    result['is_onsite'] = (result['fix'] == 'On Site')
+
+                    # Registro compacto (__slots__, categóricos internados) con interfaz de dict
+                    return WorkOrder.from_dict(result)
 
         # No se encontraron datos en la estructura esperada
         return None
 
     except Exception as e:
-        # Error al parsear - será reportado por process_single_work_order
+        # Error al parsear - será reportado por fetch_detail_stage
         return None
 
 
@@ -611,62 +842,314 @@ def extract_field_display_value(fields, field_name):
     return 'N/A'
 
 
-def process_single_work_order(wo_id, output_folder, index, total):
+def save_raw_response(output_folder, kind, wo_id, response, failed=False):
     """
-    Procesa un único work order: hace dos peticiones, guarda las respuestas y parsea los datos.
-    Esta función se ejecutará en paralelo para múltiples work orders.
+    Guarda la respuesta raw de una petición para debug en el archivo de la ejecución
+    (raw_responses.ndjson.gz, kind = 'header', 'detail' o 'pii').
+    Si hay un RawResponseWriter activo para la carpeta (motores), solo se encola y su
+    RawCapturePolicy decide si se guarda (failed = la respuesta no se pudo parsear).
     """
-    try:
-        # Hacer la primera petición
-        api_response = fetch_work_order_detail(wo_id)
-
-        # Guardar la respuesta raw para debug
-        if api_response:
-            debug_file = output_folder / f'raw_response_{wo_id}.json'
-            with open(debug_file, 'w') as f:
-                json.dump(api_response, f, indent=2)
-
-        # Parsear los datos de la primera petición
-        parsed_data = parse_work_order_data(api_response, wo_id)
-
-        # Si la primera petición fue exitosa, hacer la segunda petición
-        if parsed_data:
-            pii_response = fetch_work_order_pii_details(wo_id)
-
-            # Guardar la respuesta PII raw para debug
-            if pii_response:
-                pii_debug_file = output_folder / f'raw_pii_response_{wo_id}.json'
-                with open(pii_debug_file, 'w') as f:
-                    json.dump(pii_response, f, indent=2)
-
-            # Parsear los datos PII de la segunda petición
-            pii_data = parse_pii_details(pii_response, wo_id)
-
-            # Combinar los datos de ambas peticiones
-            parsed_data['terminal_id'] = pii_data['terminal_id']
-            parsed_data['merchant_name'] = pii_data['merchant_name']
-            parsed_data['suburb'] = pii_data['suburb']
-            parsed_data['postcode'] = pii_data['postcode']
-            parsed_data['street'] = pii_data['street']
-
-        # Retornar resultado con información de progreso
-        return {
-            'index': index,
-            'total': total,
-            'wo_id': wo_id,
-            'data': parsed_data,
-            'success': parsed_data is not None
-        }
-    except Exception as e:
-        print(f"   ⚠️  Error procesando {wo_id}: {e}")
-        return {
-            'index': index,
-            'total': total,
-            'wo_id': wo_id,
-            'data': None,
-            'success': False,
-            'error': str(e)
-        }
+    writer = get_raw_writer(output_folder)
+    if writer is not None:
+        writer.submit(kind, wo_id, response, failed)
+    elif response:
+        append_raw_response(output_folder, kind, wo_id, response)
+
+
+def pii_parse_failed(pii_data):
+    """True si parse_pii_details no extrajo ningún campo de la respuesta."""
+    return not any(pii_data.values())
+
+
+def merge_pii_data(parsed_data, pii_data):
+    """Combina los datos PII (segunda petición) en el work order parseado."""
+    for column in PII_COLUMNS:
+        parsed_data[column] = pii_data[column]
+    return parsed_data
+
+
+def build_work_order_result(wo_id, index, total, data, error=None):
+    """Resultado de un work order con información de progreso (formato común de todos los motores)."""
+    result = {
+        'index': index,
+        'total': total,
+        'wo_id': wo_id,
+        # Los datos del cache llegan como dict (JSON): se convierten al registro compacto
+        'data': WorkOrder.from_dict(data) if data is not None else None,
+        'success': data is not None
+    }
+    if error is not None:
+        result['error'] = error
+    return result
+
+
+def fetch_detail_stage(wo_id, output_folder, client=None, api_response=None, raise_on_failure=False):
+    """
+    Etapa 1: obtiene el detalle (getRecord) de un work order, guarda la respuesta raw y la parsea.
+    Si api_response viene de un batch getRecord, se omite la petición.
+
+    Con raise_on_failure, si el servidor no respondió se lanza WorkOrderFetchError para que
+    el motor re-encole el work order en lugar de descartarlo.
+
+    Returns:
+        dict con los datos parseados, o None si no se pudo obtener/parsear
+    """
+    if api_response is None:
+        api_response = fetch_work_order_detail(wo_id, client=client)
+        if api_response is None and raise_on_failure:
+            raise WorkOrderFetchError(f"Sin respuesta de detalle para {wo_id}")
+
+    parsed_data = parse_work_order_data(api_response, wo_id)
+
+    # Guardar la respuesta raw para debug (según la política de captura)
+    save_raw_response(output_folder, 'detail', wo_id, api_response, failed=parsed_data is None)
+    return parsed_data
+
+
+def fetch_pii_stage(wo_id, parsed_data, output_folder, client=None, cache=None, signature=None,
+                    raise_on_failure=False):
+    """
+    Etapa 2: obtiene los detalles PII de un work order ya parseado y los combina en parsed_data.
+    Si se pasa un cache, el work order completo se guarda en él (solo si la petición PII respondió).
+
+    Con raise_on_failure, si el servidor no respondió se lanza WorkOrderFetchError (para re-encolar);
+    sin él, el work order se entrega con los campos PII vacíos.
+    """
+    pii_response = fetch_work_order_pii_details(wo_id, client=client)
+    if pii_response is None and raise_on_failure:
+        raise WorkOrderFetchError(f"Sin respuesta PII para {wo_id}")
+
+    # Parsear los datos PII de la segunda petición y combinar ambas peticiones
+    pii_data = parse_pii_details(pii_response, wo_id)
+    merge_pii_data(parsed_data, pii_data)
+
+    # Guardar la respuesta PII raw para debug (según la política de captura)
+    save_raw_response(output_folder, 'pii', wo_id, pii_response, failed=pii_parse_failed(pii_data))
+
+    if cache is not None and pii_response:
+        cache.put(wo_id, signature, parsed_data)
+    return parsed_data
+
+
+class ThreadedFetchEngine:
+    """
+    Motor de peticiones basado en threads (motor por defecto).
+
+    El procesamiento se divide en dos etapas con tamaño independiente, conectadas por una cola acotada:
+    - Detalle: max_workers threads piden y parsean el getRecord de cada work order
+    - PII: pii_workers threads toman los work orders parseados de la cola y piden el flow PII
+    Cuando la cola está llena la etapa de detalle espera (backpressure) en lugar de acumular registros.
+
+    Con un WorkOrderCache los work orders vigentes se entregan sin pasar por ninguna de las dos etapas.
+    Con un AIMDController los threads son el máximo y el cliente limita las peticiones en vuelo al límite actual.
+    Con una RawCapturePolicy solo se archivan las respuestas raw que la política selecciona.
+
+    Un work order cuya petición de detalle o PII falla (tras los reintentos del cliente) se vuelve
+    a encolar en su etapa después de un backoff, hasta requeue_limit veces.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, detail_batch_size=1, pii_workers=None, pii_queue_size=None,
+                 cache=None, controller=None, resilience=None, requeue_limit=None, capture=None):
+        if requeue_limit is None:
+            requeue_limit = int(os.getenv('WO_REQUEUE_LIMIT', '2'))
+
+        self.max_workers = max_workers
+        self.capture = capture
+        self.requeue_limit = requeue_limit
+        self.requeue_policy = RetryPolicy(base_delay=float(os.getenv('WO_REQUEUE_DELAY', '2')))
+        self.requeued = 0
+        self.cache = cache
+        self.controller = controller
+        # Firma de cambio de cada work order según la list view (para la frescura del cache)
+        self.signatures = {}
+        self.detail_batch_size = max(1, detail_batch_size)
+        self.pii_workers = pii_workers or max_workers
+        self.pii_queue_size = pii_queue_size or 2 * self.pii_workers
+        # Cliente HTTP compartido por las dos etapas (pool keep-alive).
+        # Una conexión extra para que el listado paginado no espere a los workers.
+        # Las plantillas de petición (cookies, headers, aura.context) se congelan al inicio de la ejecución
+        self.client = AuraClient(pool_size=self.max_workers + self.pii_workers + 1, controller=controller,
+                                 resilience=resilience, request_factory=AuraRequestFactory())
+
+    def fetch_all_work_order_ids(self, search_string='', page_size=None, max_records=0):
+        return fetch_all_work_order_ids(search_string=search_string, page_size=page_size,
+                                        client=self.client, max_records=max_records)
+
+    def process_work_orders(self, work_order_ids, output_folder, on_result):
+        """Procesa los work orders en paralelo y llama on_result(result) a medida que se completan."""
+        self._run([work_order_ids], output_folder, on_result)
+
+    def list_and_process_work_orders(self, search_string, page_size, max_records, output_folder, on_page, on_result,
+                                     should_stop=None):
+        """
+        Lista los work orders página por página y envía cada página a los workers en cuanto llega,
+        de forma que las peticiones de detalle/PII se solapan con el listado.
+
+        on_page(page_ids, json_response) retorna los IDs de la página que se deben procesar;
+        should_stop() (opcional) se consulta antes de pedir cada página siguiente.
+        """
+        def pages():
+            for page_ids, json_response in iter_work_order_id_pages(search_string, page_size, max_records, self.client,
+                                                                    should_stop):
+                self.signatures.update(extract_work_order_signatures(json_response))
+                yield on_page(page_ids, json_response)
+
+        self._run(pages(), output_folder, on_result)
+
+    def _run(self, id_pages, output_folder, on_result):
+        """
+        Envía a la etapa de detalle cada grupo de IDs de id_pages a medida que se generan.
+        En modo batch los detalles se piden en grupos de detail_batch_size IDs por POST.
+        Los resultados se entregan a on_result desde este thread, en orden de finalización.
+        Las respuestas raw se escriben desde un RawResponseWriter (los workers no esperan al disco).
+        """
+        pii_queue = queue.Queue(maxsize=self.pii_queue_size)
+        results = queue.Queue()
+
+        def pii_worker():
+            while True:
+                item = pii_queue.get()
+                if item is None:
+                    return
+                wo_id, index, total, parsed_data, attempt = item
+                try:
+                    fetch_pii_stage(wo_id, parsed_data, output_folder, self.client,
+                                    self.cache, self.signatures.get(wo_id), attempt < self.requeue_limit)
+                    results.put(build_work_order_result(wo_id, index, total, parsed_data))
+                except WorkOrderFetchError:
+                    self._requeue(pii_queue.put, (wo_id, index, total, parsed_data, attempt + 1), attempt)
+                except Exception as e:
+                    print(f"   ⚠️  Error procesando {wo_id}: {e}")
+                    results.put(build_work_order_result(wo_id, index, total, None, str(e)))
+
+        def detail_task(wo_id, index, total, api_response=None, attempt=0):
+            try:
+                parsed_data = fetch_detail_stage(wo_id, output_folder, self.client, api_response,
+                                                 attempt < self.requeue_limit)
+            except WorkOrderFetchError:
+                self._requeue(lambda args: executor.submit(detail_task, *args),
+                              (wo_id, index, total, None, attempt + 1), attempt)
+                return
+            except Exception as e:
+                print(f"   ⚠️  Error procesando {wo_id}: {e}")
+                results.put(build_work_order_result(wo_id, index, total, None, str(e)))
+                return
+
+            if parsed_data:
+                # Bloquea si la etapa PII va atrasada (cola llena)
+                pii_queue.put((wo_id, index, total, parsed_data, 0))
+            else:
+                results.put(build_work_order_result(wo_id, index, total, None))
+
+        def detail_batch_task(batch, total):
+            responses = fetch_work_order_details_batch([wo_id for _, wo_id in batch], self.client)
+            for index, wo_id in batch:
+                detail_task(wo_id, index, total, responses.get(wo_id))
+
+        raw_writer = RawResponseWriter(output_folder, capture=self.capture).start()
+        pii_threads = [threading.Thread(target=pii_worker, daemon=True) for _ in range(self.pii_workers)]
+        for thread in pii_threads:
+            thread.start()
+
+        expected = 0
+        received = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for page_ids in id_pages:
+                    start = expected
+                    expected += len(page_ids)
+                    pending = self._pending_work_orders(page_ids, start, expected, results)
+
+                    if self.detail_batch_size > 1:
+                        for batch_start in range(0, len(pending), self.detail_batch_size):
+                            batch = pending[batch_start:batch_start + self.detail_batch_size]
+                            executor.submit(detail_batch_task, batch, expected)
+                    else:
+                        for i, wo_id in pending:
+                            executor.submit(detail_task, wo_id, i, expected)
+
+                    # Entregar los resultados ya terminados mientras se sigue listando
+                    while not results.empty():
+                        on_result(results.get())
+                        received += 1
+
+                # Procesar los resultados a medida que se completan
+                while received < expected:
+                    on_result(results.get())
+                    received += 1
+        finally:
+            for _ in pii_threads:
+                pii_queue.put(None)
+            for thread in pii_threads:
+                thread.join()
+            raw_writer.close()
+
+    def _requeue(self, enqueue, item, attempt):
+        """Vuelve a encolar un work order fallido después del backoff (sin bloquear al worker)."""
+        self.requeued += 1
+        delay = self.requeue_policy.delay(attempt)
+        print(f"   ↻ {item[0]} re-encolado (intento {attempt + 2}) en {delay:.1f}s")
+        timer = threading.Timer(delay, enqueue, args=(item,))
+        timer.daemon = True
+        timer.start()
+
+    def _pending_work_orders(self, page_ids, start, total, results):
+        """
+        Entrega directamente los work orders vigentes en el cache y retorna
+        [(index, wo_id)] de los que hay que pedir al servidor.
+        """
+        pending = []
+        for i, wo_id in enumerate(page_ids, start + 1):
+            cached_data = self.cache.get(wo_id, self.signatures.get(wo_id)) if self.cache is not None else None
+            if cached_data is not None:
+                results.put(build_work_order_result(wo_id, i, total, cached_data))
+            else:
+                pending.append((i, wo_id))
+        return pending
+
+    def concurrency_report(self):
+        """Concurrencia usada (la del controlador adaptativo si lo hay)."""
+        if self.controller is not None:
+            return self.controller.report()
+        return {'adaptive': False, 'limit': self.max_workers}
+
+    def close(self):
+        self.client.close()
+
+
+def create_fetch_engine(engine='threads', max_in_flight=None, detail_batch_size=1, pii_workers=None, pii_queue_size=None,
+                        cache=None, controller=None, resilience=None, capture=None):
+    """
+    Crea el motor de peticiones para main().
+
+    Args:
+        engine: 'threads' (ThreadPoolExecutor) o 'asyncio' (coroutines con aiohttp)
+        max_in_flight: Peticiones de detalle simultáneas (threads: workers; asyncio: semáforo)
+        detail_batch_size: Work orders por POST getRecord (1 = una petición por work order)
+        pii_workers: Workers de la etapa PII (default: igual que la etapa de detalle)
+        pii_queue_size: Capacidad de la cola entre la etapa de detalle y la PII
+        cache: WorkOrderCache opcional; los work orders vigentes no se vuelven a pedir
+        controller: AIMDController opcional; max_in_flight pasa a ser el máximo (default: controller.maximum)
+        resilience: RequestResilience opcional (reintentos con backoff y circuit breaker por endpoint)
+        capture: RawCapturePolicy opcional (qué respuestas raw se archivan; default: todas)
+    """
+    if max_in_flight is None and controller is not None:
+        max_in_flight = controller.maximum
+
+    if engine == 'asyncio':
+        # Import diferido: aiohttp solo es necesario para el motor asyncio
+        from async_engine import AsyncFetchEngine
+        return AsyncFetchEngine(max_in_flight=max_in_flight, detail_batch_size=detail_batch_size,
+                                pii_workers=pii_workers, pii_queue_size=pii_queue_size, cache=cache,
+                                controller=controller, resilience=resilience, capture=capture)
+    if engine != 'threads':
+        raise ValueError(f"Motor de peticiones desconocido: {engine}")
+    return ThreadedFetchEngine(max_workers=max_in_flight or MAX_WORKERS, detail_batch_size=detail_batch_size,
+                               pii_workers=pii_workers, pii_queue_size=pii_queue_size, cache=cache,
+                               controller=controller, resilience=resilience, capture=capture)
+
+
+_WHITESPACE = re.compile(r'\s+')
 
 
 def normalize_address(address):
@@ -674,27 +1157,107 @@ def normalize_address(address):
     if not address or address == 'N/A':
         return ''
     # Convertir a minúsculas, trim, y reemplazar espacios múltiples por uno solo
-    normalized = address.strip().lower()
-    import re
-    normalized = re.sub(r'\s+', ' ', normalized)
-    return normalized
+    return _WHITESPACE.sub(' ', address.strip().lower())
 
 
 def normalize_date_to_day(onsite_datetime):
     """Extrae solo el día (YYYY-MM-DD) de un OnSiteDateTime."""
-    if not onsite_datetime or onsite_datetime == 'N/A':
-        return ''
-    try:
-        # El formato es: "26/08/2025 3:46 PM"
-        dt = datetime.strptime(onsite_datetime, '%d/%m/%Y %I:%M %p')
-        return dt.strftime('%Y-%m-%d')
-    except:
-        return ''
+    dt = parse_onsite_datetime(onsite_datetime)
+    return dt.date().isoformat() if dt else ''
+
+
+def make_location_key(day, address):
+    """Clave de MultipleJobID: 'YYYY-MM-DD dirección normalizada' ('' sin fecha o sin dirección)."""
+    return f'{day} {address}' if day and address else ''
+
+
+def location_key(wo):
+    """
+    Clave de agrupación de MultipleJobID del work order (misma fecha y misma dirección).
+
+    Se calcula una vez y queda en el registro ('location_key'); las pasadas siguientes
+    (ejecuciones con cache, lotes incrementales) la reutilizan sin volver a normalizar.
+    """
+    key = wo.get('location_key')
+    if key is None:
+        # Día del OnSiteDateTime ya parseado (onsite_timestamp = 'YYYY-MM-DDTHH:MM')
+        key = make_location_key(onsite_timestamp(wo)[:10], normalize_address(wo.get('street', '')))
+        wo['location_key'] = key
+    return key
+
+
+class MultipleJobIndex:
+    """
+    Índice incremental de MultipleJobID: location_key -> [JobID principal, trabajos del grupo].
+
+    El trabajo con el menor JobID (principal) tiene MultipleJobID vacío; los demás del grupo
+    llevan el JobID del principal. add() agrega trabajos nuevos y solo actualiza los grupos
+    afectados: si el principal del grupo no cambia, solo se asignan los trabajos nuevos.
+    """
+
+    def __init__(self, work_orders_data=()):
+        self.groups = {}
+        self.add(work_orders_data)
+
+    def __len__(self):
+        return len(self.groups)
+
+    def add(self, work_orders_data):
+        """
+        Agrega trabajos al índice y asigna su MultipleJobID (y el de su grupo si cambia el principal).
+
+        Returns:
+            set con las location_key de los grupos actualizados
+        """
+        groups = self.groups
+        added = {}
+        normalized = {}  # normalize_address una vez por dirección distinta del lote
+        for wo in work_orders_data:
+            if not wo:
+                continue
+            key = wo.get('location_key')
+            if key is None:
+                street = wo.get('street', '')
+                address = normalized.get(street)
+                if address is None:
+                    address = normalized[street] = normalize_address(street)
+                key = wo['location_key'] = make_location_key(onsite_timestamp(wo)[:10], address)
+            if not key:
+                # Sin fecha o dirección válidas: no se agrupa
+                wo['multiple_job_id'] = ''
+                continue
+            # [menor JobID de los nuevos, trabajos nuevos, sus JobID]
+            job_id = wo.get('job_id', '')
+            entry = added.get(key)
+            if entry is None:
+                added[key] = [job_id, [wo], [job_id]]
+            else:
+                entry[1].append(wo)
+                entry[2].append(job_id)
+                if job_id < entry[0]:
+                    entry[0] = job_id
+
+        for key, (principal, new_jobs, job_ids) in added.items():
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [principal, new_jobs]
+            else:
+                group[1].extend(new_jobs)
+                if principal < group[0]:
+                    # Nuevo principal: se reasigna el grupo completo
+                    group[0] = principal
+                    new_jobs = group[1]
+                    job_ids = [wo.get('job_id', '') for wo in new_jobs]
+                else:
+                    principal = group[0]
+            for wo, job_id in zip(new_jobs, job_ids):
+                wo['multiple_job_id'] = '' if job_id == principal else principal
+        return set(added)
 
 
 def calculate_multiple_job_ids(work_orders_data):
     """
-    Calcula el MultipleJobID para cada trabajo.
+    Calcula el MultipleJobID para cada trabajo en una sola pasada (ver MultipleJobIndex).
 
     Busca trabajos que compartan:
     - Misma fecha (día, mes, año - ignorando hora)
@@ -703,58 +1266,63 @@ def calculate_multiple_job_ids(work_orders_data):
     El trabajo con el menor JobID (principal) tendrá MultipleJobID vacío.
     Los demás trabajos del grupo tendrán el JobID del principal.
     """
-    # Crear un índice por (fecha_normalizada, dirección_normalizada) -> lista de trabajos
-    location_index = {}
+    MultipleJobIndex(work_orders_data)
+    return work_orders_data
 
-    for wo in work_orders_data:
-        if not wo:
-            continue
 
-        date_key = normalize_date_to_day(wo.get('onsite_datetime', ''))
-        addr_key = normalize_address(wo.get('street', ''))
-
-        # Solo indexar si tenemos fecha y dirección válidas
-        if date_key and addr_key:
-            key = (date_key, addr_key)
-            if key not in location_index:
-                location_index[key] = []
-            location_index[key].append(wo)
-
-    # Ahora para cada grupo de trabajos, determinar el principal (menor JobID)
-    for key, matching_jobs in location_index.items():
-        # Si solo hay un trabajo en este grupo, no hay múltiples
-        if len(matching_jobs) <= 1:
-            for wo in matching_jobs:
-                wo['multiple_job_id'] = ''
-            continue
+def get_filter_date(onsite_end_iso, onsite_start_iso):
+    """
+    Fecha usada por el filtro de rango: On_Site_End_Time__c (trabajos completados) o,
+    si no existe, On_Site_Start_Time__c (trabajos "On Site").
 
-        # Ordenar por JobID para encontrar el menor (principal)
-        sorted_jobs = sorted(matching_jobs, key=lambda x: x.get('job_id', ''))
-        principal_job = sorted_jobs[0]
-        principal_job_id = principal_job.get('job_id', '')
+    Returns:
+        date, o None si no hay ninguna fecha disponible. Lanza ValueError si la fecha no se puede parsear.
+    """
+    date_iso_to_use = onsite_end_iso if (onsite_end_iso and onsite_end_iso != 'N/A') else onsite_start_iso
 
-        # Asignar MultipleJobID
-        for wo in matching_jobs:
-            if wo.get('job_id') == principal_job_id:
-                # El trabajo principal tiene MultipleJobID vacío
-                wo['multiple_job_id'] = ''
-            else:
-                # Los demás trabajos tienen el JobID del principal
-                wo['multiple_job_id'] = principal_job_id
+    if not date_iso_to_use or date_iso_to_use == 'N/A':
+        return None
 
-    # Para trabajos sin grupo válido (sin fecha o dirección), dejar vacío
-    for wo in work_orders_data:
-        if not wo:
-            continue
+    # Parsear el ISO string: "2025-11-29T02:11:18.000Z" y extraer solo la parte de fecha
+    return datetime.fromisoformat(date_iso_to_use.replace('Z', '+00:00')).date()
 
-        date_key = normalize_date_to_day(wo.get('onsite_datetime', ''))
-        addr_key = normalize_address(wo.get('street', ''))
 
-        # Si no tiene fecha o dirección válidas, asegurarse de que esté vacío
-        if not date_key or not addr_key:
-            wo['multiple_job_id'] = ''
+def prefilter_ids_by_date_range(page_ids, json_response, date_from, date_to):
+    """
+    Descarta antes de pedir el detalle los work orders cuya fecha (según las columnas de la
+    list view en la respuesta Header) está fuera del rango.
 
-    return work_orders_data
+    Los work orders sin fecha en la list view (o con fecha no parseable) se conservan y los
+    decide filter_by_date_range después de obtener el detalle.
+
+    Returns:
+        tuple: (IDs a procesar, número de IDs descartados)
+    """
+    if not date_from or not date_to:
+        return page_ids, 0
+
+    try:
+        from_date = datetime.strptime(date_from, '%Y-%m-%d').date()
+        to_date = datetime.strptime(date_to, '%Y-%m-%d').date()
+        records = json_response['context']['globalValueProviders'][2]['values']['records']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return page_ids, 0
+
+    kept_ids = []
+    for wo_id in page_ids:
+        fields = list_view_fields(records.get(wo_id))
+        try:
+            wo_date = get_filter_date(
+                extract_field_value(fields, 'On_Site_End_Time__c'),
+                extract_field_value(fields, 'On_Site_Start_Time__c')
+            )
+        except (ValueError, AttributeError):
+            wo_date = None
+
+        if wo_date is None or from_date <= wo_date <= to_date:
+            kept_ids.append(wo_id)
+
+    return kept_ids, len(page_ids) - len(kept_ids)
 
 
 def filter_by_date_range(work_orders_data, date_from, date_to):
@@ -784,23 +1352,21 @@ def filter_by_date_range(work_orders_data, date_from, date_to):
             if not wo:
                 continue
 
-            # Obtener el valor ISO de On_Site_End_Time__c (trabajos completados)
-            onsite_end_iso = wo.get('onsite_end_time_iso')
-            # Obtener el valor ISO de On_Site_Start_Time__c (fallback para trabajos "On Site")
-            onsite_start_iso = wo.get('onsite_start_time_iso')
-
-            # Usar onsite_end_time si existe, si no, usar onsite_start_time
-            date_iso_to_use = onsite_end_iso if (onsite_end_iso and onsite_end_iso != 'N/A') else onsite_start_iso
-
-            if not date_iso_to_use or date_iso_to_use == 'N/A':
-                # Si no hay ninguna fecha disponible, excluir el work order
-                print(f"   ⚠️  Sin fecha para filtrar: {wo.get('job_id', 'N/A')}")
-                continue
-
             try:
-                # Parsear el ISO string: "2025-11-29T02:11:18.000Z"
-                # Extraer solo la parte de fecha
-                wo_date = datetime.fromisoformat(date_iso_to_use.replace('Z', '+00:00')).date()
+                # On_Site_End_Time__c (trabajos completados) o On_Site_Start_Time__c (trabajos "On Site"),
+                # ya parseada por parse_work_order_data ('filter_date'); los registros sin ella se parsean aquí
+                wo_date = wo.get('filter_date')
+                if wo_date:
+                    wo_date = date.fromisoformat(wo_date)
+                elif wo_date is None:
+                    wo_date = get_filter_date(wo.get('onsite_end_time_iso'), wo.get('onsite_start_time_iso'))
+                else:
+                    wo_date = None
+
+                if wo_date is None:
+                    # Si no hay ninguna fecha disponible, excluir el work order
+                    print(f"   ⚠️  Sin fecha para filtrar: {wo.get('job_id', 'N/A')}")
+                    continue
 
                 # Verificar si está dentro del rango (inclusivo)
                 if from_date <= wo_date <= to_date:
@@ -846,22 +1412,9 @@ def get_jobtype_class(job_type):
 def generate_html(work_orders_data, output_folder):
     """Genera un archivo HTML con la información de los work orders."""
 
-    # Ordenar los work orders por fecha (OnSiteDateTime) de más reciente a más antiguo
-    def parse_date(wo):
-        """Parsea la fecha del formato 'DD/MM/YYYY HH:MM AM/PM' para ordenamiento."""
-        onsite_dt = wo.get('onsite_datetime', '')
-        if not onsite_dt or onsite_dt == 'N/A':
-            # Si no hay fecha, poner al final
-            return datetime.min
-        try:
-            # El formato es: "26/08/2025 3:46 PM"
-            return datetime.strptime(onsite_dt, '%d/%m/%Y %I:%M %p')
-        except:
-            # Si no se puede parsear, poner al final
-            return datetime.min
-
-    # Ordenar: reverse=True para tener las fechas más recientes primero
-    work_orders_data_sorted = sorted(work_orders_data, key=parse_date, reverse=True)
+    # Ordenar los work orders por fecha (OnSiteDateTime) de más reciente a más antiguo.
+    # onsite_timestamp ('YYYY-MM-DDTHH:MM') ordena igual que la fecha; sin fecha ('') queda al final
+    work_orders_data_sorted = sorted(work_orders_data, key=onsite_timestamp, reverse=True)
 
     timestamp = datetime.now().strftime('%Y-%m-%dT%H-%M-%S')[:-3]  # Incluye milisegundos (3 dígitos)
     filename = f"invoice_{timestamp}.html"
@@ -1008,6 +1561,11 @@ def generate_html(work_orders_data, output_folder):
             # Agregar clase especial si el trabajo está en estado "On Site"
             row_class = 'status-onsite' if wo.get('is_onsite', False) else ''
 
+            # Charge calculado por charge_engine.py (número); vacío en registros sin calcular
+            charge = wo.get('charge', '')
+            if isinstance(charge, (int, float)):
+                charge = f"{charge:.2f}"
+
             html_content += f"""
             <tr class="{row_class}">
                 <td>{wo.get('job_id', 'N/A')}</td>
@@ -1031,7 +1589,7 @@ def generate_html(work_orders_data, output_folder):
                 <td>{wo.get('after_hour', 'N/A')}</td>
                 <td>{wo.get('weekend', 'N/A')}</td>
                 <td>{wo.get('extratime_block', '')}</td>
-                <td>{wo.get('charge', '')}</td>
+                <td>{charge}</td>
             </tr>
 """
 
@@ -1064,12 +1622,29 @@ def main(progress_callback=None, filters=None):
     date_from = filters.get('date_from')
     date_to = filters.get('date_to')
     search_string = filters.get('search_string', '')
+    # Máximo total de work orders a listar (max_records del listado); el tamaño de página es HEADER_PAGE_SIZE
     record_limit = filters.get('record_limit', 200)
+    engine_name = filters.get('engine') or os.getenv('FETCH_ENGINE', 'threads')
+    max_in_flight = filters.get('max_in_flight')
+    detail_batch_size = int(filters.get('detail_batch_size') or os.getenv('DETAIL_BATCH_SIZE', '1'))
+    pii_workers = int(filters.get('pii_workers') or os.getenv('PII_WORKERS') or 0) or None
+    pii_queue_size = int(filters.get('pii_queue_size') or os.getenv('PII_QUEUE_SIZE') or 0) or None
+    use_cache = filters.get('use_cache')
+    if use_cache is None:
+        use_cache = os.getenv('WO_CACHE', '1') == '1'
+    # Opcional: con AIMD los threads / el pool se dimensionan para AURA_CONCURRENCY_MAX (más carga en Salesforce)
+    adaptive_concurrency = filters.get('adaptive_concurrency')
+    if adaptive_concurrency is None:
+        adaptive_concurrency = os.getenv('AURA_ADAPTIVE_CONCURRENCY', '0') == '1'
+    raw_capture = filters.get('raw_capture')
+    raw_sample_every = int(filters.get('raw_sample_every') or 0) or None
+    postprocess_mode = filters.get('postprocess')
 
     def update_progress(message, progress=0, total=0, errors=None):
         """Helper function to update progress"""
         if progress_callback:
-            progress_callback(message, progress, total, errors or [])
+            progress_callback(message, progress, total, errors or [], concurrency=engine.concurrency_report(),
+                              cache=cache.report() if cache is not None else None)
         print(message)
 
     # Crear carpeta base para los resultados
@@ -1081,134 +1656,206 @@ def main(progress_callback=None, filters=None):
     output_folder = base_folder / f'invoice_{timestamp}'
     output_folder.mkdir(exist_ok=True)
 
+    # Respuestas raw que se archivan: off, errors (solo las que no se pudieron parsear), sampled (1 de N) o full
+    capture = RawCapturePolicy(raw_capture, raw_sample_every)
+    if use_cache and capture.mode == 'full':
+        # Los work orders servidos desde el cache no tienen respuesta raw: con full el archivo debe
+        # tener el detalle de todos para que replay_invoice.py reconstruya el invoice completo
+        print("   Cache de work orders desactivado: RAW_CAPTURE=full archiva la respuesta de todos los work orders")
+        use_cache = False
+
+    # Concurrencia adaptativa (AIMD): max_in_flight pasa a ser el máximo que puede alcanzar
+    controller = AIMDController(maximum=int(max_in_flight) if max_in_flight else None) if adaptive_concurrency else None
+    # Reintentos con backoff, presupuesto de reintentos y circuit breaker por endpoint (header/detail/pii)
+    resilience = RequestResilience()
+    # Cache local de work orders: en una nueva ejecución solo se piden los registros nuevos o modificados
+    cache = WorkOrderCache() if use_cache else None
+    # Motor de peticiones (threads o asyncio) con su cliente HTTP compartido
+    try:
+        engine = create_fetch_engine(engine_name, max_in_flight and int(max_in_flight), detail_batch_size,
+                                     pii_workers, pii_queue_size, cache, controller, resilience, capture)
+    except Exception:
+        # Configuración inválida (ValueError): no dejar abierta la conexión SQLite del cache
+        if cache is not None:
+            cache.close()
+        raise
+
     # Obtener los IDs de work orders desde Header API
     update_progress("Obteniendo IDs de work orders desde Header API...", 0, 0)
-    print("\n1. Obteniendo IDs de work orders desde Header API...")
+    print("\n1. Obteniendo IDs de work orders desde Header API (paginado)...")
     print(f"   Filtros aplicados:")
     print(f"   - Search String: '{search_string}'" if search_string else "   - Search String: (ninguno)")
     print(f"   - Record Limit: {record_limit}")
     if date_from and date_to:
         print(f"   - Date Range: {date_from} to {date_to}")
-    work_order_ids, header_response = fetch_all_work_order_ids(search_string=search_string, page_size=record_limit)
-
-    if not work_order_ids:
-        print("\n✗ No se pudieron obtener IDs desde Header API")
-        print("  Intentando cargar desde allWO.json como fallback...")
-        try:
-            work_order_ids = load_work_order_ids()
-            print(f"   ✓ {len(work_order_ids)} IDs cargados desde allWO.json")
-        except Exception as e:
-            print(f"   ✗ Error cargando allWO.json: {e}")
-            return
-    else:
-        # Guardar los IDs obtenidos en allWO.json
-        try:
-            with open('allWO.json', 'w') as f:
-                json.dump(work_order_ids, f, indent=2)
-            print(f"   ✓ {len(work_order_ids)} IDs guardados en allWO.json")
-        except Exception as e:
-            print(f"   ⚠️  Error guardando allWO.json: {e}")
-
-    # Guardar la respuesta Header en un archivo para debug
-    if header_response:
-        header_file = output_folder / 'header.json'
-        with open(header_file, 'w') as f:
-            json.dump(header_response, f, indent=2)
-        print(f"   Respuesta Header guardada en: {header_file}")
-
-    print(f"   Total de IDs obtenidos: {len(work_order_ids)}")
     print(f"   Carpeta de salida: {output_folder}")
 
     # Limitar según configuración (0 = todos)
     max_work_orders = int(os.getenv('MAX_WORK_ORDERS', '5'))
     if max_work_orders > 0:
-        limited_ids = work_order_ids[:max_work_orders]
-        print(f"\n2. Limitando a los primeros {len(limited_ids)} work orders...")
+        print(f"\n2. Limitando a los primeros {max_work_orders} work orders...")
     else:
-        limited_ids = work_order_ids
-        print(f"\n2. Procesando TODOS los work orders ({len(limited_ids)})...")
+        print(f"\n2. Procesando TODOS los work orders...")
 
-    # Hacer peticiones para cada work order EN PARALELO
+    # Las peticiones de cada work order empiezan EN PARALELO en cuanto llega cada página de IDs
     print("\n3. Haciendo peticiones al servidor en paralelo...")
-    print(f"   Procesando {len(limited_ids)} work orders simultáneamente...")
-    update_progress(f"Procesando {len(limited_ids)} work orders...", 0, len(limited_ids))
+    print(f"   Motor: {engine_name}")
 
     start_time = time.time()
+    header_pages = 0
+    prefiltered = 0
+    work_order_ids = []
+    limited_ids = []
     work_orders_data = []
     successful = 0
     failed = 0
     error_list = []
 
-    # Verificar que haya work orders para procesar
-    if not limited_ids:
-        print("\n✗ No hay work orders para procesar")
-        update_progress("Error: No work orders found", len(limited_ids), len(limited_ids), ["No work orders found in header response"])
-        return None
+    def handle_page(page_ids, json_response):
+        """Guarda la página Header recibida y retorna los IDs a procesar (respetando MAX_WORK_ORDERS)."""
+        nonlocal header_pages, prefiltered
+        header_pages += 1
+
+        # Guardar la respuesta Header para debug (clave = número de página)
+        save_raw_response(output_folder, 'header', header_pages, json_response, failed=not page_ids)
+
+        work_order_ids.extend(page_ids)
+
+        # Descartar por fecha (columnas de la list view) antes de cualquier petición de detalle/PII
+        page_ids, dropped = prefilter_ids_by_date_range(page_ids, json_response, date_from, date_to)
+        if dropped:
+            prefiltered += dropped
+            print(f"   {dropped} work orders fuera del rango {date_from} a {date_to} descartados antes del detalle")
+
+        if max_work_orders > 0:
+            page_ids = page_ids[:max(0, max_work_orders - len(limited_ids))]
+        limited_ids.extend(page_ids)
+
+        if page_ids:
+            print(f"   Procesando {len(page_ids)} work orders de esta página ({len(limited_ids)} en total)...")
+            update_progress(f"Procesando {len(limited_ids)} work orders...", successful + failed, len(limited_ids), error_list)
+        return page_ids
+
+    def work_order_limit_reached():
+        """Deja de pedir páginas Header cuando ya se tienen MAX_WORK_ORDERS work orders."""
+        if max_work_orders > 0 and len(limited_ids) >= max_work_orders:
+            print(f"   Límite MAX_WORK_ORDERS ({max_work_orders}) alcanzado, no se piden más páginas")
+            return True
+        return False
+
+    def handle_result(result):
+        """Registra el resultado de un work order y actualiza el progreso."""
+        nonlocal successful, failed
+
+        # Mostrar progreso
+        progress = f"[{result['index']}/{len(limited_ids)}]"
+
+        if result['success']:
+            work_orders_data.append(result['data'])
+            successful += 1
+            print(f"   {progress} ✓ {result['wo_id']} - Procesado exitosamente")
+        else:
+            failed += 1
+            error_msg = result.get('error', 'Error desconocido')
+            error_list.append(f"{result['wo_id']}: {error_msg}")
+            print(f"   {progress} ✗ {result['wo_id']} - Falló: {error_msg}")
 
-    # Configurar el número máximo de workers (threads)
-    # Usar 10 threads para no sobrecargar el servidor
-    max_workers = min(10, len(limited_ids))
+        update_progress(
+            f"Procesando work order {successful + failed}/{len(limited_ids)}...",
+            successful + failed,
+            len(limited_ids),
+            error_list
+        )
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Enviar todas las tareas al executor
-        future_to_wo = {
-            executor.submit(process_single_work_order, wo_id, output_folder, i, len(limited_ids)): wo_id
-            for i, wo_id in enumerate(limited_ids, 1)
-        }
+    try:
+        engine.list_and_process_work_orders(
+            search_string, None, int(record_limit or 0), output_folder, handle_page, handle_result,
+            should_stop=work_order_limit_reached
+        )
 
-        # Procesar los resultados a medida que se completan
-        for future in as_completed(future_to_wo):
-            result = future.result()
-
-            # Mostrar progreso
-            progress = f"[{result['index']}/{result['total']}]"
-
-            if result['success']:
-                work_orders_data.append(result['data'])
-                successful += 1
-                print(f"   {progress} ✓ {result['wo_id']} - Procesado exitosamente")
-                update_progress(
-                    f"Procesando work order {successful + failed}/{len(limited_ids)}...",
-                    successful + failed,
-                    len(limited_ids),
-                    error_list
-                )
-            else:
-                failed += 1
-                error_msg = result.get('error', 'Error desconocido')
-                error_list.append(f"{result['wo_id']}: {error_msg}")
-                print(f"   {progress} ✗ {result['wo_id']} - Falló: {error_msg}")
-                update_progress(
-                    f"Procesando work order {successful + failed}/{len(limited_ids)}...",
-                    successful + failed,
-                    len(limited_ids),
-                    error_list
-                )
+        print(f"   Total de IDs obtenidos: {len(work_order_ids)}")
+
+        if not work_order_ids:
+            print("\n✗ No se pudieron obtener IDs desde Header API")
+            print("  Intentando cargar desde allWO.json como fallback...")
+            try:
+                work_order_ids = load_work_order_ids()
+                print(f"   ✓ {len(work_order_ids)} IDs cargados desde allWO.json")
+            except Exception as e:
+                print(f"   ✗ Error cargando allWO.json: {e}")
+                return
+
+            limited_ids = work_order_ids[:max_work_orders] if max_work_orders > 0 else work_order_ids
+
+            # Verificar que haya work orders para procesar
+            if not limited_ids:
+                print("\n✗ No hay work orders para procesar")
+                update_progress("Error: No work orders found", 0, 0, ["No work orders found in header response"])
+                return None
+
+            update_progress(f"Procesando {len(limited_ids)} work orders...", 0, len(limited_ids))
+            engine.process_work_orders(limited_ids, output_folder, handle_result)
+        else:
+            # Guardar los IDs obtenidos en allWO.json
+            try:
+                with open('allWO.json', 'w') as f:
+                    json.dump(work_order_ids, f, indent=2)
+                print(f"   ✓ {len(work_order_ids)} IDs guardados en allWO.json")
+            except Exception as e:
+                print(f"   ⚠️  Error guardando allWO.json: {e}")
+    finally:
+        engine.close()
+        if cache is not None:
+            cache.close()
 
     elapsed_time = time.time() - start_time
     print(f"\n   Tiempo total: {elapsed_time:.2f} segundos")
     print(f"   Exitosos: {successful} | Fallidos: {failed}")
-
-    # Aplicar filtro por fecha si se especificó
+    if prefiltered:
+        print(f"   Descartados por fecha antes del detalle: {prefiltered}")
+    if cache is not None:
+        print(f"   Cache: {cache.hits} work orders reutilizados de ejecuciones anteriores (los sin LastModifiedDate, "
+              f"de hasta {cache.max_age / 3600:g} h) | {cache.misses} pedidos al servidor")
+    for endpoint, stats in resilience.report().items():
+        if stats['retries'] or stats['breaker_opened']:
+            print(f"   Reintentos {endpoint}: {stats['retries']} de {stats['requests']} peticiones "
+                  f"(circuit breaker abierto {stats['breaker_opened']} veces)")
+    concurrency = engine.concurrency_report()
+    if concurrency['adaptive']:
+        print(f"   Concurrencia: {concurrency['limit']} (máx. alcanzado {concurrency['peak']}, "
+              f"{concurrency['throttled']} respuestas 429/503/error)")
+    raw_summary = f"   Respuestas raw ({capture.mode}): {capture.captured - capture.dropped} archivadas | {capture.skipped} omitidas"
+    if capture.dropped:
+        raw_summary += f" | {capture.dropped} descartadas (cola de escritura llena)"
+    print(raw_summary)
+
+    # Filtro por fecha (si se especificó) y MultipleJobID; los lotes grandes se procesan en bloque
+    # (columnar_postprocess.py; import diferido porque ese módulo importa de generate_invoice)
+    from columnar_postprocess import postprocess_work_orders, resolve_postprocess_mode
+    postprocess_mode = resolve_postprocess_mode(postprocess_mode, len(work_orders_data))
     if date_from and date_to and work_orders_data:
         print("\n4. Aplicando filtro por fecha (On_Site_End_Time__c)...")
-        update_progress("Filtrando por rango de fechas...", len(limited_ids), len(limited_ids), error_list)
-        work_orders_data = filter_by_date_range(work_orders_data, date_from, date_to)
-
-    # Calcular MultipleJobID para cada trabajo
-    print("\n5. Calculando MultipleJobID (trabajos en misma fecha y dirección)...")
+    print(f"\n5. Calculando MultipleJobID (trabajos en misma fecha y dirección, post-proceso {postprocess_mode})...")
     update_progress("Calculando MultipleJobID...", len(limited_ids), len(limited_ids), error_list)
     if work_orders_data:
-        work_orders_data = calculate_multiple_job_ids(work_orders_data)
+        work_orders_data = postprocess_work_orders(work_orders_data, date_from, date_to, postprocess_mode)
         # Contar cuántos trabajos tienen MultipleJobID asignado
         multiple_jobs_count = sum(1 for wo in work_orders_data if wo.get('multiple_job_id', ''))
         print(f"   Trabajos con múltiples IDs encontrados: {multiple_jobs_count}")
+        # Area y Charge se calculan una sola vez aquí y quedan en el HTML (el viewer solo los muestra)
+        apply_verifone_charges(work_orders_data)
+        total_charge = sum(wo['charge'] for wo in work_orders_data if wo)
+        print(f"   Charge total: ${total_charge:,.2f}")
 
     # Generar el HTML
     print("\n6. Generando archivo HTML...")
     update_progress("Generando archivo HTML...", len(limited_ids), len(limited_ids), error_list)
+    date_range = f"{date_from} - {date_to}" if date_from and date_to else ''
     if work_orders_data:
         html_file = generate_html(work_orders_data, output_folder)
+        # Registrar la ejecución en el catálogo (/api/get-latest-invoice)
+        record_run(VERIFONE_INVOICE, output_folder, total=len(work_orders_data), html_file=html_file,
+                   timestamp=timestamp, date_range=date_range)
         print(f"\n✓ Proceso completado exitosamente!")
         print(f"  Archivo HTML: {html_file}")
         print(f"  Total de work orders procesados: {len(work_orders_data)}")
@@ -1220,8 +1867,9 @@ def main(progress_callback=None, filters=None):
         )
         return html_file
     else:
+        record_run(VERIFONE_INVOICE, output_folder, timestamp=timestamp, date_range=date_range)
         print("\n✗ No se pudieron procesar work orders")
-        print("  Revisa los archivos raw_response_*.json para debug")
+        print(f"  Revisa las respuestas raw en {output_folder / ARCHIVE_NAME} para debug (raw_archive.read_raw_response)")
         update_progress(
             "Error: No se pudieron procesar work orders",
             len(limited_ids),
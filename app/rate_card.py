@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Tarifario de cobro (data/rate_card.json) compilado en una tabla de búsqueda.
+
+El archivo define las clases de servicio (recovery, deinstall, coo, integrated, sla_2h, service)
+con sus palabras clave y las tarifas de cada clase. Al cargarlo se compila una tabla
+(company, clase, after hours, weekend, área, multiple) -> charge, así que cobrar un trabajo es
+clasificarlo (memoizado por job type / device type distinto) y buscar una clave.
+
+current_rate_card() revisa el mtime del archivo: si cambió lo vuelve a cargar sin reiniciar el
+servidor; si el archivo nuevo es inválido se sigue usando el tarifario anterior.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_RATE_CARD_PATH = PROJECT_ROOT / 'data' / 'rate_card.json'
+
+# Clase de los trabajos que no coinciden con ninguna regla, y la de los que además son facturables
+OTHER = 'other'
+BILLABLE = 'billable'
+
+# Claves de tarifa que se prueban, en orden, para cada combinación (after hours, weekend)
+SCHEDULE_KEYS = {
+    (False, False): ('weekday', 'charge'),
+    (False, True): ('weekend', 'weekday', 'charge'),
+    (True, False): ('after_hours', 'weekday', 'charge'),
+    (True, True): ('after_hours_weekend', 'weekend', 'after_hours', 'weekday', 'charge'),
+}
+
+
+class RateCard:
+    """
+    Tarifario compilado.
+
+    classify() asigna la clase de servicio de un trabajo y rate() busca su tarifa en la tabla;
+    is_billed() aplica los filtros de Billable y de Status previos al cobro.
+    """
+
+    def __init__(self, spec, source=None):
+        """
+        Args:
+            spec: dict con el contenido de rate_card.json
+            source: Ruta del archivo (solo para los mensajes)
+
+        Raises:
+            ValueError: Si el tarifario está incompleto (clase sin tarifa, área sin tarifa, etc.)
+        """
+        self.source = source
+        try:
+            self.areas = tuple(str(area) for area in spec['areas'])
+            self.default_area = str(spec.get('default_area', self.areas[0]))
+            self.companies = tuple(sorted({company for company in spec.get('companies', ('verifone', 'ingenico'))}))
+            billable_values = spec.get('billable_values', {})
+            self.not_billable = frozenset(value.lower() for value in billable_values.get('no', ()))
+            self.billable = frozenset(value.lower() for value in billable_values.get('yes', ()))
+            self.billed_statuses = {
+                company: (tuple(s.lower() for s in rule.get('exclude', ())), tuple(s.lower() for s in rule.get('include', ())))
+                for company, rule in spec.get('billed_statuses', {}).items()
+            }
+            self.rules = tuple(self._compile_rule(rule) for rule in spec['service_classes'])
+            rates = spec['rates']
+        except (KeyError, IndexError, TypeError, AttributeError) as e:
+            raise ValueError(f"Tarifario inválido{self._where()}: {e!r}") from e
+
+        if self.default_area not in self.areas:
+            raise ValueError(f"Tarifario inválido{self._where()}: default_area {self.default_area} no está en areas")
+
+        classes = {service_class for service_class, _, _, _, _ in self.rules} | {OTHER, BILLABLE}
+        missing = sorted(classes - set(rates))
+        if missing:
+            raise ValueError(f"Tarifario inválido{self._where()}: clases sin tarifa: {', '.join(missing)}")
+
+        self.table = self._compile_table(rates, classes)
+        self._classes = {}
+
+    def _where(self):
+        return f" ({self.source})" if self.source else ''
+
+    @staticmethod
+    def _compile_rule(rule):
+        match = rule.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValueError(f"match desconocido en la clase {rule.get('class')}: {match}")
+        companies = frozenset(rule['companies']) if rule.get('companies') else None
+        job_keywords = tuple(keyword.lower() for keyword in rule.get('job_type', ()))
+        device_keywords = tuple(keyword.upper() for keyword in rule.get('device_type', ()))
+        return rule['class'], companies, match == 'all', job_keywords, device_keywords
+
+    def _compile_table(self, rates, classes):
+        table = {}
+        for service_class in classes:
+            spec = rates[service_class]
+            for area in self.areas:
+                area_rates = spec.get('areas', {}).get(area, {}) if 'areas' in spec else {}
+                if 'areas' in spec and not area_rates:
+                    raise ValueError(f"Tarifario inválido{self._where()}: {service_class} sin tarifa para el área {area}")
+                for (after_hour, weekend), keys in SCHEDULE_KEYS.items():
+                    rate = next((float(rates_by_key[key]) for key in keys
+                                 for rates_by_key in (area_rates, spec) if key in rates_by_key), None)
+                    if rate is None:
+                        raise ValueError(f"Tarifario inválido{self._where()}: {service_class} sin tarifa "
+                                         f"(área {area}, after hours {after_hour}, weekend {weekend})")
+                    multiple_rate = float(spec['multiple']) if 'multiple' in spec else rate
+                    for company in self.companies:
+                        table[(company, service_class, after_hour, weekend, area, False)] = rate
+                        table[(company, service_class, after_hour, weekend, area, True)] = multiple_rate
+        return table
+
+    def classify(self, company, job_type, device_type):
+        """Clase de servicio de un trabajo (OTHER si no coincide con ninguna regla); memoizada."""
+        key = (company, job_type, device_type)
+        service_class = self._classes.get(key)
+        if service_class is None:
+            job = (job_type or '').lower()
+            device = (device_type or '').upper()
+            service_class = OTHER
+            for name, companies, match_all, job_keywords, device_keywords in self.rules:
+                if companies is not None and company not in companies:
+                    continue
+                job_match = any(keyword in job for keyword in job_keywords)
+                device_match = any(keyword in device for keyword in device_keywords)
+                if (job_match and device_match) if match_all else (job_match or device_match):
+                    service_class = name
+                    break
+            self._classes[key] = service_class
+        return service_class
+
+    def is_billed(self, company, billable, status):
+        """False si el trabajo no se cobra por Billable (No) o por Status (p. ej. Verifone Cancelled)."""
+        if billable in self.not_billable:
+            return False
+        rule = self.billed_statuses.get(company)
+        if rule is not None:
+            exclude, include = rule
+            if any(value in status for value in exclude):
+                return False
+            if include and not any(value in status for value in include):
+                return False
+        return True
+
+    def rate(self, company, service_class, after_hour, weekend, area, multiple):
+        """Tarifa de la tabla; las áreas desconocidas o vacías usan default_area."""
+        if area not in self.areas:
+            area = self.default_area
+        return self.table[(company, service_class, after_hour, weekend, area, multiple)]
+
+    @classmethod
+    def load(cls, path):
+        """Carga y compila un archivo de tarifario."""
+        path = Path(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+        return cls(spec, source=str(path))
+
+
+class RateCardFile:
+    """Tarifario de un archivo que se vuelve a cargar cuando cambia su mtime o su tamaño."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._card = None
+        self._signature = None
+
+    def _stat_signature(self):
+        stat = self.path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self):
+        """
+        Tarifario vigente. La primera carga propaga el error; una recarga fallida conserva
+        el tarifario anterior.
+        """
+        try:
+            signature = self._stat_signature()
+        except OSError:
+            if self._card is None:
+                raise
+            return self._card
+
+        if signature == self._signature:
+            return self._card
+
+        with self._lock:
+            if signature == self._signature:
+                return self._card
+            try:
+                card = RateCard.load(self.path)
+            except (OSError, ValueError) as e:  # json.JSONDecodeError es ValueError
+                if self._card is None:
+                    raise
+                print(f"   ⚠️  No se pudo recargar el tarifario {self.path}: {e} (se mantiene el anterior)")
+                self._signature = signature
+                return self._card
+            if self._card is not None:
+                print(f"   🔄 Tarifario recargado: {self.path}")
+            self._card = card
+            self._signature = signature
+            return card
+
+
+_rate_card_files = {}
+_rate_card_files_lock = threading.Lock()
+
+
+def current_rate_card(path=None):
+    """
+    Tarifario vigente del proceso (se recarga si el archivo cambió).
+
+    Args:
+        path: Archivo de tarifario (default: RATE_CARD_PATH o data/rate_card.json)
+    """
+    if path is None:
+        path = os.getenv('RATE_CARD_PATH') or DEFAULT_RATE_CARD_PATH
+    path = str(path)
+    rate_card_file = _rate_card_files.get(path)
+    if rate_card_file is None:
+        with _rate_card_files_lock:
+            rate_card_file = _rate_card_files.setdefault(path, RateCardFile(path))
+    return rate_card_file.get()
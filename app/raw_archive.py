@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Archivo único por ejecución con las respuestas raw de Aura (header / detail / PII).
+
+En lugar de un raw_*.json por respuesta, cada carpeta invoice_<timestamp>/ tiene:
+- raw_responses.ndjson.gz: un registro JSON por línea, cada uno comprimido como un miembro gzip
+  independiente (el archivo completo se puede leer con zcat / gzip.open línea a línea)
+- raw_responses.idx: índice append-only "kind<TAB>id<TAB>offset<TAB>length" para leer un registro
+  sin descomprimir el resto
+
+Uso desde línea de comandos (convierte carpetas antiguas con raw_*.json):
+    python app/raw_archive.py VerifoneWorkOrders/invoice_* [--remove]
+"""
+
+import gzip
+import json
+import sys
+import threading
+from pathlib import Path
+
+
+ARCHIVE_NAME = 'raw_responses.ndjson.gz'
+INDEX_NAME = 'raw_responses.idx'
+
+KINDS = ('header', 'detail', 'pii')
+
+# Prefijos de los archivos raw_*.json antiguos -> tipo de respuesta en el archivo
+KIND_BY_PREFIX = {
+    'raw_header_response': 'header',
+    'raw_response': 'detail',
+    'raw_pii_response': 'pii',
+}
+
+# Escrituras síncronas (sin RawResponseWriter activo) de varios threads sobre el mismo archivo
+_append_lock = threading.Lock()
+
+
+def archive_kind(kind):
+    """Acepta el tipo (detail) o el prefijo antiguo del archivo (raw_response)."""
+    kind = KIND_BY_PREFIX.get(kind, kind)
+    if kind not in KINDS:
+        raise ValueError(f"Tipo de respuesta raw desconocido: {kind}")
+    return kind
+
+
+def legacy_response_path(output_folder, kind, wo_id, compress=False):
+    """Ruta del archivo individual antiguo (raw_response_<id>.json, header.json, ...)."""
+    kind = archive_kind(kind)
+    if kind == 'header':
+        name = 'header.json' if str(wo_id) == '1' else f'header_{wo_id}.json'
+        return Path(output_folder) / name
+    prefix = next(prefix for prefix, value in KIND_BY_PREFIX.items() if value == kind)
+    return Path(output_folder) / f"{prefix}_{wo_id}.json{'.gz' if compress else ''}"
+
+
+class RawArchive:
+    """Escritor append-only del archivo de respuestas raw de una ejecución."""
+
+    def __init__(self, output_folder, compresslevel=5):
+        self.output_folder = Path(output_folder)
+        self.compresslevel = compresslevel
+        self._data = open(self.output_folder / ARCHIVE_NAME, 'ab')
+        self._index = open(self.output_folder / INDEX_NAME, 'a')
+        self._offset = self._data.seek(0, 2)
+
+    def append(self, kind, wo_id, response):
+        """Agrega una respuesta (no hace flush; ver flush())."""
+        kind = archive_kind(kind)
+        line = json.dumps({'kind': kind, 'id': wo_id, 'response': response}, separators=(',', ':')) + '\n'
+        member = gzip.compress(line.encode(), compresslevel=self.compresslevel)
+        self._data.write(member)
+        self._index.write(f"{kind}\t{wo_id}\t{self._offset}\t{len(member)}\n")
+        self._offset += len(member)
+
+    def flush(self):
+        # Primero los datos: una entrada del índice nunca apunta a bytes que no están en disco
+        self._data.flush()
+        self._index.flush()
+
+    def close(self):
+        self.flush()
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def append_raw_response(output_folder, kind, wo_id, response):
+    """Agrega una respuesta al archivo de la ejecución de forma síncrona (sin thread escritor)."""
+    with _append_lock:
+        with RawArchive(output_folder) as archive:
+            archive.append(kind, wo_id, response)
+
+
+class RawArchiveReader:
+    """
+    Lectura aleatoria del archivo de respuestas raw por (tipo, ID) usando el índice.
+
+    Si el mismo work order se guardó varias veces (reintentos), gana el último registro.
+    Si falta el índice, se reconstruye en memoria recorriendo el archivo.
+    Si la carpeta ya fue compactada (run_compaction.py), lee del archivo mensual.
+    """
+
+    def __init__(self, output_folder):
+        self.output_folder = Path(output_folder)
+        self.path = self.output_folder / ARCHIVE_NAME
+        self._entries = {}
+        self._records = None
+        self._compacted = None
+        self._load_index()
+
+    def _load_index(self):
+        if not self.output_folder.exists():
+            # Import diferido: run_compaction usa este módulo
+            from run_compaction import find_compacted_run
+            self._compacted = find_compacted_run(self.output_folder)
+            if self._compacted is not None:
+                self._entries = dict.fromkeys(self._compacted.raw_keys())
+            return
+
+        index_path = self.output_folder / INDEX_NAME
+        if not index_path.exists():
+            self._scan()
+            return
+
+        size = self.path.stat().st_size if self.path.exists() else 0
+        with open(index_path, 'r') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) != 4:
+                    continue
+                kind, wo_id, offset, length = parts[0], parts[1], int(parts[2]), int(parts[3])
+                # Ignorar entradas de una escritura interrumpida
+                if offset + length <= size:
+                    self._entries[(kind, wo_id)] = (offset, length)
+
+    def _scan(self):
+        self._records = {}
+        if not self.path.exists():
+            return
+        with gzip.open(self.path, 'rt') as f:
+            for line in f:
+                record = json.loads(line)
+                self._records[(record['kind'], str(record['id']))] = record['response']
+
+    def keys(self, kind=None):
+        """Pares (tipo, id) guardados, opcionalmente de un solo tipo."""
+        keys = self._records.keys() if self._records is not None else self._entries.keys()
+        if kind is None:
+            return list(keys)
+        kind = archive_kind(kind)
+        return [key for key in keys if key[0] == kind]
+
+    def get(self, kind, wo_id):
+        """Retorna la respuesta guardada o None si no existe."""
+        key = (archive_kind(kind), str(wo_id))
+        if self._records is not None:
+            return self._records.get(key)
+        if self._compacted is not None:
+            return self._compacted.raw_response(*key)
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        offset, length = entry
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            member = f.read(length)
+        return json.loads(gzip.decompress(member))['response']
+
+    def __iter__(self):
+        """Genera (tipo, id, respuesta) de cada registro del índice."""
+        for kind, wo_id in self.keys():
+            yield kind, wo_id, self.get(kind, wo_id)
+
+    def __contains__(self, key):
+        kind, wo_id = key
+        return (archive_kind(kind), str(wo_id)) in (self._records or self._entries)
+
+    def __len__(self):
+        return len(self._records if self._records is not None else self._entries)
+
+
+def read_raw_response(output_folder, kind, wo_id):
+    """
+    Lee una respuesta raw de una ejecución: primero del archivo único y, para carpetas antiguas,
+    del raw_*.json individual.
+
+    Args:
+        output_folder: Carpeta invoice_<timestamp>
+        kind: 'header', 'detail' o 'pii' (o el prefijo antiguo: 'raw_response', 'raw_pii_response')
+        wo_id: ID del work order (número de página para 'header')
+
+    Returns:
+        dict con la respuesta, o None si no existe
+    """
+    output_folder = Path(output_folder)
+    if (output_folder / ARCHIVE_NAME).exists() or not output_folder.exists():
+        response = RawArchiveReader(output_folder).get(kind, wo_id)
+        if response is not None:
+            return response
+    return read_legacy_response(output_folder, kind, wo_id)
+
+
+def read_legacy_response(output_folder, kind, wo_id):
+    """Lee una respuesta del raw_*.json (o .json.gz) individual de una carpeta antigua, o None si no existe."""
+    path = legacy_response_path(output_folder, kind, wo_id)
+    if path.exists():
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    gz_path = legacy_response_path(output_folder, kind, wo_id, compress=True)
+    if gz_path.exists():
+        with gzip.open(gz_path, 'rt') as f:
+            return json.load(f)
+    return None
+
+
+def legacy_response_files(output_folder):
+    """Genera (tipo, id, path) de los archivos raw individuales de una carpeta antigua."""
+    for path in sorted(Path(output_folder).iterdir()):
+        name = path.name
+        stem = name[:-len('.json.gz')] if name.endswith('.json.gz') else name[:-len('.json')] if name.endswith('.json') else None
+        if stem is None:
+            continue
+
+        if stem == 'header':
+            yield 'header', '1', path
+        elif stem.startswith('header_'):
+            yield 'header', stem[len('header_'):], path
+        else:
+            # raw_pii_response_ antes que raw_response_ (prefijo más largo primero)
+            for prefix in sorted(KIND_BY_PREFIX, key=len, reverse=True):
+                if stem.startswith(prefix + '_'):
+                    yield KIND_BY_PREFIX[prefix], stem[len(prefix) + 1:], path
+                    break
+
+
+def convert_folder(output_folder, remove=False):
+    """
+    Mueve los raw_*.json / header*.json de una carpeta antigua al archivo único.
+
+    Args:
+        output_folder: Carpeta invoice_<timestamp>
+        remove: Borrar los archivos individuales después de archivarlos
+
+    Returns:
+        int: Número de respuestas archivadas
+    """
+    files = list(legacy_response_files(output_folder))
+    if not files:
+        return 0
+
+    with _append_lock, RawArchive(output_folder) as archive:
+        for kind, wo_id, path in files:
+            opener = gzip.open if path.name.endswith('.gz') else open
+            with opener(path, 'rt') as f:
+                archive.append(kind, wo_id, json.load(f))
+
+    if remove:
+        for _, _, path in files:
+            path.unlink()
+    return len(files)
+
+
+def main():
+    """Convierte las carpetas indicadas en la línea de comandos."""
+    args = sys.argv[1:]
+    remove = '--remove' in args
+    folders = [Path(arg) for arg in args if arg != '--remove']
+
+    if not folders:
+        print("Uso: python app/raw_archive.py <carpeta invoice_*> [...] [--remove]")
+        sys.exit(1)
+
+    for folder in folders:
+        if not folder.is_dir():
+            print(f"❌ No es una carpeta: {folder}")
+            continue
+        count = convert_folder(folder, remove=remove)
+        print(f"✓ {folder}: {count} respuestas archivadas en {ARCHIVE_NAME}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Política de captura de las respuestas raw de Aura (qué respuestas se guardan en el archivo de la ejecución).
+
+Modos:
+- off: no se guarda ninguna respuesta
+- errors: solo las respuestas que parse_work_order_data / parse_pii_details no pudieron parsear
+- sampled: 1 de cada N work orders (detalle y PII del mismo work order juntos) más los errores
+- full: todas las respuestas (comportamiento anterior)
+"""
+
+import os
+import threading
+import zlib
+
+
+CAPTURE_MODES = ('off', 'errors', 'sampled', 'full')
+
+
+class RawCapturePolicy:
+    """Decide si una respuesta raw se guarda y cuenta las capturadas / omitidas."""
+
+    def __init__(self, mode=None, sample_every=None):
+        """
+        Args:
+            mode: 'off', 'errors', 'sampled' o 'full' (default: RAW_CAPTURE o 'full')
+            sample_every: N del modo sampled (default: RAW_CAPTURE_SAMPLE_EVERY o 10)
+        """
+        if mode is None:
+            mode = os.getenv('RAW_CAPTURE', 'full')
+        if sample_every is None:
+            sample_every = int(os.getenv('RAW_CAPTURE_SAMPLE_EVERY', '10'))
+
+        mode = mode.strip().lower().replace('-', '_')
+        if mode == 'errors_only':
+            mode = 'errors'
+        if mode not in CAPTURE_MODES:
+            raise ValueError(f"Modo de captura raw desconocido: {mode} (opciones: {', '.join(CAPTURE_MODES)})")
+
+        self.mode = mode
+        self.sample_every = max(1, sample_every)
+        self.captured = 0
+        self.skipped = 0
+        # Capturadas que el escritor descartó (cola llena); no llegan al archivo
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def should_capture(self, kind, wo_id, failed=False):
+        """
+        True si la respuesta se debe guardar.
+
+        El muestreo usa un hash estable del ID: las respuestas de detalle y PII de un work order
+        se guardan (o se omiten) juntas, y una nueva ejecución muestrea los mismos work orders.
+        """
+        if self.mode == 'full':
+            capture = True
+        elif self.mode == 'off':
+            capture = False
+        elif failed:
+            capture = True
+        elif self.mode == 'sampled':
+            capture = zlib.crc32(str(wo_id).encode()) % self.sample_every == 0
+        else:
+            capture = False
+
+        with self._lock:
+            if capture:
+                self.captured += 1
+            else:
+                self.skipped += 1
+        return capture
+
+    def record_dropped(self):
+        """Cuenta una respuesta capturada que el escritor no pudo encolar."""
+        with self._lock:
+            self.dropped += 1
+
+    def report(self):
+        return {
+            'mode': self.mode,
+            'sample_every': self.sample_every if self.mode == 'sampled' else None,
+            'captured': self.captured,
+            'skipped': self.skipped,
+            'dropped': self.dropped,
+        }
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Escritura en segundo plano de las respuestas raw de Aura en el archivo de la ejecución (raw_archive.py).
+
+Los workers de las peticiones solo encolan la respuesta; un thread dedicado la serializa en JSON
+compacto comprimido y la agrega al archivo, de forma que la red nunca espera al disco.
+"""
+
+import os
+import queue
+import threading
+from pathlib import Path
+
+from raw_archive import RawArchive, append_raw_response
+
+
+# Writers activos por carpeta de salida (save_raw_response los consulta)
+_active_writers = {}
+_active_writers_lock = threading.Lock()
+
+_STOP = object()
+
+
+def get_raw_writer(output_folder):
+    """Retorna el RawResponseWriter activo para output_folder, o None si no hay ninguno."""
+    with _active_writers_lock:
+        return _active_writers.get(Path(output_folder))
+
+
+class RawResponseWriter:
+    """
+    Thread escritor de respuestas raw alimentado por una cola acotada.
+
+    Uso:
+        with RawResponseWriter(output_folder):
+            ...  # save_raw_response(output_folder, ...) encola en lugar de escribir
+
+    submit() no bloquea: si la cola está llena (disco muy lento) la respuesta se descarta y se cuenta
+    en `dropped`. Las respuestas que no se pudieron parsear (failed) nunca se descartan: esperan lugar
+    en la cola. Al salir del with se escriben todas las respuestas pendientes.
+    """
+
+    # Cada cuánto se vuelve a intentar encolar una respuesta failed con la cola llena
+    FAILED_SUBMIT_POLL = 0.5
+
+    def __init__(self, output_folder, queue_size=None, batch_size=100, capture=None):
+        """
+        Args:
+            output_folder: Carpeta de la ejecución
+            queue_size: Respuestas pendientes máximas (default: RAW_WRITER_QUEUE_SIZE o 2000)
+            batch_size: Respuestas que el thread escribe (y hace flush) por cada vez que despierta
+            capture: RawCapturePolicy opcional (qué respuestas se guardan; default: todas)
+        """
+        if queue_size is None:
+            queue_size = int(os.getenv('RAW_WRITER_QUEUE_SIZE', '2000'))
+
+        self.output_folder = Path(output_folder)
+        self.batch_size = max(1, batch_size)
+        self.capture = capture
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        # Respuestas failed recibidas sin thread escritor (todavía no arrancó o ya terminó)
+        self._overflow = []
+        self._thread = threading.Thread(target=self._run, name='raw-response-writer', daemon=True)
+
+    def start(self):
+        with _active_writers_lock:
+            _active_writers[self.output_folder] = self
+        self._thread.start()
+        return self
+
+    def submit(self, kind, wo_id, response, failed=False):
+        """
+        Encola una respuesta ('header', 'detail' o 'pii') para archivarla.
+        failed indica que la respuesta no se pudo parsear (el modo errors de la política la guarda);
+        solo en ese caso se espera si la cola está llena.
+        """
+        if not response:
+            return
+        if self.capture is not None and not self.capture.should_capture(kind, wo_id, failed):
+            return
+        item = (kind, wo_id, response)
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            if failed:
+                self._submit_failed(item)
+                return
+            self.dropped += 1
+            if self.capture is not None:
+                self.capture.record_dropped()
+
+    def _submit_failed(self, item):
+        # Las respuestas que no se pudieron parsear son las que sirven para depurar
+        while self._thread.is_alive():
+            try:
+                self.queue.put(item, timeout=self.FAILED_SUBMIT_POLL)
+                return
+            except queue.Full:
+                continue
+        self._overflow.append(item)
+
+    def close(self):
+        """Escribe las respuestas pendientes y detiene el thread."""
+        with _active_writers_lock:
+            if _active_writers.get(self.output_folder) is self:
+                del _active_writers[self.output_folder]
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+        # El thread ya cerró el archivo: las respuestas failed que no entraron en la cola se escriben aquí
+        for kind, wo_id, response in self._overflow:
+            try:
+                append_raw_response(self.output_folder, kind, wo_id, response)
+                self.written += 1
+            except (OSError, TypeError, ValueError) as e:
+                self.errors += 1
+                print(f"   ⚠️  Error archivando respuesta raw {kind} {wo_id}: {e}")
+        self._overflow = []
+        if self.dropped:
+            print(f"   ⚠️  {self.dropped} respuestas raw no se guardaron (cola de escritura llena)")
+
+    def _run(self):
+        # El archivo se abre con la primera respuesta: una ejecución sin capturas no crea archivos
+        archive = None
+        try:
+            while True:
+                batch = [self.queue.get()]
+                # Agrupar lo que ya esté en la cola para escribirlo de una vez
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stop = any(item is _STOP for item in batch)
+                batch = [item for item in batch if item is not _STOP]
+                if batch:
+                    try:
+                        archive = archive or RawArchive(self.output_folder)
+                    except OSError as e:
+                        self.errors += len(batch)
+                        print(f"   ⚠️  Error abriendo el archivo de respuestas raw: {e}")
+                    else:
+                        self._write(archive, batch)
+                if stop:
+                    return
+        finally:
+            if archive is not None:
+                archive.close()
+
+    def _write(self, archive, batch):
+        """Agrega el lote al archivo y hace un solo flush."""
+        for kind, wo_id, response in batch:
+            try:
+                archive.append(kind, wo_id, response)
+                self.written += 1
+            except (OSError, TypeError, ValueError) as e:
+                self.errors += 1
+                print(f"   ⚠️  Error archivando respuesta raw {kind} {wo_id}: {e}")
+        archive.flush()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Replay offline de una ejecución archivada: reconstruye el invoice desde las respuestas raw guardadas
+en una carpeta invoice_<timestamp>/ sin hacer ninguna petición a Salesforce.
+
+Sirve para regenerar un mes cuando cambian las reglas de cobro, el filtro por fecha o el HTML.
+La lectura, decodificación y parseo de las respuestas se reparte en un pool de procesos.
+Necesita una ejecución guardada con RAW_CAPTURE=full (o una carpeta antigua con raw_*.json).
+
+Uso:
+    python app/replay_invoice.py VerifoneWorkOrders/invoice_<timestamp> [--from YYYY-MM-DD --to YYYY-MM-DD] [--workers N]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from charge_engine import apply_verifone_charges
+from columnar_postprocess import postprocess_work_orders
+from generate_invoice import (
+    extract_work_order_ids,
+    generate_html,
+    merge_pii_data,
+    parse_pii_details,
+    parse_work_order_data,
+)
+from raw_archive import ARCHIVE_NAME, RawArchiveReader, legacy_response_files, read_legacy_response
+from run_catalog import VERIFONE_INVOICE, record_run
+from run_compaction import find_compacted_run
+
+
+# Work orders por tarea del pool (menos tareas = menos overhead de pickling entre procesos)
+REPLAY_CHUNK_SIZE = 250
+
+# Lector del archivo por proceso (el índice se carga una sola vez por worker)
+_worker_readers = {}
+
+
+def open_archive_reader(run_folder):
+    """
+    RawArchiveReader de una ejecución (archivo único o ya compactada), o None si es una carpeta
+    antigua que solo tiene raw_*.json. El índice se carga una vez para todas las lecturas.
+    """
+    run_folder = Path(run_folder)
+    # Carpeta compactada (run_compaction.py): RawArchiveReader lee del archivo mensual
+    if (run_folder / ARCHIVE_NAME).exists() or not run_folder.exists():
+        return RawArchiveReader(run_folder)
+    return None
+
+
+def _read_with(reader, run_folder, kind, wo_id):
+    """Respuesta del archivo (reader) o, en carpetas antiguas, del raw_*.json individual."""
+    if reader is not None:
+        response = reader.get(kind, wo_id)
+        if response is not None:
+            return response
+    if Path(run_folder).is_dir():
+        return read_legacy_response(run_folder, kind, wo_id)
+    return None
+
+
+def archived_work_order_ids(run_folder, reader=None):
+    """
+    IDs de los work orders con respuesta de detalle guardada, en el orden de las páginas Header
+    (los que no aparecen en el Header van al final).
+
+    Args:
+        reader: Lector ya abierto de la ejecución (default: open_archive_reader(run_folder))
+
+    Returns:
+        tuple: (ids con detalle, ids de las páginas Header sin respuesta de detalle en el archivo)
+    """
+    run_folder = Path(run_folder)
+    if reader is None:
+        reader = open_archive_reader(run_folder)
+    ids = []
+    if reader is not None:
+        ids.extend(wo_id for _, wo_id in reader.keys('detail'))
+    if run_folder.is_dir():
+        ids.extend(wo_id for kind, wo_id, _ in legacy_response_files(run_folder) if kind == 'detail')
+    ids = list(dict.fromkeys(ids))
+
+    header_order = []
+    page = 1
+    while True:
+        header_response = _read_with(reader, run_folder, 'header', page)
+        if header_response is None:
+            break
+        header_order.extend(extract_work_order_ids(header_response))
+        page += 1
+
+    archived = set(ids)
+    without_detail = [wo_id for wo_id in dict.fromkeys(header_order) if wo_id not in archived]
+    position = {wo_id: i for i, wo_id in enumerate(header_order)}
+    return sorted(ids, key=lambda wo_id: position.get(wo_id, len(position))), without_detail
+
+
+def _read_response(run_folder, kind, wo_id):
+    # También se guarda None (carpeta antigua) para no volver a buscar el archivo en cada lectura
+    if run_folder not in _worker_readers:
+        _worker_readers[run_folder] = open_archive_reader(run_folder)
+    return _read_with(_worker_readers[run_folder], run_folder, kind, wo_id)
+
+
+def parse_archived_chunk(run_folder, work_order_ids):
+    """
+    Tarea del pool: lee y parsea el detalle y el PII de un grupo de work orders.
+
+    Returns:
+        list de (wo_id, datos parseados o None si no se pudo reconstruir)
+    """
+    parsed = []
+    for wo_id in work_order_ids:
+        data = parse_work_order_data(_read_response(run_folder, 'detail', wo_id), wo_id)
+        if data is not None:
+            pii_data = parse_pii_details(_read_response(run_folder, 'pii', wo_id), wo_id)
+            merge_pii_data(data, pii_data)
+        parsed.append((wo_id, data))
+    return parsed
+
+
+def load_archived_work_orders(run_folder, workers=None, chunk_size=REPLAY_CHUNK_SIZE):
+    """
+    Reconstruye los work orders parseados de una ejecución archivada.
+
+    Args:
+        run_folder: Carpeta invoice_<timestamp> con las respuestas raw
+        workers: Procesos del pool (default: REPLAY_WORKERS o os.cpu_count(); 1 = sin pool)
+        chunk_size: Work orders por tarea del pool
+
+    Returns:
+        tuple: (work_orders_data, ids que no se pudieron reconstruir: los del Header sin respuesta de
+        detalle y los de respuesta inválida)
+    """
+    if workers is None:
+        workers = int(os.getenv('REPLAY_WORKERS') or 0) or os.cpu_count() or 1
+    run_folder = str(run_folder)
+    reader = open_archive_reader(run_folder)
+    ids, without_detail = archived_work_order_ids(run_folder, reader)
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+    if workers <= 1 or len(chunks) <= 1:
+        # Sin pool: los chunks usan el mismo lector (se suelta al terminar)
+        _worker_readers[run_folder] = reader
+        try:
+            results = [parse_archived_chunk(run_folder, chunk) for chunk in chunks]
+        finally:
+            _worker_readers.pop(run_folder, None)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(parse_archived_chunk, [run_folder] * len(chunks), chunks))
+
+    work_orders_data = []
+    missing = list(without_detail)
+    for chunk in results:
+        for wo_id, data in chunk:
+            if data is None:
+                missing.append(wo_id)
+            else:
+                work_orders_data.append(data)
+    return work_orders_data, missing
+
+
+def replay_invoice(run_folder, output_folder=None, date_from=None, date_to=None, workers=None):
+    """
+    Regenera el invoice de una ejecución archivada (parseo, filtro por fecha, MultipleJobID y HTML).
+
+    Args:
+        run_folder: Carpeta invoice_<timestamp> con las respuestas raw
+        output_folder: Carpeta del HTML generado (default: la misma run_folder; <run_folder>_replay si
+            la ejecución está compactada)
+        date_from: Fecha inicial YYYY-MM-DD (opcional)
+        date_to: Fecha final YYYY-MM-DD (opcional)
+        workers: Procesos del pool de parseo
+
+    Returns:
+        Path del HTML generado, o None si no se pudo reconstruir ningún work order
+    """
+    run_folder = Path(run_folder)
+    if output_folder is None:
+        output_folder = run_folder if run_folder.exists() else run_folder.with_name(f'{run_folder.name}_replay')
+    output_folder = Path(output_folder)
+    start_time = time.time()
+
+    print(f"Replay de {run_folder} (sin peticiones al servidor)...")
+    work_orders_data, missing = load_archived_work_orders(run_folder, workers)
+    print(f"   ✓ {len(work_orders_data)} work orders reconstruidos en {time.time() - start_time:.2f} segundos")
+    if missing:
+        print(f"   ⚠️  {len(missing)} work orders del Header sin respuesta de detalle válida en el archivo "
+              f"(cache de work orders, filtro por fecha o MAX_WORK_ORDERS en la ejecución original)")
+
+    # Filtro por fecha y MultipleJobID (en bloque para historiales grandes, ver columnar_postprocess.py)
+    work_orders_data = postprocess_work_orders(work_orders_data, date_from, date_to)
+    if not work_orders_data:
+        print("✗ No hay work orders para generar el invoice")
+        return None
+
+    # Area y Charge con las reglas de cobro actuales
+    apply_verifone_charges(work_orders_data)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    html_file = generate_html(work_orders_data, output_folder)
+    record_run(VERIFONE_INVOICE, output_folder, total=len(work_orders_data), html_file=html_file,
+               timestamp=output_folder.name[len('invoice_'):] if output_folder.name.startswith('invoice_') else '',
+               date_range=f"{date_from} - {date_to}" if date_from and date_to else '')
+    print(f"   Tiempo total: {time.time() - start_time:.2f} segundos")
+    return html_file
+
+
+def main():
+    """Replay desde línea de comandos."""
+    args = sys.argv[1:]
+    options = {}
+    folders = []
+    while args:
+        arg = args.pop(0)
+        if arg in ('--from', '--to', '--workers', '--output') and args:
+            options[arg] = args.pop(0)
+        else:
+            folders.append(arg)
+
+    # La carpeta ya no existe si la ejecución se compactó (run_compaction.py)
+    if len(folders) != 1 or not (Path(folders[0]).is_dir() or find_compacted_run(folders[0]) is not None):
+        print("Uso: python app/replay_invoice.py <carpeta invoice_*> [--from YYYY-MM-DD --to YYYY-MM-DD] "
+              "[--workers N] [--output carpeta]")
+        sys.exit(1)
+
+    html_file = replay_invoice(folders[0], options.get('--output'), options.get('--from'), options.get('--to'),
+                               int(options['--workers']) if '--workers' in options else None)
+    if html_file is None:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Reintentos, presupuesto de reintentos y circuit breaker por endpoint para las peticiones Aura.
+
+- RetryPolicy: backoff exponencial con jitter ("full jitter") para 429/5xx y errores de conexión
+- RetryBudget: limita los reintentos a una fracción de las peticiones del endpoint
+- CircuitBreaker: si la tasa de error del endpoint se dispara, pausa sus peticiones durante un cooldown
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+
+
+# Respuestas que vale la pena reintentar (None = excepción de conexión/timeout)
+RETRYABLE_STATUSES = (None, 429, 500, 502, 503, 504)
+
+# Endpoints que ya tienen su propio fallback y no se reintentan (batch getRecord -> peticiones individuales)
+NO_RETRY_ENDPOINTS = ('detail_batch',)
+
+
+class RetryPolicy:
+    """Backoff exponencial con jitter: espera aleatoria entre 0 y min(max_delay, base_delay * 2^intento)."""
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None):
+        """
+        Args:
+            max_attempts: Intentos totales por petición (default: 1 + AURA_MAX_RETRIES, AURA_MAX_RETRIES=3)
+            base_delay: Segundos de espera base (default: AURA_RETRY_BASE_DELAY o 0.5)
+            max_delay: Espera máxima entre intentos (default: AURA_RETRY_MAX_DELAY o 20)
+        """
+        if max_attempts is None:
+            max_attempts = 1 + int(os.getenv('AURA_MAX_RETRIES', '3'))
+        if base_delay is None:
+            base_delay = float(os.getenv('AURA_RETRY_BASE_DELAY', '0.5'))
+        if max_delay is None:
+            max_delay = float(os.getenv('AURA_RETRY_MAX_DELAY', '20'))
+
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Segundos a esperar antes del reintento número attempt + 1 (attempt empieza en 0)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class RetryBudget:
+    """
+    Presupuesto de reintentos: cada petición aporta `ratio` tokens y cada reintento cuesta uno.
+    Evita que, con el servidor caído, los reintentos multipliquen la carga.
+    """
+
+    def __init__(self, ratio=None, min_tokens=10):
+        if ratio is None:
+            ratio = float(os.getenv('AURA_RETRY_BUDGET', '0.2'))
+        self.ratio = ratio
+        self.min_tokens = min_tokens
+        self.max_tokens = max(min_tokens, 100)
+        self.tokens = float(min_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self):
+        """Consume un token si hay presupuesto. Retorna True si el reintento está permitido."""
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por tasa de error sobre las últimas `window` respuestas.
+
+    closed -> open cuando la tasa de error llega a error_rate; mientras está abierto las peticiones
+    esperan (admit) hasta que pasa el cooldown; luego half-open: pasa una sola petición de prueba
+    y las demás siguen esperando hasta que su respuesta cierre el circuito (éxito) o lo vuelva a abrir
+    (error). Si la prueba no responde en `cooldown` segundos se deja pasar otra.
+
+    Las respuestas de peticiones que salieron antes de abrir el circuito se ignoran mientras está
+    abierto, y en half-open solo cuenta la respuesta de la prueba vigente (token de admit()).
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    # Cada cuánto vuelven a consultar las peticiones que esperan el resultado de la prueba
+    PROBE_POLL = 0.05
+
+    def __init__(self, error_rate=None, window=None, cooldown=None):
+        if error_rate is None:
+            error_rate = float(os.getenv('AURA_BREAKER_ERROR_RATE', '0.5'))
+        if window is None:
+            window = int(os.getenv('AURA_BREAKER_WINDOW', '20'))
+        if cooldown is None:
+            cooldown = float(os.getenv('AURA_BREAKER_COOLDOWN', '30'))
+
+        self.error_rate = error_rate
+        self.window = max(1, window)
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened = 0
+        self._opened_at = 0
+        self._probe_started = None
+        self._probe = 0
+        self._outcomes = deque(maxlen=self.window)
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """
+        Consulta antes de enviar una petición.
+
+        Returns:
+            tuple: (segundos que hay que esperar antes de volver a consultar (0 = la petición sale),
+            token de la petición de prueba en half-open o None) — el token se pasa a record()
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0, None
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                remaining = self.cooldown - (now - self._opened_at)
+                if remaining > 0:
+                    return remaining, None
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+
+            if self._probe_started is None or now - self._probe_started > self.cooldown:
+                self._probe += 1
+                self._probe_started = now
+                return 0, self._probe
+            return self.PROBE_POLL, None
+
+    def wait_time(self):
+        """Segundos que hay que esperar (0 si el circuito deja pasar la petición); ver admit()."""
+        return self.admit()[0]
+
+    def record(self, success, probe=None):
+        """
+        Registra una respuesta. probe es el token que admit() dio a la petición de prueba (half-open).
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                # Peticiones que ya estaban en vuelo al abrir: no deben extender el cooldown
+                return
+            if self.state == self.HALF_OPEN:
+                if probe is None or probe != self._probe:
+                    return
+                self._probe_started = None
+                if success:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append(success)
+            if len(self._outcomes) == self.window:
+                failures = self._outcomes.count(False)
+                if failures / self.window >= self.error_rate:
+                    self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+
+class EndpointGuard:
+    """Política, presupuesto y circuit breaker de un endpoint (header, detail, detail_batch, pii)."""
+
+    def __init__(self, name, policy, budget, breaker):
+        self.name = name
+        self.policy = policy
+        self.budget = budget
+        self.breaker = breaker
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def record(self, status, probe=None):
+        """
+        Registra una respuesta (None = excepción) en el breaker y el presupuesto.
+        probe: token de CircuitBreaker.admit() si la petición fue la prueba del half-open
+        """
+        success = status not in RETRYABLE_STATUSES
+        with self._lock:
+            self.requests += 1
+            if not success:
+                self.failures += 1
+        self.budget.deposit()
+        self.breaker.record(success, probe)
+
+    def should_retry(self, status, attempt):
+        """True si la respuesta es reintentable, quedan intentos y hay presupuesto."""
+        if status not in RETRYABLE_STATUSES or attempt + 1 >= self.policy.max_attempts:
+            return False
+        if not self.budget.try_spend():
+            return False
+        with self._lock:
+            self.retries += 1
+        return True
+
+    def report(self):
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'failures': self.failures,
+            'breaker': self.breaker.state,
+            'breaker_opened': self.breaker.opened,
+        }
+
+
+class RequestResilience:
+    """
+    Conjunto de EndpointGuard del cliente Aura: un presupuesto y un circuit breaker por endpoint,
+    de forma que los errores de la etapa PII no pausen la etapa de detalle (y al revés).
+    """
+
+    def __init__(self, policy=None, budget_ratio=None, error_rate=None, window=None, cooldown=None):
+        self.policy = policy or RetryPolicy()
+        self._single_attempt = RetryPolicy(max_attempts=1)
+        self._settings = (budget_ratio, error_rate, window, cooldown)
+        self._guards = {}
+        self._lock = threading.Lock()
+
+    def endpoint(self, name):
+        """Retorna (creándolo la primera vez) el EndpointGuard de un endpoint."""
+        with self._lock:
+            if name not in self._guards:
+                budget_ratio, error_rate, window, cooldown = self._settings
+                policy = self._single_attempt if name in NO_RETRY_ENDPOINTS else self.policy
+                self._guards[name] = EndpointGuard(
+                    name, policy, RetryBudget(budget_ratio), CircuitBreaker(error_rate, window, cooldown)
+                )
+            return self._guards[name]
+
+    def report(self):
+        with self._lock:
+            return {name: guard.report() for name, guard in self._guards.items()}
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Catálogo (SQLite) de las ejecuciones terminadas: invoices de Verifone (VerifoneWorkOrders/invoice_*)
+y descargas de Closed Jobs de Ingenico (closedJobIngenico/*).
+
+main() y save_results registran cada ejecución al terminar; /api/get-latest-invoice y
+/api/ingenico/list-downloads responden desde el índice en lugar de recorrer las carpetas
+y leer cada JSON completo.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from run_compaction import ARCHIVE_FOLDER, has_run_file, iter_compacted_runs
+
+
+VERIFONE_INVOICE = 'verifone_invoice'
+INGENICO_CLOSED_JOBS = 'ingenico_closed_jobs'
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Carpeta base de cada tipo de ejecución (para indexar el historial existente la primera vez)
+RUN_FOLDERS = {
+    VERIFONE_INVOICE: PROJECT_ROOT / 'VerifoneWorkOrders',
+    INGENICO_CLOSED_JOBS: PROJECT_ROOT / 'closedJobIngenico',
+}
+
+
+class RunCatalog:
+    """
+    Índice de ejecuciones por tipo, ordenado por nombre de carpeta (empieza con el timestamp,
+    igual que el orden que usaban los endpoints al recorrer las carpetas).
+    """
+
+    def __init__(self, path=None, run_folders=None):
+        """
+        Args:
+            path: Archivo SQLite (default: RUN_CATALOG_PATH o run_catalog.sqlite3 en la raíz del proyecto)
+            run_folders: dict tipo -> carpeta base para indexar el historial (default: RUN_FOLDERS)
+        """
+        if path is None:
+            path = os.getenv('RUN_CATALOG_PATH') or PROJECT_ROOT / 'run_catalog.sqlite3'
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.run_folders = RUN_FOLDERS if run_folders is None else run_folders
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS runs ('
+            'kind TEXT NOT NULL, folder TEXT NOT NULL, sort_key TEXT NOT NULL, timestamp TEXT, '
+            'date_range TEXT, total INTEGER, html_file TEXT, json_file TEXT, recorded_at REAL NOT NULL, '
+            'PRIMARY KEY (kind, folder))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS runs_by_kind ON runs (kind, sort_key)')
+        # Tipos cuyo historial en disco ya se indexó
+        self._conn.execute('CREATE TABLE IF NOT EXISTS backfilled (kind TEXT PRIMARY KEY)')
+        self._conn.commit()
+
+    def record_run(self, kind, folder, total=0, html_file=None, json_file=None, timestamp='', date_range=''):
+        """Registra (o actualiza) una ejecución terminada."""
+        folder = Path(folder).resolve()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO runs (kind, folder, sort_key, timestamp, date_range, total, '
+                'html_file, json_file, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (kind, str(folder), folder.name, timestamp, date_range, total,
+                 html_file and str(Path(html_file).resolve()), json_file and str(Path(json_file).resolve()),
+                 time.time())
+            )
+            self._conn.commit()
+
+    def remove_run(self, kind, folder):
+        """Quita una ejecución borrada (ej: por el presupuesto de disco de run_compaction.py)."""
+        with self._lock:
+            self._conn.execute('DELETE FROM runs WHERE kind = ? AND folder = ?', (kind, str(Path(folder).resolve())))
+            self._conn.commit()
+
+    def list_runs(self, kind, limit=None, offset=0):
+        """
+        Página de ejecuciones de un tipo, de la más reciente a la más antigua. Antes de responder
+        quita del índice las ejecuciones cuya carpeta ya no existe (borradas a mano) y que tampoco
+        están compactadas.
+
+        Args:
+            limit: Ejecuciones por página (None = todas)
+
+        Returns:
+            tuple: (list de dicts, total de ejecuciones del tipo)
+        """
+        self._ensure_backfilled(kind)
+        self._prune_missing(kind)
+        with self._lock:
+            total = self._conn.execute('SELECT COUNT(*) FROM runs WHERE kind = ?', (kind,)).fetchone()[0]
+            rows = self._conn.execute(
+                'SELECT folder, timestamp, date_range, total, html_file, json_file FROM runs '
+                'WHERE kind = ? ORDER BY sort_key DESC LIMIT ? OFFSET ?',
+                (kind, -1 if limit is None else max(0, limit), max(0, offset))
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows], total
+
+    def latest(self, kind):
+        """Ejecución más reciente con HTML generado que siga disponible (en disco o compactada), o None."""
+        self._ensure_backfilled(kind)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT folder, timestamp, date_range, total, html_file, json_file FROM runs '
+                'WHERE kind = ? AND html_file IS NOT NULL ORDER BY sort_key DESC',
+                (kind,)
+            ).fetchall()
+        for row in rows:
+            run = self._row_to_dict(row)
+            name = run_file_name(run, 'html_file')
+            if name is not None and has_run_file(run['folder'], name):
+                return run
+        return None
+
+    @staticmethod
+    def _row_to_dict(row):
+        folder, timestamp, date_range, total, html_file, json_file = row
+        return {
+            'folder': folder,
+            'timestamp': timestamp,
+            'date_range': date_range,
+            'total': total,
+            'html_file': html_file,
+            'json_file': json_file,
+        }
+
+    def _prune_missing(self, kind):
+        """Quita las ejecuciones que ya no están en disco ni en el archivo compactado."""
+        with self._lock:
+            folders = [Path(row[0]) for row in
+                       self._conn.execute('SELECT folder FROM runs WHERE kind = ?', (kind,)).fetchall()]
+
+        missing = [folder for folder in folders if not folder.is_dir()]
+        if not missing:
+            return
+        # Nombres compactados por carpeta base (el índice del archivo se lee una sola vez)
+        compacted = {}
+        for folder in missing:
+            if folder.parent not in compacted:
+                compacted[folder.parent] = {run.name for run in iter_compacted_runs(folder.parent)}
+        gone = [str(folder) for folder in missing if folder.name not in compacted[folder.parent]]
+        if not gone:
+            return
+
+        with self._lock:
+            self._conn.executemany('DELETE FROM runs WHERE kind = ? AND folder = ?', [(kind, folder) for folder in gone])
+            self._conn.commit()
+
+    def _ensure_backfilled(self, kind):
+        """La primera vez que se consulta un tipo, indexa las ejecuciones que ya estaban en disco."""
+        with self._lock:
+            done = self._conn.execute('SELECT 1 FROM backfilled WHERE kind = ?', (kind,)).fetchone()
+        if done:
+            return
+
+        base_folder = self.run_folders.get(kind)
+        if base_folder is not None and Path(base_folder).exists():
+            if kind == VERIFONE_INVOICE:
+                self._backfill_invoices(Path(base_folder))
+            elif kind == INGENICO_CLOSED_JOBS:
+                self._backfill_ingenico(Path(base_folder))
+
+        with self._lock:
+            self._conn.execute('INSERT OR IGNORE INTO backfilled (kind) VALUES (?)', (kind,))
+            self._conn.commit()
+
+    def _backfill_invoices(self, base_folder):
+        runs = [(folder, [path.name for path in folder.glob('*.html')])
+                for folder in base_folder.glob('invoice_*') if folder.is_dir()]
+        runs += [(base_folder / run.name, [name for name in run.files() if name.endswith('.html')])
+                 for run in iter_compacted_runs(base_folder) if run.name.startswith('invoice_')]
+
+        for folder, html_files in runs:
+            if not self._has_run(VERIFONE_INVOICE, folder):
+                self.record_run(VERIFONE_INVOICE, folder, html_file=folder / sorted(html_files)[0] if html_files else None,
+                                timestamp=folder.name[len('invoice_'):])
+
+    def _backfill_ingenico(self, base_folder):
+        # Carpetas en disco y ejecuciones ya compactadas (run_compaction.py)
+        runs = [(folder, lambda path: path.read_bytes(), [path.name for path in folder.glob('*.json')])
+                for folder in base_folder.iterdir() if folder.is_dir() and folder.name != ARCHIVE_FOLDER]
+        runs += [(base_folder / run.name, lambda path, run=run: run.read_bytes(path.name),
+                  [name for name in run.files() if name.endswith('.json')])
+                 for run in iter_compacted_runs(base_folder)]
+
+        for folder, read_bytes, json_files in runs:
+            if not json_files or self._has_run(INGENICO_CLOSED_JOBS, folder):
+                continue
+            json_file = folder / json_files[0]
+            try:
+                metadata = json.loads(read_bytes(json_file)).get('metadata', {})
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Error leyendo {json_file}: {e}")
+                continue
+            filters = metadata.get('filters', {})
+            self.record_run(INGENICO_CLOSED_JOBS, folder, total=metadata.get('total_jobs', 0),
+                            html_file=str(json_file).replace('.json', '.html'), json_file=json_file,
+                            timestamp=metadata.get('fetch_timestamp', ''),
+                            date_range=f"{filters.get('from_date', '')} - {filters.get('to_date', '')}")
+
+    def _has_run(self, kind, folder):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT 1 FROM runs WHERE kind = ? AND folder = ?', (kind, str(Path(folder).resolve()))
+            ).fetchone() is not None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def run_file_name(run, field):
+    """Ruta de run[field] (html_file / json_file) relativa a la carpeta de la ejecución, o None."""
+    if not run.get(field):
+        return None
+    try:
+        return Path(run[field]).relative_to(run['folder']).as_posix()
+    except ValueError:
+        return None
+
+
+def record_run(kind, folder, **fields):
+    """Registra una ejecución en el catálogo por defecto (abre y cierra la conexión)."""
+    try:
+        with RunCatalog() as catalog:
+            catalog.record_run(kind, folder, **fields)
+    except sqlite3.Error as e:
+        # El catálogo es un índice: si falla, la ejecución ya quedó guardada en disco
+        print(f"   ⚠️  No se pudo registrar la ejecución en el catálogo: {e}")
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Retención y compactación de las carpetas de ejecuciones (VerifoneWorkOrders/invoice_* y closedJobIngenico/*).
+
+Las ejecuciones más antiguas que RUN_RETENTION_DAYS se mueven a un archivo comprimido por mes:
+
+    <carpeta base>/_archive/
+        index.json              nombre de ejecución -> mes (YYYY-MM)
+        2025-10/
+            objects.gz          contenidos comprimidos (un miembro gzip por contenido, sin duplicados)
+            objects.idx         sha256<TAB>offset<TAB>length
+            runs.json           por ejecución: archivo -> sha256 y respuestas raw (tipo, id) -> sha256
+
+Los contenidos idénticos (mismas respuestas raw o páginas Header de ejecuciones repetidas del mismo
+periodo, HTML iguales, ...) se guardan una sola vez por mes. Los JSON se guardan compactos.
+
+Los lectores (raw_archive.RawArchiveReader / read_raw_response, el replay y el catálogo de ejecuciones)
+encuentran las ejecuciones compactadas con find_compacted_run() sin cambios para el usuario; los HTML y
+JSON de una ejecución se leen con read_run_file() (los sirve /api/runs/... en app.py).
+
+Uso:
+    python app/run_compaction.py [--older-than-days N] [--budget-mb N] [--dry-run]
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from raw_archive import ARCHIVE_NAME, INDEX_NAME, RawArchiveReader, legacy_response_files
+
+
+ARCHIVE_FOLDER = '_archive'
+RUN_INDEX_NAME = 'index.json'
+OBJECTS_NAME = 'objects.gz'
+OBJECTS_INDEX_NAME = 'objects.idx'
+MANIFEST_NAME = 'runs.json'
+
+_compaction_lock = threading.Lock()
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path, default):
+    if not path.exists():
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def folder_size(path):
+    """Bytes ocupados por los archivos de una carpeta (recursivo)."""
+    return sum(item.stat().st_size for item in Path(path).rglob('*') if item.is_file())
+
+
+class MonthArchive:
+    """Archivo de un mes: almacén de contenidos sin duplicados + manifiesto de las ejecuciones."""
+
+    def __init__(self, base_folder, month):
+        self.folder = Path(base_folder) / ARCHIVE_FOLDER / month
+        self.month = month
+        self._offsets = None
+        self._manifest = None
+
+    def _load_offsets(self):
+        if self._offsets is None:
+            self._offsets = {}
+            index_path = self.folder / OBJECTS_INDEX_NAME
+            if index_path.exists():
+                with open(index_path, 'r') as f:
+                    for line in f:
+                        parts = line.rstrip('\n').split('\t')
+                        if len(parts) == 3:
+                            self._offsets[parts[0]] = (int(parts[1]), int(parts[2]))
+        return self._offsets
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            self._manifest = _read_json(self.folder / MANIFEST_NAME, {})
+        return self._manifest
+
+    def put_objects(self, payloads):
+        """
+        Agrega contenidos al almacén (los que ya estén no se vuelven a escribir).
+
+        Args:
+            payloads: iterable de bytes
+
+        Returns:
+            tuple: (lista de sha256 en el mismo orden, bytes comprimidos nuevos escritos)
+        """
+        offsets = self._load_offsets()
+        self.folder.mkdir(parents=True, exist_ok=True)
+        digests = []
+        written = 0
+        with open(self.folder / OBJECTS_NAME, 'ab') as data, open(self.folder / OBJECTS_INDEX_NAME, 'a') as index:
+            offset = data.seek(0, 2)
+            for payload in payloads:
+                digest = hashlib.sha256(payload).hexdigest()
+                digests.append(digest)
+                if digest in offsets:
+                    continue
+                member = gzip.compress(payload, compresslevel=9)
+                data.write(member)
+                index.write(f"{digest}\t{offset}\t{len(member)}\n")
+                offsets[digest] = (offset, len(member))
+                offset += len(member)
+                written += len(member)
+        return digests, written
+
+    def get_object(self, digest):
+        offset, length = self._load_offsets()[digest]
+        with open(self.folder / OBJECTS_NAME, 'rb') as f:
+            f.seek(offset)
+            return gzip.decompress(f.read(length))
+
+    def save_manifest(self):
+        _write_json_atomic(self.folder / MANIFEST_NAME, self.manifest)
+
+
+class CompactedRun:
+    """Vista de solo lectura de una ejecución compactada (archivos y respuestas raw)."""
+
+    def __init__(self, archive, name):
+        self.archive = archive
+        self.name = name
+        self.entry = archive.manifest[name]
+        self._records = {(kind, wo_id): digest for kind, wo_id, digest in self.entry.get('records', [])}
+
+    def files(self):
+        """Nombres (relativos a la carpeta original) de los archivos de la ejecución."""
+        return list(self.entry.get('files', {}))
+
+    def read_bytes(self, name):
+        return self.archive.get_object(self.entry['files'][name])
+
+    def raw_keys(self):
+        return list(self._records)
+
+    def raw_response(self, kind, wo_id):
+        digest = self._records.get((kind, str(wo_id)))
+        if digest is None:
+            return None
+        return json.loads(self.archive.get_object(digest))
+
+
+def find_compacted_run(run_folder):
+    """Retorna la CompactedRun de una carpeta de ejecución que ya fue compactada, o None."""
+    run_folder = Path(run_folder)
+    index = _read_json(run_folder.parent / ARCHIVE_FOLDER / RUN_INDEX_NAME, {})
+    month = index.get(run_folder.name)
+    if month is None:
+        return None
+    archive = MonthArchive(run_folder.parent, month)
+    if run_folder.name not in archive.manifest:
+        return None
+    return CompactedRun(archive, run_folder.name)
+
+
+def _run_file_path(run_folder, name):
+    """Ruta de un archivo dentro de la carpeta de la ejecución (None si name sale de la carpeta)."""
+    run_folder = Path(run_folder).resolve()
+    path = (run_folder / name).resolve()
+    return path if path.is_relative_to(run_folder) and path != run_folder else None
+
+
+def has_run_file(run_folder, name):
+    """True si la ejecución tiene el archivo, en su carpeta o ya compactado."""
+    path = _run_file_path(run_folder, name)
+    if path is None:
+        return False
+    if path.is_file():
+        return True
+    run = find_compacted_run(run_folder)
+    return run is not None and name in run.entry.get('files', {})
+
+
+def read_run_file(run_folder, name):
+    """
+    Contenido de un archivo de una ejecución: desde su carpeta o, si ya se compactó, desde el archivo mensual.
+
+    Args:
+        run_folder: Carpeta de la ejecución (aunque ya se haya borrado al compactarla)
+        name: Ruta del archivo relativa a la carpeta (como en files())
+
+    Returns:
+        bytes, o None si la ejecución no tiene ese archivo
+    """
+    path = _run_file_path(run_folder, name)
+    if path is None:
+        return None
+    if path.is_file():
+        return path.read_bytes()
+    run = find_compacted_run(run_folder)
+    if run is None or name not in run.entry.get('files', {}):
+        return None
+    return run.read_bytes(name)
+
+
+def iter_compacted_runs(base_folder):
+    """Genera las CompactedRun de una carpeta base."""
+    index = _read_json(Path(base_folder) / ARCHIVE_FOLDER / RUN_INDEX_NAME, {})
+    archives = {}
+    for name, month in sorted(index.items()):
+        archive = archives.setdefault(month, MonthArchive(base_folder, month))
+        if name in archive.manifest:
+            yield CompactedRun(archive, name)
+
+
+def _file_payload(path):
+    """Contenido a archivar: los JSON se re-serializan compactos (mejor deduplicación)."""
+    payload = path.read_bytes()
+    if path.suffix == '.json':
+        try:
+            payload = json.dumps(json.loads(payload), separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        except ValueError:
+            pass
+    return payload
+
+
+def _raw_records(run_folder):
+    """Genera (tipo, id, respuesta) de las respuestas raw de una carpeta y los archivos que las contenían."""
+    consumed = set()
+    records = []
+    if (run_folder / ARCHIVE_NAME).exists():
+        reader = RawArchiveReader(run_folder)
+        records.extend(reader)
+        consumed.update({run_folder / ARCHIVE_NAME, run_folder / INDEX_NAME})
+    for kind, wo_id, path in legacy_response_files(run_folder):
+        opener = gzip.open if path.name.endswith('.gz') else open
+        try:
+            with opener(path, 'rt') as f:
+                records.append((kind, wo_id, json.load(f)))
+        except ValueError:
+            continue
+        consumed.add(path)
+    return records, consumed
+
+
+def compact_run(run_folder, month=None):
+    """
+    Mueve una ejecución a su archivo mensual y borra la carpeta.
+
+    Args:
+        run_folder: Carpeta de la ejecución
+        month: Mes destino YYYY-MM (default: mes de la última modificación de la carpeta)
+
+    Returns:
+        dict con original_bytes y stored_bytes (bytes comprimidos nuevos, después de deduplicar)
+    """
+    run_folder = Path(run_folder)
+    base_folder = run_folder.parent
+    if month is None:
+        month = datetime.fromtimestamp(run_folder.stat().st_mtime).strftime('%Y-%m')
+
+    original_bytes = folder_size(run_folder)
+    records, consumed = _raw_records(run_folder)
+    files = [path for path in sorted(run_folder.rglob('*')) if path.is_file() and path not in consumed]
+
+    archive = MonthArchive(base_folder, month)
+    record_digests, written = archive.put_objects(
+        json.dumps(response, separators=(',', ':')).encode('utf-8') for _, _, response in records
+    )
+    file_digests, written_files = archive.put_objects(_file_payload(path) for path in files)
+
+    archive.manifest[run_folder.name] = {
+        'compacted_at': time.time(),
+        'original_bytes': original_bytes,
+        'files': {path.relative_to(run_folder).as_posix(): digest for path, digest in zip(files, file_digests)},
+        'records': [[kind, str(wo_id), digest] for (kind, wo_id, _), digest in zip(records, record_digests)],
+    }
+    archive.save_manifest()
+
+    index_path = base_folder / ARCHIVE_FOLDER / RUN_INDEX_NAME
+    index = _read_json(index_path, {})
+    index[run_folder.name] = month
+    _write_json_atomic(index_path, index)
+
+    # La carpeta se borra solo cuando el manifiesto y el índice ya apuntan al archivo
+    shutil.rmtree(run_folder)
+    return {'original_bytes': original_bytes, 'stored_bytes': written + written_files}
+
+
+def run_folders(base_folder):
+    """Carpetas de ejecuciones de una carpeta base (excluye el archivo)."""
+    base_folder = Path(base_folder)
+    if not base_folder.exists():
+        return []
+    return [path for path in base_folder.iterdir() if path.is_dir() and path.name != ARCHIVE_FOLDER]
+
+
+def enforce_budget(base_folder, budget_bytes, keep_after=None):
+    """
+    Borra los archivos mensuales más antiguos hasta que la carpeta base quepa en budget_bytes.
+    Nunca borra carpetas de ejecuciones sin compactar ni meses posteriores a keep_after (YYYY-MM).
+
+    Returns:
+        list de (mes, nombres de las ejecuciones borradas)
+    """
+    base_folder = Path(base_folder)
+    archive_root = base_folder / ARCHIVE_FOLDER
+    if not archive_root.exists():
+        return []
+
+    removed = []
+    total = folder_size(base_folder)
+    months = sorted(path for path in archive_root.iterdir() if path.is_dir())
+    for month_folder in months:
+        if total <= budget_bytes or (keep_after and month_folder.name >= keep_after):
+            break
+        names = list(MonthArchive(base_folder, month_folder.name).manifest)
+        total -= folder_size(month_folder)
+        shutil.rmtree(month_folder)
+
+        index_path = archive_root / RUN_INDEX_NAME
+        index = _read_json(index_path, {})
+        for name in names:
+            index.pop(name, None)
+        _write_json_atomic(index_path, index)
+        removed.append((month_folder.name, names))
+    return removed
+
+
+def compact_base_folder(base_folder, older_than_days=None, budget_bytes=None, dry_run=False, on_removed=None):
+    """
+    Compacta las ejecuciones antiguas de una carpeta base y aplica el presupuesto de disco.
+
+    Args:
+        base_folder: VerifoneWorkOrders o closedJobIngenico
+        older_than_days: Antigüedad mínima (default: RUN_RETENTION_DAYS o 30)
+        budget_bytes: Tamaño máximo de la carpeta base (default: RUN_ARCHIVE_BUDGET_MB; vacío = sin límite)
+        dry_run: Solo listar lo que se compactaría
+        on_removed: callback(carpeta de ejecución) por cada ejecución borrada por el presupuesto
+
+    Returns:
+        dict con las estadísticas
+    """
+    if older_than_days is None:
+        older_than_days = float(os.getenv('RUN_RETENTION_DAYS', '30'))
+    if budget_bytes is None and os.getenv('RUN_ARCHIVE_BUDGET_MB'):
+        budget_bytes = int(float(os.getenv('RUN_ARCHIVE_BUDGET_MB')) * 1024 * 1024)
+
+    base_folder = Path(base_folder)
+    cutoff = time.time() - older_than_days * 86400
+    candidates = sorted(path for path in run_folders(base_folder) if path.stat().st_mtime < cutoff)
+    stats = {'runs': len(candidates), 'original_bytes': 0, 'stored_bytes': 0, 'removed_months': []}
+    if dry_run:
+        stats['original_bytes'] = sum(folder_size(path) for path in candidates)
+        return stats
+
+    with _compaction_lock:
+        for run_folder in candidates:
+            result = compact_run(run_folder)
+            stats['original_bytes'] += result['original_bytes']
+            stats['stored_bytes'] += result['stored_bytes']
+
+        if budget_bytes is not None:
+            keep_after = datetime.fromtimestamp(cutoff).strftime('%Y-%m')
+            for month, names in enforce_budget(base_folder, budget_bytes, keep_after):
+                stats['removed_months'].append(month)
+                for name in names:
+                    if on_removed:
+                        on_removed(base_folder / name)
+    return stats
+
+
+def main():
+    """Compacta VerifoneWorkOrders/ y closedJobIngenico/ desde línea de comandos."""
+    from run_catalog import RUN_FOLDERS, RunCatalog
+
+    args = sys.argv[1:]
+    options = {}
+    while args:
+        arg = args.pop(0)
+        if arg == '--dry-run':
+            options[arg] = True
+        elif arg in ('--older-than-days', '--budget-mb') and args:
+            options[arg] = float(args.pop(0))
+        else:
+            print("Uso: python app/run_compaction.py [--older-than-days N] [--budget-mb N] [--dry-run]")
+            sys.exit(1)
+
+    budget_bytes = int(options['--budget-mb'] * 1024 * 1024) if '--budget-mb' in options else None
+    with RunCatalog() as catalog:
+        for kind, base_folder in RUN_FOLDERS.items():
+            stats = compact_base_folder(
+                base_folder, options.get('--older-than-days'), budget_bytes, options.get('--dry-run', False),
+                on_removed=lambda folder, kind=kind: catalog.remove_run(kind, folder)
+            )
+            print(f"✓ {base_folder.name}: {stats['runs']} ejecuciones compactadas "
+                  f"({stats['original_bytes'] / 1024 / 1024:.1f} MB -> {stats['stored_bytes'] / 1024 / 1024:.1f} MB nuevos)")
+            for month in stats['removed_months']:
+                print(f"   Presupuesto de disco: archivo {month} eliminado")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Cache local (SQLite) de work orders ya procesados.
+Guarda el resultado de parse_work_order_data + parse_pii_details por ID de work order para que
+una nueva generación del mismo periodo solo pida al servidor los registros nuevos o modificados.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+# Campos de la list view que indican que un work order cambió (en orden de preferencia)
+SIGNATURE_FIELDS = ('LastModifiedDate', 'SystemModstamp', 'Status')
+
+# Campos que cambian con cualquier edición del registro (Status solo cambia con algunas)
+MODIFICATION_FIELDS = ('LastModifiedDate', 'SystemModstamp')
+
+# Horas que un registro sin firma (o con firma de solo Status) se considera vigente
+DEFAULT_MAX_AGE_HOURS = 12
+
+
+def list_view_fields(record):
+    """Retorna el dict de fields de un record de la list view (ej: record['WorkOrder']['record']['fields'])."""
+    if not isinstance(record, dict):
+        return {}
+    for value in record.values():
+        if isinstance(value, dict) and isinstance(value.get('record'), dict):
+            return value['record'].get('fields', {})
+    return {}
+
+
+def extract_work_order_signatures(json_response):
+    """
+    Construye la firma de cambio de cada work order de una página Header.
+
+    La firma concatena 'campo=valor' de los SIGNATURE_FIELDS que la list view devuelve;
+    si no viene ninguno el work order no tiene firma (None) y se usa la antigüedad del cache.
+
+    Returns:
+        dict: wo_id -> firma (str o None)
+    """
+    try:
+        records = json_response['context']['globalValueProviders'][2]['values']['records']
+    except (KeyError, IndexError, TypeError):
+        return {}
+
+    signatures = {}
+    for wo_id, record in records.items():
+        fields = list_view_fields(record)
+        values = [
+            f"{name}={fields[name].get('value')}"
+            for name in SIGNATURE_FIELDS
+            if isinstance(fields.get(name), dict) and fields[name].get('value') is not None
+        ]
+        signatures[wo_id] = '|'.join(values) if values else None
+    return signatures
+
+
+def is_modification_signature(signature):
+    """True si la firma incluye LastModifiedDate o SystemModstamp (no solo Status)."""
+    return any(part.split('=', 1)[0] in MODIFICATION_FIELDS for part in signature.split('|'))
+
+
+class WorkOrderCache:
+    """
+    Cache de work orders parseados en SQLite, compartido por los workers del motor de peticiones.
+
+    Política de frescura:
+    - Si la firma cambió, el registro ya no es válido
+    - Con LastModifiedDate/SystemModstamp en la firma, el registro es válido mientras la firma coincida
+    - Sin firma, o con solo Status (una edición que no cambia el Status no se nota), el registro es
+      válido durante max_age_hours desde que se guardó
+    """
+
+    def __init__(self, path=None, max_age_hours=None):
+        """
+        Args:
+            path: Archivo SQLite (default: WO_CACHE_PATH o VerifoneWorkOrders/work_order_cache.sqlite3)
+            max_age_hours: Vigencia de los registros sin firma o con solo Status (default: WO_CACHE_MAX_AGE_HOURS o 12)
+        """
+        if path is None:
+            path = os.getenv('WO_CACHE_PATH') or Path(__file__).parent.parent / 'VerifoneWorkOrders' / 'work_order_cache.sqlite3'
+        if max_age_hours is None:
+            max_age_hours = float(os.getenv('WO_CACHE_MAX_AGE_HOURS', str(DEFAULT_MAX_AGE_HOURS)))
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age_hours * 3600
+        self.hits = 0
+        self.misses = 0
+
+        # Una sola conexión protegida por lock: los workers solo hacen lecturas/escrituras puntuales
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS work_orders ('
+            'wo_id TEXT PRIMARY KEY, signature TEXT, data TEXT NOT NULL, cached_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def get(self, wo_id, signature=None):
+        """Retorna los datos cacheados del work order si siguen vigentes, o None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT signature, data, cached_at FROM work_orders WHERE wo_id = ?', (wo_id,)
+            ).fetchone()
+
+            if row is None or not self._is_fresh(row, signature):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[1])
+
+    def _is_fresh(self, row, signature):
+        cached_signature, _, cached_at = row
+        if signature is not None:
+            if cached_signature != signature:
+                return False
+            if is_modification_signature(signature):
+                return True
+        return time.time() - cached_at <= self.max_age
+
+    def report(self):
+        """Aciertos y pedidos al servidor (para el estado de la generación y el resumen)."""
+        return {'hits': self.hits, 'misses': self.misses, 'max_age_hours': self.max_age / 3600}
+
+    def put(self, wo_id, signature, data):
+        """Guarda (o reemplaza) los datos parseados de un work order."""
+        payload = json.dumps(dict(data))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO work_orders (wo_id, signature, data, cached_at) VALUES (?, ?, ?, ?)',
+                (wo_id, signature, payload, time.time())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Registro compacto de un work order parseado (WorkOrder).
+
+Reemplaza el dict de ~30 claves que arma parse_work_order_data: los campos viven en __slots__
+(sin dict por registro) y los valores categóricos (zona, tipo de trabajo, dispositivo, estado, ...)
+se internan para que todos los registros compartan el mismo objeto string.
+
+WorkOrder se comporta como un dict (wo['job_id'], wo.get(...), wo[...] = ..., dict(wo)), así que
+los consumidores existentes (filtros, MultipleJobID, generate_html, cache) no cambian.
+"""
+
+import sys
+from collections.abc import MutableMapping
+
+
+# Campos en el mismo orden que el dict original (dict(wo) / JSON conservan el orden)
+FIELDS = (
+    'job_id', 'fsp', 'client_id', 'job_type', 'terminal_id', 'required_by', 'merchant_name',
+    'suburb', 'postcode', 'area', 'onsite_datetime', 'onsite_timestamp', 'filter_date',
+    'onsite_end_time_iso', 'onsite_start_time_iso', 'device_type', 'project_no', 'billable', 'fix',
+    'is_onsite', 'sla_met', 'multiple_job_id', 'extra_time', 'after_hour', 'weekend',
+    'extratime_block', 'charge', 'street', 'location_key',
+)
+
+# Campos de baja cardinalidad: se internan (un solo objeto string por valor distinto)
+CATEGORICAL_FIELDS = frozenset((
+    'client_id', 'job_type', 'suburb', 'postcode', 'area', 'device_type', 'fix', 'after_hour', 'weekend',
+))
+
+# Valores por defecto distintos de '' (None = "no calculado": los registros antiguos se recalculan)
+DEFAULTS = {'onsite_timestamp': None, 'filter_date': None, 'is_onsite': False, 'location_key': None}
+
+_FIELD_SET = frozenset(FIELDS)
+
+
+class WorkOrder(MutableMapping):
+    """
+    Work order parseado con __slots__ y adaptador de dict.
+
+    Las claves fuera de FIELDS (agregadas por etapas posteriores) se guardan en un dict aparte
+    que solo se crea si hace falta. Los campos fijos no se pueden borrar.
+    """
+
+    __slots__ = FIELDS + ('_extra',)
+
+    def __init__(self, **fields):
+        set_field = object.__setattr__
+        for name in FIELDS:
+            set_field(self, name, DEFAULTS.get(name, ''))
+        self._extra = None
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        """Crea un WorkOrder desde un dict (resultado de parse_work_order_data, cache, JSON)."""
+        if isinstance(data, cls):
+            return data
+        return cls(**data)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            if key in CATEGORICAL_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            object.__setattr__(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _FIELD_SET or self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self):
+        yield from FIELDS
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return len(FIELDS) + (len(self._extra) if self._extra else 0)
+
+    def __bool__(self):
+        # Siempre tiene los campos fijos (evita pasar por __len__ en los "if wo")
+        return True
+
+    def __contains__(self, key):
+        return key in _FIELD_SET or (self._extra is not None and key in self._extra)
+
+    def get(self, key, default=None):
+        # Versión directa (la de Mapping pasa por una excepción cuando la clave no existe)
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __repr__(self):
+        return f"WorkOrder(job_id={self.job_id!r}, onsite_datetime={self.onsite_datetime!r})"
+
+    def __getstate__(self):
+        # Pickle (pool de procesos del replay): solo los valores, en el orden de FIELDS
+        return tuple(getattr(self, name) for name in FIELDS), self._extra
+
+    def __setstate__(self, state):
+        values, extra = state
+        for name, value in zip(FIELDS, values):
+            self[name] = value
+        self._extra = extra
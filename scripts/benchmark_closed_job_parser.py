@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los parsers del Closed Job List de Ingenico (app/closed_job_parser.py): árbol de
+BeautifulSoup (bs4), eventos de html.parser (stream) y lxml (si está instalado).
+
+Las páginas sintéticas repiten las filas de datos de data/Closed Job List.html (x1, x10, x50 por
+defecto) dentro del mismo documento; antes de medir se verifica que todos los parsers den el
+mismo resultado que bs4.
+
+Uso:
+    python scripts/benchmark_closed_job_parser.py [--scales 1,10,50] [--repeat N] [archivo.html]
+"""
+
+import logging
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / 'app'))
+sys.path.insert(0, str(ROOT / 'scripts'))
+
+import closed_job_parser
+from fetch_ingenico_closed_jobs import parse_html_table
+
+def scaled_page(html, scale):
+    """La página con las filas de datos de la tabla (entre headers y paginación) repetidas scale veces."""
+    first = html.index('</tr>', html.index(closed_job_parser.HEADER_ROW_CLASS)) + len('</tr>')
+    last = html.index(f'<tr class="{closed_job_parser.PAGER_ROW_CLASS}">', first)
+    return html[:first] + html[first:last] * scale + html[last:]
+
+
+def bench(html, parser, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_html_table(html, parser)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = 5
+    scales = [1, 10, 50]
+    if '--repeat' in args:
+        position = args.index('--repeat')
+        repeat = int(args[position + 1])
+        del args[position:position + 2]
+    if '--scales' in args:
+        position = args.index('--scales')
+        scales = [int(value) for value in args[position + 1].split(',')]
+        del args[position:position + 2]
+
+    source = Path(args[0]) if args else ROOT / 'data' / 'Closed Job List.html'
+    html = source.read_text(encoding='utf-8', errors='replace')
+    parsers = ['bs4', 'stream'] + (['lxml'] if closed_job_parser.lxml is not None else [])
+    logging.disable(logging.INFO)  # parse_html_table registra cada llamada
+
+    print(f"Página base: {source} ({len(html) / 1024:.0f} KB); parsers: {', '.join(parsers)}")
+    for scale in scales:
+        page = scaled_page(html, scale)
+        expected = parse_html_table(page, 'bs4')
+        for parser in parsers[1:]:
+            assert parse_html_table(page, parser) == expected, f"{parser} no coincide con bs4 (x{scale})"
+
+        print(f"x{scale}: {len(page) / 1024:.0f} KB, {len(expected)} trabajos (mejor de {repeat})")
+        baseline = None
+        for parser in parsers:
+            elapsed = bench(page, parser, repeat)
+            baseline = baseline or elapsed
+            print(f"   {parser:<8} {elapsed * 1000:9.2f} ms  ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de la extracción de campos: extractores compilados (app/field_extractor.py)
+contra la extracción campo por campo con extract_field_value / extract_field_display_value.
+
+Usa las respuestas de detalle y PII grabadas de una ejecución (raw_responses.ndjson.gz) o, sin
+carpeta, registros con la misma estructura que genera el servidor Aura de pruebas.
+
+Uso:
+    python scripts/benchmark_field_extractor.py [VerifoneWorkOrders/invoice_<timestamp>] [--repeat N]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / 'app'))
+sys.path.insert(0, str(ROOT / 'tests'))
+
+from field_extractor import DETAIL_FIELDS, DISPLAY, PII_FIELDS, extract_detail_fields, extract_pii_fields
+from generate_invoice import extract_field_display_value, extract_field_value
+from raw_archive import RawArchiveReader
+
+
+def record_fields(wo_id, api_response):
+    """fields del record de un work order dentro de una respuesta getRecord (None si no está)."""
+    for provider in api_response.get('context', {}).get('globalValueProviders', []):
+        if provider.get('type') == '$Record':
+            record = provider.get('values', {}).get('records', {}).get(wo_id)
+            if record:
+                return record.get('WorkOrder', {}).get('record', {}).get('fields', {})
+    return None
+
+
+def output_variables(pii_response):
+    try:
+        return pii_response['actions'][0]['returnValue']['response']['outputVariables']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def load_recorded_fixtures(run_folder):
+    reader = RawArchiveReader(run_folder)
+    details = [record_fields(wo_id, reader.get('detail', wo_id)) for _, wo_id in reader.keys('detail')]
+    piis = [output_variables(reader.get('pii', wo_id)) for _, wo_id in reader.keys('pii')]
+    return [fields for fields in details if fields is not None], [variables for variables in piis if variables]
+
+
+def load_stub_fixtures(count=2000):
+    from aura_stub import detail_record
+
+    details = [detail_record(f'0WOSTUB{n:011d}', n)['WorkOrder']['record']['fields'] for n in range(1, count + 1)]
+    piis = [[
+        {'name': 'WorkOrder', 'value': {'terminal_id_c__c': f"T{n:05d}", 'street__c': f"{n} King William St"}},
+        {'name': 'Account', 'value': {'City': 'Adelaide', 'PostalCode': '5000'}},
+    ] for n in range(1, count + 1)]
+    return details, piis
+
+
+def legacy_detail_fields(fields):
+    # Una llamada por columna, como hacía parse_work_order_data antes del mapeo compilado
+    return {
+        column: (extract_field_display_value if mode == DISPLAY else extract_field_value)(fields, source)
+        for column, source, mode in DETAIL_FIELDS
+    }
+
+
+def legacy_pii_fields(variables):
+    result = {column: '' for column, _, _ in PII_FIELDS}
+    for column, index, key in PII_FIELDS:
+        if index is not None and len(variables) > index:
+            result[column] = variables[index].get('value', {}).get(key, '') or ''
+    return result
+
+
+def bench(label, function, items, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    per_record = best / max(1, len(items)) * 1e6
+    print(f"   {label:<28} {best * 1000:8.2f} ms  ({per_record:.2f} µs/registro)")
+    return best
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = 20
+    if '--repeat' in args:
+        position = args.index('--repeat')
+        repeat = int(args[position + 1])
+        del args[position:position + 2]
+
+    if args:
+        details, piis = load_recorded_fixtures(args[0])
+        print(f"Fixtures grabados de {args[0]}: {len(details)} detalles, {len(piis)} PII")
+    else:
+        details, piis = load_stub_fixtures()
+        print(f"Fixtures del servidor de pruebas: {len(details)} detalles, {len(piis)} PII")
+
+    for fields in details:
+        assert extract_detail_fields(fields) == legacy_detail_fields(fields)
+    for variables in piis:
+        assert extract_pii_fields(variables) == legacy_pii_fields(variables)
+
+    print(f"Detalle (mejor de {repeat}):")
+    legacy = bench('campo por campo', legacy_detail_fields, details, repeat)
+    compiled = bench('extractor compilado', extract_detail_fields, details, repeat)
+    print(f"   Speedup: {legacy / compiled:.2f}x")
+
+    print(f"PII (mejor de {repeat}):")
+    legacy = bench('campo por campo', legacy_pii_fields, piis, repeat)
+    compiled = bench('extractor compilado', extract_pii_fields, piis, repeat)
+    print(f"   Speedup: {legacy / compiled:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
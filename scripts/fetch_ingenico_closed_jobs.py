@@ -5,6 +5,7 @@ Implementa el flujo POST de búsqueda → GET del listado manteniendo sesión pe
 """
 
 import os
+import sys
 import json
 import requests
 from bs4 import BeautifulSoup
@@ -20,6 +21,13 @@ logger = logging.getLogger(__name__)
 # Cargar variables de entorno
 load_dotenv()
 
+# app/ para el catálogo de ejecuciones (run_catalog.py), el motor de cobro (charge_engine.py)
+# y el parser del listado (closed_job_parser.py)
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+from charge_engine import apply_ingenico_charges
+from closed_job_parser import HEADER_ROW_CLASS, PAGER_ROW_CLASS, extract_grid_rows, resolve_parser
+from run_catalog import INGENICO_CLOSED_JOBS, record_run
+
 
 class IngenicoError(Exception):
     """Excepción base para errores de Ingenico"""
@@ -225,12 +233,14 @@ def get_job_list(session):
         raise IngenicoError(f"Error al obtener listado de trabajos: {e}")
 
 
-def parse_html_table(html_content):
+def parse_html_table(html_content, parser=None):
     """
     Parsea la tabla HTML del listado de trabajos cerrados.
 
     Args:
         html_content: str con el HTML crudo de la página
+        parser: 'auto', 'bs4', 'stream' o 'lxml' (default: INGENICO_HTML_PARSER o 'auto';
+                ver closed_job_parser.py, todos dan el mismo resultado)
 
     Returns:
         list[dict]: Lista de trabajos con todos los campos de la tabla
@@ -238,27 +248,23 @@ def parse_html_table(html_content):
     Raises:
         SessionExpiredError: Si no se encuentra la tabla (posible sesión expirada)
     """
-    logger.info("Parseando tabla HTML...")
-
-    soup = BeautifulSoup(html_content, 'html.parser')
+    parser = resolve_parser(parser)
+    logger.info(f"Parseando tabla HTML (parser {parser})...")
 
-    # Buscar tabla por ID
-    table = soup.find('table', {'id': 'ctl00_ContentPlaceHolder1_grdJob'})
+    # Filas de la tabla por ID
+    rows = extract_grid_rows(html_content, parser)
 
-    if not table:
+    if rows is None:
         logger.error("Tabla no encontrada - posible sesión expirada")
         raise SessionExpiredError("No se encontró la tabla de trabajos. La sesión puede haber expirado.")
 
     # Extraer headers dinámicamente
-    header_row = table.find('tr', {'class': 'FormGridHeaderCell'})
+    header_row = next((row for row in rows if HEADER_ROW_CLASS in row[0]), None)
     if not header_row:
         logger.error("No se encontró fila de headers")
         raise IngenicoError("Estructura de tabla inválida - no se encontraron headers")
 
-    headers = []
-    for th in header_row.find_all('td'):
-        header_text = th.get_text(strip=True)
-        headers.append(header_text)
+    headers = [header_text for header_text, _ in header_row[1]]
 
     logger.info(f"  Headers encontrados: {headers}")
 
@@ -266,13 +272,11 @@ def parse_html_table(html_content):
     jobs = []
     row_count = 0
 
-    for row in table.find_all('tr'):
+    for row_classes, cells in rows:
         # Saltar headers y paginación
-        row_classes = row.get('class', [])
-        if 'FormGridHeaderCell' in row_classes or 'FormGridPagerCell' in row_classes:
+        if HEADER_ROW_CLASS in row_classes or PAGER_ROW_CLASS in row_classes:
             continue
 
-        cells = row.find_all('td')
         if len(cells) == 0:
             continue
 
@@ -282,21 +286,19 @@ def parse_html_table(html_content):
 
         job_data = {}
 
-        for i, cell in enumerate(cells):
+        for i, (value, link_text) in enumerate(cells):
             if i >= len(headers):
                 break
 
             header_name = headers[i]
 
             # Extraer texto o link
-            link = cell.find('a')
-            if link and header_name == 'JobID':
-                job_data[header_name] = link.get_text(strip=True)
+            if link_text is not None and header_name == 'JobID':
+                job_data[header_name] = link_text
             elif header_name == 'Bulk':
                 # Skip checkbox column
                 continue
             else:
-                value = cell.get_text(strip=True)
                 # Convertir &nbsp; a string vacío
                 job_data[header_name] = value if value and value != '\xa0' else ''
 
@@ -344,6 +346,9 @@ def save_results(jobs_data, filters, timestamp):
         f.write(html_raw)
     logger.info(f"  ✓ HTML guardado: {html_file}")
 
+    # Area y Charge calculados una sola vez al guardar (el viewer los muestra desde el JSON)
+    apply_ingenico_charges(jobs_list)
+
     # Guardar JSON con metadata
     json_data = {
         'metadata': {
@@ -359,6 +364,10 @@ def save_results(jobs_data, filters, timestamp):
         json.dump(json_data, f, indent=2, ensure_ascii=False)
     logger.info(f"  ✓ JSON guardado: {json_file}")
 
+    # Registrar la descarga en el catálogo (/api/ingenico/list-downloads no vuelve a leer este JSON)
+    record_run(INGENICO_CLOSED_JOBS, output_folder, total=len(jobs_list), html_file=html_file, json_file=json_file,
+               timestamp=timestamp, date_range=f"{filters['from_date']} - {filters['to_date']}")
+
     return {
         'success': True,
         'folder': str(output_folder),
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Servidor Aura local para pruebas: responde a las peticiones Header, Detail (getRecord) y PII (startFlow)
+con respuestas mínimas que tienen la misma estructura que las de Salesforce.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+# Permitir importar los módulos de app/ (igual que app.py)
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+
+
+def make_work_order_id(n):
+    return f"0WOSTUB{n:011d}"
+
+
+def detail_record(wo_id, n):
+    """Campos de un work order tal como los devuelve RecordGvpController/ACTION$getRecord."""
+    day = (n % 28) + 1
+    return {
+        'WorkOrder': {
+            'record': {
+                'fields': {
+                    'WorkOrderNumber': {'value': f"{n:08d}", 'displayValue': None},
+                    'Bank_Brand__r': {'value': None, 'displayValue': 'ANZ'},
+                    'Work_Order_Type__c': {'value': 'Install', 'displayValue': 'Install'},
+                    'Zone__c': {'value': 'Area 1', 'displayValue': 'Area 1'},
+                    'On_Site_Start_Time__c': {
+                        'value': f"2025-08-{day:02d}T05:46:00.000Z",
+                        'displayValue': f"{day:02d}/08/2025 3:46 PM"
+                    },
+                    'On_Site_End_Time__c': {'value': f"2025-08-{day:02d}T06:30:00.000Z", 'displayValue': None},
+                    'WorkType': {'value': None, 'displayValue': 'Move 5000'},
+                    'Status': {'value': 'Completed', 'displayValue': 'Completed'},
+                }
+            }
+        }
+    }
+
+
+class AuraStubHandler(BaseHTTPRequestHandler):
+    """Enruta por path: /header, /detail y /pii."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            self.handle_post()
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def handle_post(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        message = json.loads(form['message'][0])
+        self.server.request_count += 1
+        self.server.requests.append((self.path, len(message['actions'])))
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        if self.server.throttle_above and self.server.active > self.server.throttle_above:
+            self.send_response(429)
+            self.end_headers()
+            return
+
+        if self.server.take_failure(self.path):
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        if self.path.startswith('/detail') and len(message['actions']) > 1 and self.server.fail_batches:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        if self.path.startswith('/header'):
+            body = self.server.header_response(message)
+        elif self.path.startswith('/detail'):
+            body = self.server.detail_response(message)
+        elif self.path.startswith('/pii'):
+            body = self.server.pii_response(message)
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class AuraStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, total_records=25, fail_batches=False, delay=0, throttle_above=0):
+        """
+        Args:
+            fail_batches: Responder 500 a los POST de detalle con más de una action
+            delay: Segundos de espera antes de responder cada petición
+            throttle_above: Responder 429 cuando hay más de N peticiones simultáneas (0 = nunca)
+
+        fail_next[path] = N hace que los próximos N POST a ese path respondan 503.
+        """
+        super().__init__(('127.0.0.1', 0), AuraStubHandler)
+        self.total_records = total_records
+        self.fail_batches = fail_batches
+        self.delay = delay
+        self.throttle_above = throttle_above
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.fail_next = {}
+        self.request_count = 0
+        self.requests = []
+        self.ids = [make_work_order_id(n) for n in range(1, total_records + 1)]
+        self.modified = {}
+        self.undated = set()
+        # IDs cuya respuesta PII no trae outputVariables (respuesta que no se puede parsear)
+        self.empty_pii = set()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def take_failure(self, path):
+        """Consume una de las respuestas 503 programadas para el path (True si hay que fallar)."""
+        with self.lock:
+            for prefix, remaining in self.fail_next.items():
+                if path.startswith(prefix) and remaining > 0:
+                    self.fail_next[prefix] = remaining - 1
+                    return True
+        return False
+
+    def count(self, path):
+        """Número de POST recibidos en un path (ej: '/detail')."""
+        return sum(1 for request_path, _ in self.requests if request_path.startswith(path))
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def header_response(self, message):
+        params = message['actions'][1]['params']
+        offset = params.get('offset', 0)
+        page = self.ids[offset:offset + params['pageSize']]
+        return {
+            'actions': [{'id': action['id'], 'state': 'SUCCESS'} for action in message['actions']],
+            'context': {'globalValueProviders': [{}, {}, {'values': {'records': {
+                wo_id: self.list_view_record(wo_id) for wo_id in page
+            }}}]}
+        }
+
+    def list_view_record(self, wo_id):
+        """
+        Columnas de la list view de un work order (LastModifiedDate cambia al tocar self.modified).
+        Los IDs de self.undated no traen la columna On_Site_End_Time__c.
+        """
+        fields = {
+            'Id': {'value': wo_id},
+            'LastModifiedDate': {'value': self.modified.get(wo_id, '2025-08-01T00:00:00.000Z')},
+        }
+        if wo_id not in self.undated:
+            detail_fields = detail_record(wo_id, self.ids.index(wo_id) + 1)['WorkOrder']['record']['fields']
+            fields['On_Site_End_Time__c'] = detail_fields['On_Site_End_Time__c']
+        return {'WorkOrder': {'record': {'fields': fields}}}
+
+    def detail_response(self, message):
+        records = {}
+        actions = []
+        for action in message['actions']:
+            wo_id = action['params']['recordDescriptor'].split('.')[0]
+            records[wo_id] = detail_record(wo_id, self.ids.index(wo_id) + 1)
+            actions.append({'id': action['id'], 'state': 'SUCCESS', 'returnValue': None})
+        return {
+            'actions': actions,
+            'context': {'globalValueProviders': [{'type': '$Record', 'values': {'records': records, 'recordErrors': {}}}]}
+        }
+
+    def pii_response(self, message):
+        action = message['actions'][0]
+        wo_id = json.loads(action['params']['arguments'])[0]['value']
+        n = self.ids.index(wo_id) + 1
+        output_variables = [] if wo_id in self.empty_pii else [
+            {'name': 'WorkOrder', 'value': {'terminal_id_c__c': f"T{n:05d}", 'street__c': f"{n} King William St"}},
+            {'name': 'Account', 'value': {'City': 'Adelaide', 'PostalCode': '5000'}}
+        ]
+        return {
+            'actions': [{
+                'id': action['id'],
+                'state': 'SUCCESS',
+                'returnValue': {'response': {'outputVariables': output_variables}}
+            }]
+        }
+
+    def __enter__(self):
+        self.thread.start()
+        # Apuntar las variables de entorno de las peticiones a este servidor
+        self._previous_env = {
+            key: os.environ.get(key) for key in ('API_URL_HEADER', 'API_URL', 'API_URL_PII', 'HEADER_COOKIE_STRING')
+        }
+        os.environ['HEADER_COOKIE_STRING'] = 'sid=stub'
+        os.environ['API_URL_HEADER'] = f"{self.base_url}/header"
+        os.environ['API_URL'] = f"{self.base_url}/detail"
+        os.environ['API_URL_PII'] = f"{self.base_url}/pii"
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for key, value in self._previous_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        self.shutdown()
+        self.server_close()
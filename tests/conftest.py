@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+"""
+Configuración de pytest: los módulos de app/ se importan directamente (igual que app.py).
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
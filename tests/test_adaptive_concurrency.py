@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Pruebas del controlador AIMD de concurrencia (app/adaptive_concurrency.py).
+"""
+from aura_stub import AuraStubServer
+from adaptive_concurrency import AIMDController, percentile
+from generate_invoice import ThreadedFetchEngine
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.95) == 95
+    assert percentile([3.0], 0.95) == 3.0
+
+
+def test_grows_while_latency_is_stable():
+    controller = AIMDController(initial=4, minimum=1, maximum=6, window=5)
+    for _ in range(50):
+        controller.record(200, 0.1)
+
+    assert controller.limit == 6
+    assert controller.report()['p95_ms'] == 100
+
+
+def test_throttling_halves_once_per_in_flight_generation():
+    controller = AIMDController(initial=16, minimum=2, maximum=32, window=5)
+
+    # 16 peticiones en vuelo responden 429 a la vez: un solo retroceso
+    for _ in range(16):
+        controller.record(429, 0.1)
+    assert controller.limit == 8
+    assert controller.decreases == 1
+
+    controller.record(503, 0.1)
+    assert controller.limit == 4
+    controller.record(None, 0.1)
+    assert controller.limit == 4
+    assert controller.report()['throttled'] == 18
+
+
+def test_rising_p95_backs_off():
+    controller = AIMDController(initial=10, minimum=2, maximum=32, window=10)
+    for _ in range(10):
+        controller.record(200, 0.1)
+    assert controller.limit == 11
+
+    for _ in range(10):
+        controller.record(200, 0.5)
+    assert controller.limit == 5
+
+
+def test_client_respects_controller_limit(tmp_path):
+    controller = AIMDController(initial=3, minimum=1, maximum=3, window=5)
+    results = []
+
+    with AuraStubServer(total_records=20, delay=0.01) as server:
+        engine = ThreadedFetchEngine(max_workers=8, controller=controller)
+        try:
+            ids, _ = engine.fetch_all_work_order_ids(page_size=50)
+            engine.process_work_orders(ids, tmp_path, results.append)
+        finally:
+            engine.close()
+
+    assert server.max_active <= 3
+    assert all(result['success'] for result in results)
+    assert engine.concurrency_report()['limit'] == 3
+
+
+def test_throttled_server_lowers_limit(tmp_path):
+    controller = AIMDController(initial=8, minimum=1, maximum=8, window=5)
+
+    with AuraStubServer(total_records=30, delay=0.02, throttle_above=2):
+        engine = ThreadedFetchEngine(max_workers=8, controller=controller)
+        try:
+            ids, _ = engine.fetch_all_work_order_ids(page_size=50)
+            engine.process_work_orders(ids, tmp_path, lambda result: None)
+        finally:
+            engine.close()
+
+    report = engine.concurrency_report()
+    assert report['throttled'] > 0
+    assert report['limit'] < 8
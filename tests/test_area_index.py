@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Pruebas del índice de áreas por postcode (app/area_index.py).
+"""
+import json
+
+import pytest
+
+from area_index import DEFAULT_AREA_INDEX_PATH, AreaIndex, get_area_index, normalize_suburb, resolve_areas
+
+
+def test_default_index_matches_the_area_rules():
+    index = get_area_index()
+
+    assert get_area_index() is index
+    assert index.resolve('5110') == '2'
+    assert index.resolve('5252', 'Murray Bridge') == '3'
+    assert index.resolve('5000', 'Adelaide') == '1'
+    assert index.resolve('5019', 'Salisbury Heights') == '2'
+    assert index.resolve('5019', 'Salisbury') == '1'
+    # Misma regla que el includes() del viewer: basta con que el suburb contenga el de la excepción
+    assert index.resolve('5019', 'Salisbury Heights East') == '2'
+    assert index.resolve('5125', 'North Greenwith, SA') == '2'
+    assert index.resolve('', 'Greenwith') == ''
+
+
+@pytest.mark.parametrize('suburb, expected', [
+    ('GREENWITH', 'greenwith'),
+    ('  Salisbury   Heights ', 'salisbury heights'),
+    ('Salisbury Heights, SA 5019', 'salisbury heights'),
+    ("O'Halloran Hill", 'o halloran hill'),
+    (None, ''),
+])
+def test_suburb_normalization(suburb, expected):
+    assert normalize_suburb(suburb) == expected
+
+
+def test_bulk_resolve_keeps_order():
+    locations = [('5125', 'Greenwith SA'), ('5125', 'Golden Grove'), (' 5169 ', None), (None, None), ('5125', 'Greenwith SA')]
+    assert resolve_areas(locations) == ['2', '1', '2', '', '2']
+
+
+def test_index_with_thousands_of_postcodes():
+    spec = {
+        'default_area': '1',
+        'areas': {str(area): [f'{area}{n:03d}' for n in range(1000)] for area in range(2, 7)},
+        'suburb_overrides': [{'postcode': '2000', 'suburb': 'Sydney', 'area': '9'}],
+    }
+    index = AreaIndex(spec)
+
+    assert len(index) == 5000
+    assert index.resolve('6999') == '6'
+    assert index.resolve('2000', 'SYDNEY NSW') == '9'
+    assert index.resolve('2000', 'Haymarket') == '2'
+    assert index.resolve('9999') == '1'
+
+
+def test_postcode_in_two_areas_is_rejected():
+    spec = json.loads(DEFAULT_AREA_INDEX_PATH.read_text(encoding='utf-8'))
+    spec['areas']['3'].append('5110')
+    with pytest.raises(ValueError, match='5110'):
+        AreaIndex(spec)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Pruebas del motor asyncio contra el servidor Aura local (tests/aura_stub.py).
+"""
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from aura_stub import AuraStubServer
+from async_engine import AsyncFetchEngine
+from generate_invoice import ThreadedFetchEngine
+from raw_archive import read_raw_response
+
+
+def run_engine(engine, output_folder):
+    results = []
+    try:
+        ids, header_response = engine.fetch_all_work_order_ids(page_size=50)
+        engine.process_work_orders(ids, output_folder, results.append)
+    finally:
+        engine.close()
+    return ids, results
+
+
+def test_async_engine_matches_threaded_engine(tmp_path):
+    with AuraStubServer(total_records=30) as server:
+        async_ids, async_results = run_engine(AsyncFetchEngine(max_in_flight=8), tmp_path)
+        thread_ids, thread_results = run_engine(ThreadedFetchEngine(max_workers=4), tmp_path)
+
+    assert async_ids == server.ids
+    assert len(async_results) == 30
+    assert all(result['success'] for result in async_results)
+
+    # Mismo contrato de resultado que ThreadedFetchEngine
+    by_id = {result['wo_id']: result for result in thread_results}
+    for result in async_results:
+        assert result['total'] == 30
+        assert result['data'] == by_id[result['wo_id']]['data']
+
+    first = next(r for r in async_results if r['wo_id'] == server.ids[0])['data']
+    assert first['terminal_id'] == 'T00001'
+    assert first['postcode'] == '5000'
+    assert read_raw_response(tmp_path, 'pii', server.ids[0])
+
+
+def test_async_engine_bounds_in_flight_requests(tmp_path):
+    with AuraStubServer(total_records=20):
+        engine = AsyncFetchEngine(max_in_flight=3)
+        assert engine.client.max_in_flight == 3
+        ids, results = run_engine(engine, tmp_path)
+
+    assert sorted(result['index'] for result in results) == list(range(1, 21))
+
+
+def test_async_engine_batched_details(tmp_path):
+    with AuraStubServer(total_records=12) as server:
+        ids, results = run_engine(AsyncFetchEngine(max_in_flight=4, detail_batch_size=5), tmp_path)
+        detail_posts = server.count('/detail')
+
+    assert detail_posts == 3
+    assert len(results) == 12
+    assert all(result['success'] for result in results)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Pruebas del motor de cobro (app/charge_engine.py) y de su uso al generar el invoice / guardar Ingenico.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+from charge_engine import (
+    INGENICO, VERIFONE, apply_ingenico_charges, apply_verifone_charges, calculate_area, calculate_charge
+)
+from work_order_record import WorkOrder
+
+DATA_FOLDER = Path(__file__).parent.parent / 'data'
+
+
+def test_area_by_postcode_and_suburb():
+    assert calculate_area('5000', 'ADELAIDE') == '1'
+    assert calculate_area(' 5169 ') == '2'
+    assert calculate_area('5019', 'Salisbury Heights') == '2'
+    assert calculate_area('5019', 'Salisbury') == '1'
+    assert calculate_area('5125', 'GREENWITH') == '2'
+    assert calculate_area('5252', None) == '3'
+    assert calculate_area('', 'Adelaide') == ''
+    assert calculate_area(None) == ''
+
+
+@pytest.mark.parametrize('company, job, expected', [
+    (VERIFONE, dict(job_type='Install', fix='Completed'), 28.00),
+    (VERIFONE, dict(job_type='Install', fix='Cancelled'), 0.0),
+    (VERIFONE, dict(job_type='Install', fix='Scheduled'), 0.0),
+    (VERIFONE, dict(job_type='Install', fix='Completed', billable='No'), 0.0),
+    (VERIFONE, dict(job_type='Recovery', fix='Failed'), 10.00),
+    (VERIFONE, dict(job_type='Deinstallation', fix='Completed'), 10.00),
+    (VERIFONE, dict(job_type='COO Change', fix='Completed', area='3'), 28.00),
+    (VERIFONE, dict(job_type='Swap', fix='On Site', area='2', after_hour='YES', weekend='YES'), 120.00),
+    (VERIFONE, dict(job_type='Swap', fix='Completed', area='3', after_hour='YES', weekend='NO'), 140.00),
+    (VERIFONE, dict(job_type='Upgrade', fix='Completed', area='2', weekend='YES'), 50.00),
+    (VERIFONE, dict(job_type='Swap', fix='Completed', multiple_job_id='00000001'), 10.00),
+    (VERIFONE, dict(job_type='Other', fix='Completed', device_type='Move 5000'), 0.0),
+    (INGENICO, dict(job_type='INSTALL', device_type='INT POS'), 45.00),
+    (INGENICO, dict(job_type='INSTALL', device_type='INT POS', multiple_job_id='123'), 15.00),
+    (INGENICO, dict(job_type='2-Hour Swap', weekend='Yes'), 60.00),
+    (INGENICO, dict(job_type='Urgent', weekend='No'), 45.00),
+    (INGENICO, dict(job_type='Other', billable='Yes', area='3'), 55.00),
+    (INGENICO, dict(job_type='Other', billable=''), 0.0),
+])
+def test_charge_rules(company, job, expected):
+    assert calculate_charge(company, **job) == expected
+
+
+def test_verifone_records_get_area_and_charge():
+    records = [
+        WorkOrder(job_type='Install', fix='Completed', postcode='5110', suburb='Elizabeth', weekend='NO', after_hour='NO'),
+        WorkOrder(job_type='Install', fix='Completed', postcode='', weekend='YES', after_hour='YES'),
+        None,
+    ]
+    apply_verifone_charges(records)
+
+    assert (records[0]['area'], records[0]['charge']) == ('2', 35.00)
+    assert (records[1]['area'], records[1]['charge']) == ('', 90.00)
+
+
+def test_ingenico_closed_job_list_charges():
+    sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+    from fetch_ingenico_closed_jobs import parse_html_table
+
+    html = (DATA_FOLDER / 'Closed Job List.html').read_text(encoding='utf-8', errors='replace')
+    jobs = apply_ingenico_charges(parse_html_table(html))
+
+    assert jobs and all(job['Area'] in ('1', '2', '3', '') for job in jobs)
+    swap = next(job for job in jobs if job['JobID'] == '20251009975')
+    assert (swap['Area'], swap['Charge']) == ('1', 28.00)
+
+
+def test_calculate_charges_endpoint():
+    from app import app
+
+    client = app.test_client()
+    data = client.post('/api/calculate-charges', json={'company': INGENICO, 'jobs': [
+        {'job_type': 'SWAP', 'postcode': '5114', 'weekend': 'Yes', 'after_hour': 'No', 'billable': 'Yes'},
+        {'job_type': 'Recovery'},
+    ]}).get_json()
+    assert data['charges'] == [{'area': '3', 'charge': 85.00}, {'area': '', 'charge': 10.00}]
+
+    assert client.post('/api/calculate-charges', json={'company': 'other', 'jobs': []}).status_code == 400
+
+    # Valores no string en el JSON (números, booleanos, listas) se cobran como texto en lugar de dar 500
+    response = client.post('/api/calculate-charges', json={'company': VERIFONE, 'jobs': [
+        {'job_type': 'Install', 'postcode': 5000, 'suburb': ['Adelaide'], 'weekend': True, 'after_hour': False,
+         'billable': 1, 'fix': 'Completed'},
+        {'job_type': 7, 'device_type': None, 'billable': False, 'fix': True, 'multiple_job_id': 0},
+    ]})
+    assert response.status_code == 200
+    assert response.get_json()['charges'] == [{'area': '1', 'charge': 40.0}, {'area': '', 'charge': 0.0}]
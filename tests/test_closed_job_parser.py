@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los parsers del Closed Job List de Ingenico (app/closed_job_parser.py): mismo resultado
+que el árbol de BeautifulSoup.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+import closed_job_parser
+from closed_job_parser import extract_grid_rows, resolve_parser
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+from fetch_ingenico_closed_jobs import SessionExpiredError, parse_html_table  # noqa: E402
+
+SAMPLE = (Path(__file__).parent.parent / 'data' / 'Closed Job List.html').read_text(encoding='utf-8', errors='replace')
+
+PARSERS = ['stream', pytest.param('lxml', marks=pytest.mark.skipif(
+    closed_job_parser.lxml is None, reason='lxml no está instalado'))]
+
+# Filas anidadas, links, comentarios, script, &nbsp;, cierres que no corresponden y una segunda tabla
+MALFORMED = '''<html><body><table><tr><td>outer</td></tr></table><div>
+<table class="FormGrid" id="ctl00_ContentPlaceHolder1_grdJob">
+<tr class="FormGridPagerCell"><td><table><tr><td>1</td><td><a href="#">2</a></td></tr></table></td></tr>
+<tr class="FormGridHeaderCell"><td><a>JobID</a></td><td>Name</td><td>Bulk</td></tr>
+<tr><td><a href="#"> 123 </a> extra</td><td> A &amp; B <!-- c --> C<script>var td = "<td>";</script><br/>D&nbsp;</td>
+<td><input type=checkbox></td></tr>
+<tr class="FormGridAlternatingCell"><td>456</td><td>&nbsp;</td></tr>
+<tr><td><b>789</b></td><td><span>nested <i>deep</span> text</i></td><td></td></tr>
+<tr><td><a>1</a><a>2</a></td><td>x</span></td></tr>
+<tr><td>only</td></tr>
+</table></div><table id="ctl00_ContentPlaceHolder1_grdJob"><tr><td>second</td></tr></table></body></html>'''
+
+
+@pytest.mark.parametrize('parser', PARSERS)
+def test_sample_page_matches_beautifulsoup(parser):
+    expected = parse_html_table(SAMPLE, 'bs4')
+
+    assert len(expected) == 54
+    assert parse_html_table(SAMPLE, parser) == expected
+
+
+def test_stream_parser_follows_the_beautifulsoup_tree():
+    assert extract_grid_rows(MALFORMED, 'stream') == extract_grid_rows(MALFORMED, 'bs4')
+    jobs = parse_html_table(MALFORMED, 'stream')
+    # La fila anidada en la paginación (sin clase) también cuenta, igual que en el árbol
+    assert jobs[:2] == [{'JobID': '1', 'Name': '2'}, {'JobID': '123', 'Name': 'A & BCD'}]
+    assert jobs == parse_html_table(MALFORMED, 'bs4')
+
+
+@pytest.mark.parametrize('parser', ['bs4'] + PARSERS)
+def test_missing_table_is_a_session_error(parser):
+    with pytest.raises(SessionExpiredError):
+        parse_html_table('<html><body><form>Login</form></body></html>', parser)
+
+
+def test_parser_selection(monkeypatch):
+    monkeypatch.delenv('INGENICO_HTML_PARSER', raising=False)
+    assert resolve_parser() == 'stream'
+    monkeypatch.setenv('INGENICO_HTML_PARSER', 'BS4')
+    assert resolve_parser() == 'bs4'
+    assert resolve_parser('stream') == 'stream'
+    with pytest.raises(ValueError):
+        resolve_parser('html5lib')
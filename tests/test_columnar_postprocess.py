@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Pruebas del post-proceso columnar (app/columnar_postprocess.py): mismo resultado que el camino escalar.
+"""
+import copy
+import random
+
+import pytest
+
+import columnar_postprocess
+from columnar_postprocess import postprocess_work_orders, resolve_postprocess_mode
+from generate_invoice import calculate_after_hour, calculate_weekend, onsite_timestamp
+from work_order_record import WorkOrder
+
+
+def make_batch(count, seed=3):
+    rnd = random.Random(seed)
+    streets = ['1 King William St', '1  king william st ', '22 Rundle Mall', '', 'N/A', '5 North Tce']
+    batch = []
+    for n in range(count):
+        day = rnd.randint(1, 30)
+        hour = rnd.randint(1, 12)
+        onsite = rnd.choice([f"{day}/09/2025 {hour}:{rnd.randint(0, 59):02d} {rnd.choice(['AM', 'PM'])}", 'N/A', ''])
+        end_iso = rnd.choice([f"2025-09-{day:02d}T06:30:00.000Z", 'N/A', None, 'not-a-date'])
+        wo = WorkOrder(
+            job_id=f"{rnd.randint(1, count // 2 + 1):08d}",
+            onsite_datetime=onsite,
+            onsite_end_time_iso=end_iso,
+            onsite_start_time_iso=f"2025-09-{day:02d}T05:46:00.000Z",
+            street=rnd.choice(streets),
+            fix=rnd.choice(['Completed', 'On Site']),
+        )
+        # Registros antiguos (cache) sin onsite_timestamp / filter_date: None = "no calculado"
+        if rnd.random() < 0.8:
+            wo['onsite_timestamp'] = onsite_timestamp(WorkOrder(onsite_datetime=onsite))
+        if end_iso and end_iso.startswith('2025') and rnd.random() < 0.5:
+            wo['filter_date'] = f"2025-09-{day:02d}"
+        wo['after_hour'] = calculate_after_hour(onsite)
+        wo['weekend'] = calculate_weekend(onsite)
+        batch.append(wo)
+    batch.insert(count // 2, None)
+    return batch
+
+
+def run(batch, mode, date_from, date_to):
+    batch = copy.deepcopy(batch)
+    return [wo and dict(wo) for wo in postprocess_work_orders(batch, date_from, date_to, mode)]
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+@pytest.mark.parametrize('date_range', [(None, None), ('2025-09-05', '2025-09-20'), ('2025-09-20', 'bad')])
+def test_columnar_matches_scalar(monkeypatch, use_numpy, date_range):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(columnar_postprocess, 'np', None)
+
+    batch = make_batch(600)
+    scalar = run(batch, 'scalar', *date_range)
+    columnar = run(batch, 'columnar', *date_range)
+
+    assert columnar == scalar
+    assert any(wo and wo['multiple_job_id'] for wo in scalar)
+
+
+def test_flags_are_recomputed_in_bulk(monkeypatch):
+    monkeypatch.setattr(columnar_postprocess, 'np', None)
+    wo = WorkOrder(onsite_datetime='30/08/2025 11:15 PM', onsite_timestamp=None, after_hour='', weekend='')
+
+    postprocess_work_orders([wo], mode='columnar')
+
+    assert (wo['after_hour'], wo['weekend']) == ('YES', 'YES')
+
+
+def test_mode_selection(monkeypatch):
+    monkeypatch.setenv('POSTPROCESS_COLUMNAR_MIN', '100')
+    assert resolve_postprocess_mode('auto', 99) == 'scalar'
+    assert resolve_postprocess_mode(None, 100) == 'columnar'
+    assert resolve_postprocess_mode('Scalar', 10 ** 6) == 'scalar'
+    with pytest.raises(ValueError):
+        resolve_postprocess_mode('vector')
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Pruebas del pre-filtro por fecha con las columnas de la list view (antes de pedir el detalle).
+"""
+from aura_stub import AuraStubServer
+from generate_invoice import (
+    ThreadedFetchEngine,
+    fetch_work_order_id_page,
+    filter_by_date_range,
+    prefilter_ids_by_date_range,
+)
+
+DATE_FROM = '2025-08-05'
+DATE_TO = '2025-08-07'
+
+
+def run_engine(output_folder, on_page):
+    output_folder.mkdir()
+    results = []
+    engine = ThreadedFetchEngine(max_workers=4)
+    try:
+        engine.list_and_process_work_orders('', 50, 0, output_folder, on_page, results.append)
+    finally:
+        engine.close()
+    return [result['data'] for result in results if result['success']]
+
+
+def test_prefilter_keeps_in_range_and_undated_ids():
+    with AuraStubServer(total_records=20) as server:
+        server.undated.add(server.ids[0])
+        page_ids, json_response = fetch_work_order_id_page(page_size=50)
+
+    kept, dropped = prefilter_ids_by_date_range(page_ids, json_response, DATE_FROM, DATE_TO)
+
+    # Día del work order n = (n % 28) + 1 -> n = 4, 5, 6 caen entre el 5 y el 7 de agosto
+    assert kept == [server.ids[0], server.ids[3], server.ids[4], server.ids[5]]
+    assert dropped == 16
+    assert prefilter_ids_by_date_range(page_ids, json_response, None, None) == (page_ids, 0)
+    assert prefilter_ids_by_date_range(page_ids, None, DATE_FROM, DATE_TO) == (page_ids, 0)
+
+
+def test_prefilter_matches_post_filter_with_less_traffic(tmp_path):
+    with AuraStubServer(total_records=30) as server:
+        server.undated.add(server.ids[0])
+        full = run_engine(tmp_path / 'full', lambda ids, _: ids)
+        full_posts = server.count('/detail')
+
+        prefiltered = run_engine(
+            tmp_path / 'pre', lambda ids, response: prefilter_ids_by_date_range(ids, response, DATE_FROM, DATE_TO)[0]
+        )
+        prefiltered_posts = server.count('/detail') - full_posts
+
+    expected = filter_by_date_range(full, DATE_FROM, DATE_TO)
+    actual = filter_by_date_range(prefiltered, DATE_FROM, DATE_TO)
+
+    assert full_posts == 30
+    assert prefiltered_posts == 4
+    assert sorted(wo['job_id'] for wo in actual) == sorted(wo['job_id'] for wo in expected)
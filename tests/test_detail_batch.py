@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Pruebas del modo batch de getRecord (varias actions por POST) contra el servidor Aura local.
+"""
+from aura_stub import AuraStubServer
+from generate_invoice import ThreadedFetchEngine, split_batched_detail_response
+
+
+def run_engine(engine, ids, output_folder):
+    results = []
+    try:
+        engine.process_work_orders(ids, output_folder, results.append)
+    finally:
+        engine.close()
+    return {result['wo_id']: result for result in results}
+
+
+def test_batched_details_match_single_requests(tmp_path):
+    with AuraStubServer(total_records=23) as server:
+        single = run_engine(ThreadedFetchEngine(max_workers=4), server.ids, tmp_path)
+        single_posts = server.count('/detail')
+
+        server.requests.clear()
+        batched = run_engine(ThreadedFetchEngine(max_workers=4, detail_batch_size=10), server.ids, tmp_path)
+        batched_posts = server.count('/detail')
+
+    assert single_posts == 23
+    assert batched_posts == 3
+    assert sorted(r['index'] for r in batched.values()) == list(range(1, 24))
+    for wo_id, result in batched.items():
+        assert result['success']
+        assert result['data'] == single[wo_id]['data']
+
+
+def test_failed_batch_falls_back_to_single_requests(tmp_path):
+    with AuraStubServer(total_records=6, fail_batches=True) as server:
+        results = run_engine(ThreadedFetchEngine(max_workers=2, detail_batch_size=4), server.ids, tmp_path)
+
+    assert all(result['success'] for result in results.values())
+    # 2 batches fallidos + 6 peticiones individuales
+    assert server.count('/detail') == 8
+
+
+def test_split_batched_response_marks_failed_actions_for_retry():
+    batch_response = {
+        'actions': [{'id': '199;a', 'state': 'SUCCESS'}, {'id': '200;a', 'state': 'ERROR'}],
+        'context': {'globalValueProviders': [{
+            'type': '$Record',
+            'values': {'records': {'A': {'WorkOrder': {}}}, 'recordErrors': {}}
+        }]}
+    }
+    responses = split_batched_detail_response(batch_response, ['A', 'B'])
+
+    assert responses['B'] is None
+    values = responses['A']['context']['globalValueProviders'][0]['values']
+    assert values['records'] == {'A': {'WorkOrder': {}}}
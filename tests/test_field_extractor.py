@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los extractores compilados (app/field_extractor.py) contra la extracción campo por campo.
+"""
+import pytest
+
+from aura_stub import detail_record
+from field_extractor import (
+    DETAIL_FIELDS, DISPLAY, PII_FIELDS, VALUE,
+    compile_output_variables_extractor, compile_record_extractor, extract_detail_fields, extract_pii_fields
+)
+from generate_invoice import extract_field_display_value, extract_field_value, parse_pii_details, parse_work_order_data
+
+FIELD_SHAPES = [
+    {'value': 'X', 'displayValue': None},
+    {'value': 'X', 'displayValue': 'Shown'},
+    {'value': None, 'displayValue': None},
+    {'displayValue': None},
+    {'displayValue': 'Shown'},
+    {'value': 'X'},
+    {'value': {'fields': {'Name': {'value': 'CBA'}}}, 'displayValue': None},
+    {'value': {'fields': {'Name': 'CBA'}}, 'displayValue': None},
+    {'value': {'fields': {}}, 'displayValue': None},
+    'plain',
+    None,
+]
+
+
+def legacy_detail_fields(fields):
+    readers = {VALUE: extract_field_value, DISPLAY: extract_field_display_value}
+    return {column: readers[mode](fields, source) for column, source, mode in DETAIL_FIELDS}
+
+
+def test_detail_extractor_matches_field_by_field_extraction():
+    sources = list(dict.fromkeys(source for _, source, _ in DETAIL_FIELDS))
+    for i, shape in enumerate(FIELD_SHAPES):
+        # Cada campo con una forma distinta, y algunos ausentes
+        fields = {source: FIELD_SHAPES[(i + j) % len(FIELD_SHAPES)] for j, source in enumerate(sources) if (i + j) % 4}
+        assert extract_detail_fields(fields) == legacy_detail_fields(fields)
+
+    fields = detail_record('0WOSTUB1', 1)['WorkOrder']['record']['fields']
+    assert extract_detail_fields(fields) == legacy_detail_fields(fields)
+    assert extract_detail_fields({}) == {column: 'N/A' for column, _, _ in DETAIL_FIELDS}
+
+
+def test_new_column_is_a_mapping_entry():
+    extract = compile_record_extractor(DETAIL_FIELDS + (('billable', 'Billable__c', VALUE),))
+    fields = dict(detail_record('0WOSTUB1', 1)['WorkOrder']['record']['fields'], Billable__c={'value': 'Y'})
+
+    assert extract(fields)['billable'] == 'Y'
+    with pytest.raises(ValueError):
+        compile_record_extractor((('billable', 'Billable__c', 'label'),))
+
+
+def test_pii_extractor():
+    output_variables = [
+        {'value': {'terminal_id_c__c': 'T1', 'street__c': None}},
+        {'value': {'City': 'Adelaide'}},
+    ]
+    assert extract_pii_fields(output_variables) == {
+        'terminal_id': 'T1', 'merchant_name': '', 'suburb': 'Adelaide', 'postcode': '', 'street': ''
+    }
+    assert extract_pii_fields(output_variables[:1])['suburb'] == ''
+    assert not any(extract_pii_fields([]).values())
+
+    extract = compile_output_variables_extractor(PII_FIELDS + (('merchant_phone', 2, 'Phone'),))
+    assert extract(output_variables + [{'value': {'Phone': '08 1234'}}])['merchant_phone'] == '08 1234'
+
+
+def test_parsers_use_the_mapping():
+    wo_id = '0WOSTUB00000000003'
+    response = {'context': {'globalValueProviders': [
+        {'type': '$Record', 'values': {'records': {wo_id: detail_record(wo_id, 3)}, 'recordErrors': {}}}
+    ]}}
+    data = parse_work_order_data(response, wo_id)
+    assert (data['job_id'], data['client_id'], data['area'], data['filter_date']) == ('00000003', 'ANZ', 'Area 1', '2025-08-04')
+    assert data['onsite_start_time_iso'] == '2025-08-04T05:46:00.000Z'
+
+    pii_response = {'actions': [{'returnValue': {'response': {'outputVariables': [
+        {'value': {'terminal_id_c__c': 'T3', 'street__c': '3 King William St'}},
+        {'value': {'City': 'Adelaide', 'PostalCode': '5000'}},
+    ]}}}]}
+    assert parse_pii_details(pii_response, wo_id)['postcode'] == '5000'
+    assert parse_pii_details({'actions': [{'returnValue': None}]}, wo_id) == dict.fromkeys(
+        ('terminal_id', 'merchant_name', 'suburb', 'postcode', 'street'), '')
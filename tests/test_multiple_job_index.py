@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Pruebas del MultipleJobID incremental (MultipleJobIndex en app/generate_invoice.py).
+"""
+import random
+
+import generate_invoice
+from generate_invoice import MultipleJobIndex, calculate_multiple_job_ids
+from work_order_record import WorkOrder
+
+
+def make_jobs(count, seed):
+    rnd = random.Random(seed)
+    streets = ['1 King William St', ' 1 king  william st', '22 Rundle Mall', '', 'N/A']
+    return [
+        WorkOrder(job_id=f"{rnd.randint(1, count):06d}", street=rnd.choice(streets),
+                  onsite_timestamp=rnd.choice(['2025-09-01T09:00', '2025-09-01T18:30', '2025-09-02T10:00', '']))
+        for _ in range(count)
+    ]
+
+
+def test_location_key_is_kept_on_the_record():
+    jobs = [WorkOrder(job_id='002', onsite_timestamp='2025-09-01T09:00', street=' 1 King  William St'),
+            {'job_id': '001', 'onsite_datetime': '01/09/2025 3:00 PM', 'street': '1 king william st'},
+            WorkOrder(job_id='003', onsite_timestamp='', street='1 King William St')]
+
+    calculate_multiple_job_ids(jobs)
+
+    assert [job['location_key'] for job in jobs] == ['2025-09-01 1 king william st'] * 2 + ['']
+    assert [job['multiple_job_id'] for job in jobs] == ['001', '', '']
+
+
+def test_incremental_batches_match_full_grouping():
+    for seed in range(20):
+        full = make_jobs(60, seed)
+        calculate_multiple_job_ids(full)
+
+        batches = make_jobs(60, seed)
+        index = MultipleJobIndex()
+        for start in range(0, 60, 7):
+            index.add(batches[start:start + 7])
+
+        assert [job['multiple_job_id'] for job in batches] == [job['multiple_job_id'] for job in full]
+
+
+def test_append_only_updates_affected_groups(monkeypatch):
+    jobs = [
+        WorkOrder(job_id='005', onsite_timestamp='2025-09-01T09:00', street='1 King William St'),
+        WorkOrder(job_id='007', onsite_timestamp='2025-09-01T11:00', street='1 King William St'),
+        WorkOrder(job_id='009', onsite_timestamp='2025-09-01T11:00', street='22 Rundle Mall'),
+    ]
+    index = MultipleJobIndex(jobs)
+    assert [job['multiple_job_id'] for job in jobs] == ['', '005', '']
+
+    # Las claves ya guardadas no se vuelven a normalizar
+    normalized = []
+    monkeypatch.setattr(generate_invoice, 'normalize_address',
+                        lambda address: normalized.append(address) or address.lower())
+
+    newcomer = WorkOrder(job_id='003', onsite_timestamp='2025-09-01T16:00', street='1 King William St')
+    assert index.add([newcomer]) == {'2025-09-01 1 king william st'}
+    assert normalized == ['1 King William St']
+    assert [job['multiple_job_id'] for job in jobs + [newcomer]] == ['003', '003', '', '']
+
+    jobs[2]['multiple_job_id'] = 'untouched'
+    later = WorkOrder(job_id='008', onsite_timestamp='2025-09-01T17:00', street='1 King William St')
+    index.add([later])
+    assert (later['multiple_job_id'], jobs[2]['multiple_job_id']) == ('003', 'untouched')
+    assert len(index) == 2
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Pruebas del parseo único de OnSiteDateTime (generate_invoice.parse_onsite_datetime / onsite_timestamp).
+"""
+import random
+from datetime import datetime
+
+from generate_invoice import (
+    calculate_after_hour, calculate_multiple_job_ids, calculate_weekend, filter_by_date_range,
+    normalize_date_to_day, onsite_timestamp, parse_onsite_datetime, parse_work_order_data
+)
+
+
+def strptime_or_none(value):
+    try:
+        return datetime.strptime(value, '%d/%m/%Y %I:%M %p')
+    except ValueError:
+        return None
+
+
+def test_matches_strptime():
+    rnd = random.Random(7)
+    samples = ['26/08/2025 3:46 PM', '1/1/2025 12:00 AM', '31/12/2024 12:59 pm', '29/02/2023 1:00 PM',
+               '26/08/2025 13:46 PM', '26/08/2025 0:46 AM', '26/08/2025 3:46', '26-08-2025 3:46 PM',
+               '26/8/25 3:46 PM', ' 26/08/2025 3:46 PM', '26/08/2025 3:4 PM', '06/8/2025 03:46 PM']
+    # int() acepta estos campos pero strptime no
+    samples += ['+26/08/2025 3:46 PM', '2_6/08/2025 3:46 PM', '026/08/2025 3:46 PM', '26/08/2025 3:046 PM',
+                '26/08/2025 \uff13:46 PM', '26/008/2025 3:46 PM', '26/08/02025 3:46 PM', '26/08/2025 -3:46 PM',
+                '26/08/2025 3:+4 PM', '\u0662\u0666/08/2025 3:46 PM']
+    samples += [
+        f"{rnd.randint(0, 32)}/{rnd.randint(0, 13)}/{rnd.randint(2020, 2026)} "
+        f"{rnd.randint(0, 13)}:{rnd.randint(0, 60):02d} {rnd.choice(['AM', 'PM', 'pm', 'XM'])}"
+        for _ in range(2000)
+    ]
+
+    for value in samples:
+        assert parse_onsite_datetime(value) == strptime_or_none(value), value
+    assert parse_onsite_datetime('N/A') is None
+    assert parse_onsite_datetime('') is None
+
+
+def test_flags_accept_string_or_parsed_datetime():
+    saturday_night = '30/08/2025 11:15 PM'
+    parsed = parse_onsite_datetime(saturday_night)
+
+    assert calculate_after_hour(saturday_night) == calculate_after_hour(parsed) == 'YES'
+    assert calculate_weekend(saturday_night) == calculate_weekend(parsed) == 'YES'
+    assert calculate_after_hour('26/08/2025 6:00 AM') == 'NO'
+    assert calculate_weekend('N/A') == 'N/A'
+    assert normalize_date_to_day('26/08/2025 3:46 PM') == '2025-08-26'
+
+
+def detail_response(wo_id, onsite, end_iso):
+    fields = {
+        'WorkOrderNumber': {'value': wo_id},
+        'On_Site_Start_Time__c': {'value': '2025-08-26T05:46:00.000Z', 'displayValue': onsite},
+        'On_Site_End_Time__c': {'value': end_iso},
+        'Status': {'value': 'Completed', 'displayValue': 'Completed'},
+    }
+    return {'context': {'globalValueProviders': [
+        {'type': '$Record', 'values': {'records': {wo_id: {'WorkOrder': {'record': {'fields': fields}}}}}}
+    ]}}
+
+
+def test_parsed_once_and_reused_downstream():
+    wo = parse_work_order_data(detail_response('WO1', '26/08/2025 3:46 PM', '2025-08-27T01:00:00.000Z'), 'WO1')
+
+    assert wo['onsite_timestamp'] == '2025-08-26T15:46'
+    assert wo['filter_date'] == '2025-08-27'
+    assert onsite_timestamp(wo) == '2025-08-26T15:46'
+
+    # Registros guardados antes del cambio (cache): sin los campos precalculados
+    legacy = {key: value for key, value in wo.items() if key not in ('onsite_timestamp', 'filter_date')}
+    assert onsite_timestamp(legacy) == wo['onsite_timestamp']
+    assert filter_by_date_range([wo, legacy], '2025-08-27', '2025-08-27') == [wo, legacy]
+    assert filter_by_date_range([wo, legacy], '2025-08-01', '2025-08-26') == []
+
+
+def test_multiple_job_ids_use_parsed_day():
+    jobs = [
+        {'job_id': '002', 'onsite_timestamp': '2025-08-26T15:46', 'street': '1 King William St'},
+        {'job_id': '001', 'onsite_datetime': '26/08/2025 9:00 AM', 'street': ' 1 king  william st'},
+        {'job_id': '003', 'onsite_timestamp': '2025-08-27T15:46', 'street': '1 King William St'},
+        {'job_id': '004', 'onsite_timestamp': '', 'street': '1 King William St', 'multiple_job_id': 'X'},
+    ]
+
+    calculate_multiple_job_ids(jobs)
+
+    assert [job['multiple_job_id'] for job in jobs] == ['001', '', '', '']
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Pruebas del listado paginado de work orders (getItems con offset) contra el servidor Aura local.
+"""
+import pytest
+
+from aura_stub import AuraStubServer
+from generate_invoice import ThreadedFetchEngine, create_fetch_engine, fetch_all_work_order_ids, iter_work_order_id_pages
+
+
+def test_pages_walk_until_list_is_exhausted():
+    with AuraStubServer(total_records=120) as server:
+        pages = [page_ids for page_ids, _ in iter_work_order_id_pages(page_size=50)]
+        header_posts = server.count('/header')
+
+    assert [len(page) for page in pages] == [50, 50, 20]
+    assert sum(pages, []) == server.ids
+    assert header_posts == 3
+
+
+def test_max_records_caps_listing():
+    with AuraStubServer(total_records=120) as server:
+        ids, first_response = fetch_all_work_order_ids(page_size=50, max_records=70)
+
+    assert ids == server.ids[:70]
+    assert first_response is not None
+
+
+@pytest.mark.parametrize('detail_batch_size', [1, 8])
+def test_pages_are_processed_as_they_arrive(tmp_path, detail_batch_size):
+    pages_seen = []
+    results = []
+
+    def on_page(page_ids, json_response):
+        pages_seen.append(len(page_ids))
+        return page_ids[:30]
+
+    with AuraStubServer(total_records=95):
+        engine = ThreadedFetchEngine(max_workers=4, detail_batch_size=detail_batch_size)
+        try:
+            engine.list_and_process_work_orders('', 40, 0, tmp_path, on_page, results.append)
+        finally:
+            engine.close()
+
+    assert pages_seen == [40, 40, 15]
+    assert len(results) == 30 + 30 + 15
+    assert sorted(result['index'] for result in results) == list(range(1, 76))
+    assert all(result['success'] for result in results)
+
+
+@pytest.mark.parametrize('engine_name', ['threads', 'asyncio'])
+def test_should_stop_ends_listing_early(tmp_path, engine_name):
+    processed = []
+    results = []
+
+    def on_page(page_ids, json_response):
+        # Como MAX_WORK_ORDERS: solo los primeros 25 work orders
+        page_ids = page_ids[:25 - len(processed)]
+        processed.extend(page_ids)
+        return page_ids
+
+    with AuraStubServer(total_records=200) as server:
+        engine = create_fetch_engine(engine_name, 4)
+        try:
+            engine.list_and_process_work_orders('', 20, 0, tmp_path, on_page, results.append,
+                                                should_stop=lambda: len(processed) >= 25)
+        finally:
+            engine.close()
+        header_posts = server.count('/header')
+
+    assert processed == server.ids[:25]
+    assert len(results) == 25
+    assert header_posts == 2
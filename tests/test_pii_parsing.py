@@ -2,19 +2,19 @@
 """
 Script de prueba para verificar que parse_pii_details funciona correctamente
 """
-import json
 import sys
 from pathlib import Path
 
-# Leer el archivo raw_pii_response de prueba
-test_file = Path('VerifoneWorkOrders/invoice_20251101_174331_157/raw_pii_response_0WOVy00000BuY5VOAV.json')
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+from raw_archive import read_raw_response
 
-if not test_file.exists():
-    print(f"❌ No se encontró el archivo: {test_file}")
-    sys.exit(1)
+# Leer la respuesta PII de prueba (raw_responses.ndjson.gz o raw_pii_response_<id>.json en carpetas antiguas)
+test_folder = Path('VerifoneWorkOrders/invoice_20251101_174331_157')
+pii_response = read_raw_response(test_folder, 'pii', '0WOVy00000BuY5VOAV')
 
-with open(test_file, 'r') as f:
-    pii_response = json.load(f)
+if pii_response is None:
+    print(f"❌ No se encontró la respuesta PII en: {test_folder}")
+    sys.exit(1)
 
 print("=" * 70)
 print("TEST: Verificando extracción de datos PII")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Pruebas del pipeline de dos etapas (detalle → PII) contra el servidor Aura local.
+"""
+import pytest
+
+from aura_stub import AuraStubServer
+from generate_invoice import ThreadedFetchEngine
+
+
+def run_engine(engine, output_folder):
+    results = []
+    try:
+        ids, header_response = engine.fetch_all_work_order_ids(page_size=50)
+        engine.process_work_orders(ids, output_folder, results.append)
+    finally:
+        engine.close()
+    return results
+
+
+@pytest.mark.parametrize('pii_workers, pii_queue_size', [(1, 1), (2, 3), (8, None)])
+def test_stages_sized_independently_match_serial_processing(tmp_path, pii_workers, pii_queue_size):
+    with AuraStubServer(total_records=24) as server:
+        engine = ThreadedFetchEngine(max_workers=6, pii_workers=pii_workers, pii_queue_size=pii_queue_size)
+        results = run_engine(engine, tmp_path)
+        # Referencia: el mismo work order procesado solo, con un thread por etapa
+        serial = []
+        engine = ThreadedFetchEngine(max_workers=1, pii_workers=1)
+        try:
+            engine.process_work_orders([server.ids[5]], tmp_path, serial.append)
+        finally:
+            engine.close()
+        serial = serial[0]
+        pii_posts = server.count('/pii')
+
+    assert len(results) == 24
+    assert sorted(result['index'] for result in results) == list(range(1, 25))
+    assert all(result['success'] for result in results)
+    assert pii_posts == 24 + 1
+
+    by_id = {result['wo_id']: result for result in results}
+    assert by_id[server.ids[5]]['data'] == serial['data']
+    assert by_id[server.ids[5]]['data']['terminal_id'] == 'T00006'
+
+
+def test_async_pipeline_with_small_pii_stage(tmp_path):
+    pytest.importorskip('aiohttp')
+    from async_engine import AsyncFetchEngine
+
+    with AuraStubServer(total_records=18) as server:
+        results = run_engine(AsyncFetchEngine(max_in_flight=6, detail_batch_size=4,
+                                              pii_workers=2, pii_queue_size=2), tmp_path)
+
+    assert sorted(result['wo_id'] for result in results) == sorted(server.ids)
+    assert all(result['success'] for result in results)
+    assert all(result['data']['postcode'] == '5000' for result in results)
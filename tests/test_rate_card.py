@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Pruebas del tarifario (app/rate_card.py): tabla compilada, clasificación memoizada y recarga en caliente.
+"""
+import json
+import os
+
+import pytest
+
+from charge_engine import INGENICO, VERIFONE, apply_verifone_charges, calculate_charge
+from rate_card import DEFAULT_RATE_CARD_PATH, OTHER, RateCard, current_rate_card
+from work_order_record import WorkOrder
+
+
+def load_spec():
+    return json.loads(DEFAULT_RATE_CARD_PATH.read_text(encoding='utf-8'))
+
+
+def write_card(path, spec, mtime_ns):
+    path.write_text(json.dumps(spec), encoding='utf-8')
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_table_covers_every_key():
+    card = RateCard(load_spec())
+
+    assert card.rate(VERIFONE, 'service', True, True, '2', False) == 120.00
+    assert card.rate(VERIFONE, 'service', False, False, '2', True) == 10.00
+    assert card.rate(INGENICO, 'integrated', False, False, '1', True) == 15.00
+    assert card.rate(INGENICO, 'sla_2h', True, True, '3', True) == 60.00
+    assert card.rate(VERIFONE, 'billable', True, True, '3', False) == 55.00
+    # Área vacía o desconocida: default_area
+    assert card.rate(VERIFONE, 'service', False, False, '', False) == 28.00
+    assert len(card.table) == 2 * 8 * 4 * 3 * 2
+
+
+def test_classification_is_memoized_per_job_and_device_type():
+    card = RateCard(load_spec())
+
+    assert card.classify(INGENICO, 'INSTALL', 'INT POS') == 'integrated'
+    assert card.classify(VERIFONE, 'INSTALL', 'INT POS') == 'service'
+    assert card.classify(VERIFONE, 'COO Change', '') == 'coo'
+    assert card.classify(INGENICO, 'COO Change', '') == OTHER
+    assert len(card._classes) == 4
+
+    card.classify(INGENICO, 'INSTALL', 'INT POS')
+    assert len(card._classes) == 4
+
+
+def test_invalid_rate_card_is_rejected():
+    spec = load_spec()
+    del spec['rates']['coo']
+    with pytest.raises(ValueError, match='coo'):
+        RateCard(spec)
+
+    spec = load_spec()
+    del spec['rates']['service']['areas']['3']
+    with pytest.raises(ValueError, match='área 3'):
+        RateCard(spec)
+
+
+def test_rate_card_reloads_when_the_file_changes(tmp_path):
+    path = tmp_path / 'rate_card.json'
+    spec = load_spec()
+    write_card(path, spec, 1_000_000_000_000_000_000)
+
+    card = current_rate_card(path)
+    assert calculate_charge(VERIFONE, 'Recovery', fix='Completed', rate_card=card) == 10.00
+    assert current_rate_card(path) is card
+
+    spec['rates']['recovery']['charge'] = 12.5
+    write_card(path, spec, 1_000_000_001_000_000_000)
+    reloaded = current_rate_card(path)
+    assert reloaded is not card
+    assert calculate_charge(VERIFONE, 'Recovery', fix='Completed', rate_card=reloaded) == 12.50
+
+    # Un archivo inválido no reemplaza el tarifario vigente
+    path.write_text('{"areas": ', encoding='utf-8')
+    os.utime(path, ns=(1_000_000_002_000_000_000,) * 2)
+    assert current_rate_card(path) is reloaded
+
+
+def test_rate_card_path_from_environment(tmp_path, monkeypatch):
+    path = tmp_path / 'rate_card.json'
+    spec = load_spec()
+    spec['rates']['service']['areas']['2']['weekday'] = 36.0
+    write_card(path, spec, 1_000_000_000_000_000_000)
+    monkeypatch.setenv('RATE_CARD_PATH', str(path))
+
+    records = [WorkOrder(job_type='Install', fix='Completed', postcode='5110', suburb='Elizabeth',
+                         weekend='NO', after_hour='NO')]
+    apply_verifone_charges(records)
+    assert (records[0]['area'], records[0]['charge']) == ('2', 36.00)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Pruebas del archivo único de respuestas raw por ejecución (app/raw_archive.py).
+"""
+import gzip
+import json
+
+from raw_archive import (
+    ARCHIVE_NAME, INDEX_NAME, RawArchive, RawArchiveReader, convert_folder, read_raw_response
+)
+
+
+def response(wo_id, kind='detail'):
+    return {'actions': [{'state': 'SUCCESS', 'returnValue': {'id': wo_id, 'kind': kind}}]}
+
+
+def test_random_access_by_id_and_kind(tmp_path):
+    with RawArchive(tmp_path) as archive:
+        archive.append('header', 1, response('page1', 'header'))
+        for i in range(50):
+            archive.append('detail', f'WO{i}', response(f'WO{i}'))
+            archive.append('pii', f'WO{i}', response(f'WO{i}', 'pii'))
+        # Un reintento vuelve a guardar el mismo work order: gana el último
+        archive.append('pii', 'WO7', response('retry', 'pii'))
+
+    reader = RawArchiveReader(tmp_path)
+    assert len(reader) == 101
+    assert reader.get('pii', 'WO7') == response('retry', 'pii')
+    assert reader.get('raw_response', 'WO42') == response('WO42')
+    assert reader.get('header', '1') == response('page1', 'header')
+    assert ('detail', 'WO3') in reader
+    assert reader.get('detail', 'missing') is None
+    assert len(reader.keys('pii')) == 50
+
+
+def test_archive_is_plain_ndjson_gzip(tmp_path):
+    with RawArchive(tmp_path) as archive:
+        archive.append('detail', 'WO1', response('WO1'))
+    with RawArchive(tmp_path) as archive:
+        archive.append('pii', 'WO1', response('WO1', 'pii'))
+
+    with gzip.open(tmp_path / ARCHIVE_NAME, 'rt') as f:
+        records = [json.loads(line) for line in f]
+    assert [(record['kind'], record['id']) for record in records] == [('detail', 'WO1'), ('pii', 'WO1')]
+
+    # Sin índice el lector recorre el archivo completo
+    (tmp_path / INDEX_NAME).unlink()
+    assert RawArchiveReader(tmp_path).get('pii', 'WO1') == response('WO1', 'pii')
+
+
+def test_convert_legacy_folder(tmp_path):
+    (tmp_path / 'header.json').write_text(json.dumps(response('page1', 'header')), encoding='utf-8')
+    (tmp_path / 'header_2.json').write_text(json.dumps(response('page2', 'header')), encoding='utf-8')
+    (tmp_path / 'raw_response_WO1.json').write_text(json.dumps(response('WO1')), encoding='utf-8')
+    with gzip.open(tmp_path / 'raw_pii_response_WO1.json.gz', 'wt') as f:
+        json.dump(response('WO1', 'pii'), f)
+    (tmp_path / 'work_orders.json').write_text('[]', encoding='utf-8')
+
+    assert read_raw_response(tmp_path, 'raw_pii_response', 'WO1') == response('WO1', 'pii')
+    assert convert_folder(tmp_path, remove=True) == 4
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [INDEX_NAME, ARCHIVE_NAME, 'work_orders.json']
+    assert read_raw_response(tmp_path, 'header', 2) == response('page2', 'header')
+    assert read_raw_response(tmp_path, 'detail', 'WO1') == response('WO1')
+    assert read_raw_response(tmp_path, 'pii', 'WO1') == response('WO1', 'pii')
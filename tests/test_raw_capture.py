@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la política de captura de respuestas raw (app/raw_capture.py).
+"""
+import pytest
+
+from aura_stub import AuraStubServer
+from generate_invoice import ThreadedFetchEngine
+from raw_archive import ARCHIVE_NAME, RawArchiveReader
+from raw_capture import RawCapturePolicy
+
+
+def run_engine(tmp_path, capture, empty_pii=()):
+    with AuraStubServer(total_records=20) as server:
+        server.empty_pii.update(server.ids[i] for i in empty_pii)
+        engine = ThreadedFetchEngine(max_workers=4, capture=capture)
+        try:
+            ids, _ = engine.fetch_all_work_order_ids(page_size=50)
+            engine.process_work_orders(ids, tmp_path, lambda result: None)
+        finally:
+            engine.close()
+    return server
+
+
+def test_modes():
+    assert RawCapturePolicy('full').should_capture('detail', 'WO1')
+    assert not RawCapturePolicy('off').should_capture('detail', 'WO1', failed=True)
+    assert not RawCapturePolicy('errors-only').should_capture('pii', 'WO1')
+    assert RawCapturePolicy('errors').should_capture('pii', 'WO1', failed=True)
+
+    with pytest.raises(ValueError):
+        RawCapturePolicy('verbose')
+
+
+def test_sampling_is_stable_per_work_order():
+    policy = RawCapturePolicy('sampled', sample_every=4)
+    ids = [f'0WOVy{n:013d}' for n in range(400)]
+    sampled = [wo_id for wo_id in ids if policy.should_capture('detail', wo_id)]
+
+    assert 60 < len(sampled) < 140
+    assert all(policy.should_capture('pii', wo_id) for wo_id in sampled)
+    assert policy.report()['captured'] == 2 * len(sampled)
+
+
+def test_errors_mode_keeps_unparsable_responses(tmp_path):
+    capture = RawCapturePolicy('errors')
+    server = run_engine(tmp_path, capture, empty_pii=(3, 11))
+
+    keys = sorted(RawArchiveReader(tmp_path).keys())
+    assert keys == sorted(('pii', server.ids[i]) for i in (3, 11))
+    assert capture.report()['skipped'] == 38
+
+
+def test_off_mode_writes_nothing(tmp_path):
+    run_engine(tmp_path, RawCapturePolicy('off'), empty_pii=(0,))
+
+    assert not (tmp_path / ARCHIVE_NAME).exists()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Pruebas del escritor en segundo plano de respuestas raw (app/raw_writer.py).
+"""
+from aura_stub import AuraStubServer
+from generate_invoice import ThreadedFetchEngine, save_raw_response
+from raw_archive import ARCHIVE_NAME, INDEX_NAME, RawArchiveReader, read_raw_response
+from raw_capture import RawCapturePolicy
+from raw_writer import RawResponseWriter, get_raw_writer
+
+
+RESPONSE = {'actions': [{'state': 'SUCCESS', 'returnValue': {'id': 'WO1'}}]}
+
+
+def test_writer_appends_to_run_archive(tmp_path):
+    with RawResponseWriter(tmp_path) as writer:
+        assert get_raw_writer(tmp_path) is writer
+        save_raw_response(tmp_path, 'detail', 'WO1', RESPONSE)
+        save_raw_response(tmp_path, 'pii', 'WO1', RESPONSE)
+        save_raw_response(tmp_path, 'detail', 'WO2', None)
+
+    assert get_raw_writer(tmp_path) is None
+    assert writer.written == 2
+    assert sorted(RawArchiveReader(tmp_path).keys()) == [('detail', 'WO1'), ('pii', 'WO1')]
+    assert read_raw_response(tmp_path, 'detail', 'WO2') is None
+
+
+def test_without_writer_saves_synchronously(tmp_path):
+    save_raw_response(tmp_path, 'pii', 'WO1', RESPONSE)
+
+    assert read_raw_response(tmp_path, 'pii', 'WO1') == RESPONSE
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    writer = RawResponseWriter(tmp_path, queue_size=2)
+    # Sin arrancar el thread la cola no se vacía
+    for i in range(5):
+        writer.submit('detail', f'WO{i}', RESPONSE)
+
+    assert writer.dropped == 3
+    writer.start()
+    writer.close()
+    assert writer.written == 2
+
+
+def test_full_queue_keeps_failed_responses(tmp_path):
+    capture = RawCapturePolicy('full')
+    writer = RawResponseWriter(tmp_path, queue_size=1, capture=capture)
+    writer.submit('detail', 'WO0', RESPONSE)
+    # Sin thread escritor: la respuesta failed se guarda al cerrar en lugar de descartarse
+    writer.submit('detail', 'WO1', RESPONSE, failed=True)
+    writer.submit('detail', 'WO2', RESPONSE)
+    assert writer.dropped == 1 and capture.report()['dropped'] == 1
+
+    writer.start()
+    # Con el thread andando la respuesta failed espera lugar en la cola
+    for i in range(3, 50):
+        writer.submit('pii', f'WO{i}', RESPONSE, failed=True)
+    writer.close()
+
+    keys = set(RawArchiveReader(tmp_path).keys())
+    assert ('detail', 'WO1') in keys and ('detail', 'WO2') not in keys
+    assert all(('pii', f'WO{i}') in keys for i in range(3, 50))
+    assert writer.written == 49
+
+
+def test_engine_writes_raw_responses_in_background(tmp_path):
+    with AuraStubServer(total_records=8):
+        engine = ThreadedFetchEngine(max_workers=4)
+        try:
+            ids, _ = engine.fetch_all_work_order_ids(page_size=50)
+            engine.process_work_orders(ids, tmp_path, lambda result: None)
+        finally:
+            engine.close()
+
+    assert get_raw_writer(tmp_path) is None
+    # Un solo archivo (más su índice) en lugar de un raw_*.json por respuesta
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([ARCHIVE_NAME, INDEX_NAME])
+    for wo_id in ids:
+        assert read_raw_response(tmp_path, 'detail', wo_id)
+        assert read_raw_response(tmp_path, 'pii', wo_id)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Pruebas del replay offline de una ejecución archivada (app/replay_invoice.py).
+"""
+import replay_invoice as replay_module
+from aura_stub import AuraStubServer
+from generate_invoice import ThreadedFetchEngine, save_raw_response
+from raw_writer import RawResponseWriter
+from replay_invoice import archived_work_order_ids, load_archived_work_orders, replay_invoice
+
+
+def archive_run(run_folder, total_records=30, processed=None):
+    """
+    Ejecuta el motor contra el servidor local y retorna (ids del Header, datos de los work orders).
+    processed: cuántos work orders del Header se procesan (default: todos)
+    """
+    results = []
+    run_folder.mkdir(exist_ok=True)
+    with AuraStubServer(total_records=total_records):
+        engine = ThreadedFetchEngine(max_workers=4)
+        try:
+            ids, header_response = engine.fetch_all_work_order_ids(page_size=50)
+            engine.process_work_orders(ids[:processed], run_folder, results.append)
+        finally:
+            engine.close()
+
+    with RawResponseWriter(run_folder):
+        save_raw_response(run_folder, 'header', 1, header_response)
+    return ids, [result['data'] for result in results]
+
+
+def test_replay_matches_live_run_without_network(tmp_path):
+    ids, live_data = archive_run(tmp_path)
+
+    # El servidor ya no existe: el replay solo lee el archivo
+    assert archived_work_order_ids(tmp_path) == (ids, [])
+    replayed, missing = load_archived_work_orders(tmp_path, workers=2, chunk_size=7)
+
+    assert missing == []
+    key = lambda wo: wo['job_id']
+    assert sorted(replayed, key=key) == sorted(live_data, key=key)
+
+
+def test_replay_writes_invoice_html(tmp_path, monkeypatch):
+    monkeypatch.setenv('RUN_CATALOG_PATH', str(tmp_path / 'run_catalog.sqlite3'))
+    archive_run(tmp_path / 'run', total_records=10)
+
+    html_file = replay_invoice(tmp_path / 'run', output_folder=tmp_path / 'replay', workers=1)
+
+    assert html_file.parent == tmp_path / 'replay'
+    assert 'T00001' in html_file.read_text(encoding='utf-8')
+
+
+def test_replay_reports_header_ids_without_detail(tmp_path):
+    # Como una ejecución con el cache activo: parte de los work orders no tiene respuesta raw
+    ids, _ = archive_run(tmp_path, total_records=12, processed=8)
+
+    assert archived_work_order_ids(tmp_path) == (ids[:8], ids[8:])
+    replayed, missing = load_archived_work_orders(tmp_path, workers=1)
+    assert len(replayed) == 8
+    assert missing == ids[8:]
+
+
+def test_replay_loads_the_archive_index_once(tmp_path, monkeypatch):
+    archive_run(tmp_path, total_records=12, processed=8)
+    readers = []
+    original = replay_module.RawArchiveReader
+    monkeypatch.setattr(replay_module, 'RawArchiveReader', lambda folder: readers.append(folder) or original(folder))
+
+    replayed, missing = load_archived_work_orders(tmp_path, workers=1, chunk_size=3)
+
+    assert len(replayed) == 8 and len(missing) == 4
+    assert len(readers) == 1
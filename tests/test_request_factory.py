@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Pruebas de las plantillas de petición congeladas por ejecución (generate_invoice.AuraRequestFactory).
+"""
+import json
+from urllib.parse import parse_qs, urlparse
+
+from generate_invoice import AuraRequestFactory, build_get_record_action, request_factory_for
+
+
+WO_IDS = ['0WOVy00000FN582OAD', '0WOVy00000GP6nPOAT', '0WOVy00000FJtD3OAL']
+
+
+def set_env(monkeypatch, **values):
+    for key, value in values.items():
+        monkeypatch.setenv(key, value)
+
+
+def test_detail_request_splices_id(monkeypatch):
+    set_env(monkeypatch, API_URL='https://example/detail', REFERER_BASE_URL='https://example/wo/',
+            AURA_PAGE_URI_BASE='/s/workorder/', AURA_TOKEN='token', HEADER_COOKIE_STRING='sid=1')
+
+    url, headers, data = AuraRequestFactory().detail_request(WO_IDS[0])
+
+    assert url == 'https://example/detail'
+    assert headers['Referer'] == f'https://example/wo/{WO_IDS[0]}'
+    assert headers['Cookie'] == 'sid=1'
+    assert json.loads(data['message']) == {'actions': [build_get_record_action(WO_IDS[0])]}
+    assert data['aura.pageURI'] == f'/s/workorder/{WO_IDS[0]}'
+    assert data['aura.token'] == 'token'
+
+
+def test_batch_request_matches_single_actions(monkeypatch):
+    set_env(monkeypatch, HEADER_COOKIE_STRING='sid=1')
+
+    _, _, data = AuraRequestFactory().detail_batch_request(WO_IDS)
+
+    assert json.loads(data['message']) == {'actions': [
+        build_get_record_action(wo_id, action_id=f"{199 + i};a") for i, wo_id in enumerate(WO_IDS)
+    ]}
+
+
+def test_pii_request_has_unique_nonce(monkeypatch):
+    set_env(monkeypatch, ORIGIN_URL='https://example', FLOW_DEV_NAME='VF_Flow', HEADER_COOKIE_STRING='sid=1')
+    factory = AuraRequestFactory()
+
+    _, headers, data = factory.pii_request(WO_IDS[1])
+    _, _, other = factory.pii_request(WO_IDS[1])
+
+    query = parse_qs(urlparse(data['aura.pageURI']).query)
+    assert query['id'] == [WO_IDS[1]]
+    assert data['aura.pageURI'] != other['aura.pageURI']
+    assert headers['Referer'] == f"https://example{data['aura.pageURI']}"
+
+    params = json.loads(data['message'])['actions'][0]['params']
+    assert params['flowDevName'] == 'VF_Flow'
+    assert json.loads(params['arguments'])[0]['value'] == WO_IDS[1]
+
+
+def test_templates_are_frozen_for_the_run(monkeypatch):
+    set_env(monkeypatch, HEADER_COOKIE_STRING='sid=first', AURA_TOKEN='first')
+    factory = AuraRequestFactory()
+    _, headers, _ = factory.detail_request(WO_IDS[0])
+    headers['Cookie'] = 'mutated'
+
+    set_env(monkeypatch, HEADER_COOKIE_STRING='sid=second', AURA_TOKEN='second')
+    _, headers, data = factory.detail_request(WO_IDS[0])
+
+    assert headers['Cookie'] == 'sid=first'
+    assert data['aura.token'] == 'first'
+
+    # Sin fábrica de ejecución se usan las credenciales actuales
+    _, headers, _ = request_factory_for(None).detail_request(WO_IDS[0])
+    assert headers['Cookie'] == 'sid=second'
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Pruebas de reintentos, presupuesto, circuit breaker (app/resilience.py) y re-encolado de work orders.
+"""
+import time
+
+import pytest
+
+from aura_stub import AuraStubServer
+from generate_invoice import ThreadedFetchEngine
+from resilience import CircuitBreaker, RequestResilience, RetryBudget, RetryPolicy
+
+
+def run_engine(engine, output_folder):
+    results = []
+    try:
+        ids, _ = engine.fetch_all_work_order_ids(page_size=50)
+        engine.process_work_orders(ids, output_folder, results.append)
+    finally:
+        engine.close()
+    return results
+
+
+def fast_resilience(max_attempts=4):
+    return RequestResilience(policy=RetryPolicy(max_attempts=max_attempts, base_delay=0.01, max_delay=0.05))
+
+
+def test_backoff_is_bounded_and_jittered():
+    policy = RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=3)
+    delays = [policy.delay(attempt) for attempt in range(6) for _ in range(20)]
+
+    assert all(0 <= delay <= 3 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_budget_limits_retries():
+    budget = RetryBudget(ratio=0.5, min_tokens=2)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+
+    budget.deposit()
+    budget.deposit()
+    assert budget.try_spend()
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(error_rate=0.5, window=4, cooldown=0.05)
+    for success in (True, False, False, True):
+        breaker.record(success)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.wait_time() > 0
+
+    time.sleep(0.06)
+    pause, probe = breaker.admit()
+    assert pause == 0 and probe is not None
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record(True, probe)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_admits_a_single_probe():
+    breaker = CircuitBreaker(error_rate=0.5, window=2, cooldown=0.05)
+    breaker.record(False)
+    breaker.record(False)
+    time.sleep(0.06)
+
+    # La primera petición es la prueba; las demás esperan su resultado
+    pause, probe = breaker.admit()
+    assert pause == 0 and probe is not None
+    assert breaker.admit()[0] > 0 and breaker.admit()[0] > 0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record(False, probe)
+    assert breaker.state == CircuitBreaker.OPEN and breaker.wait_time() > 0
+
+    time.sleep(0.06)
+    stale_probe = breaker.admit()[1]
+    assert breaker.admit() == (CircuitBreaker.PROBE_POLL, None)
+    # Una prueba sin respuesta después del cooldown deja pasar otra
+    time.sleep(0.06)
+    pause, probe = breaker.admit()
+    assert pause == 0 and probe != stale_probe
+
+    # Solo cuenta la respuesta de la prueba vigente
+    breaker.record(True)
+    breaker.record(True, stale_probe)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(True, probe)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.admit() == (0, None)
+
+
+def test_open_breaker_ignores_in_flight_outcomes():
+    breaker = CircuitBreaker(error_rate=0.5, window=2, cooldown=0.05)
+    breaker.record(False)
+    breaker.record(False)
+    opened_at = breaker._opened_at
+
+    # Respuestas de peticiones que salieron antes de abrir: no reinician el cooldown
+    for _ in range(4):
+        breaker.record(False)
+    assert breaker.opened == 1 and breaker._opened_at == opened_at
+
+    time.sleep(0.06)
+    assert breaker.admit()[0] == 0
+
+
+def test_detail_batch_is_not_retried():
+    resilience = fast_resilience()
+    assert resilience.endpoint('detail_batch').policy.max_attempts == 1
+    assert resilience.endpoint('pii').policy.max_attempts == 4
+
+
+def test_transient_pii_errors_are_retried(tmp_path):
+    resilience = fast_resilience()
+
+    with AuraStubServer(total_records=10) as server:
+        server.fail_next['/pii'] = 3
+        results = run_engine(ThreadedFetchEngine(max_workers=4, resilience=resilience, requeue_limit=0), tmp_path)
+
+    assert all(result['data']['terminal_id'] for result in results)
+    assert resilience.report()['pii']['retries'] == 3
+
+
+@pytest.mark.parametrize('failing_path', ['/pii', '/detail'])
+def test_failed_items_are_requeued(tmp_path, monkeypatch, failing_path):
+    monkeypatch.setenv('WO_REQUEUE_DELAY', '0.01')
+
+    with AuraStubServer(total_records=10) as server:
+        server.fail_next[failing_path] = 4
+        engine = ThreadedFetchEngine(max_workers=4, requeue_limit=5)
+        results = run_engine(engine, tmp_path)
+
+    assert len(results) == 10
+    assert all(result['success'] and result['data']['terminal_id'] for result in results)
+    assert engine.requeued == 4
+
+
+def test_async_pipeline_requeues_pii(tmp_path, monkeypatch):
+    pytest.importorskip('aiohttp')
+    from async_engine import AsyncFetchEngine
+
+    monkeypatch.setenv('WO_REQUEUE_DELAY', '0.01')
+
+    with AuraStubServer(total_records=10) as server:
+        server.fail_next['/pii'] = 4
+        results = run_engine(AsyncFetchEngine(max_in_flight=4, requeue_limit=5), tmp_path)
+
+    assert len(results) == 10
+    assert all(result['data']['terminal_id'] for result in results)
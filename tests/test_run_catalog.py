@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Pruebas del catálogo de ejecuciones (app/run_catalog.py) y de los endpoints que lo usan.
+"""
+import json
+import shutil
+
+import pytest
+
+import run_catalog
+from run_catalog import INGENICO_CLOSED_JOBS, VERIFONE_INVOICE, RunCatalog
+from run_compaction import compact_run
+
+
+@pytest.fixture
+def catalog_env(tmp_path, monkeypatch):
+    """Catálogo y carpetas de ejecuciones aislados en tmp_path."""
+    folders = {VERIFONE_INVOICE: tmp_path / 'VerifoneWorkOrders', INGENICO_CLOSED_JOBS: tmp_path / 'closedJobIngenico'}
+    for kind, folder in folders.items():
+        folder.mkdir()
+        monkeypatch.setitem(run_catalog.RUN_FOLDERS, kind, folder)
+    monkeypatch.setenv('RUN_CATALOG_PATH', str(tmp_path / 'run_catalog.sqlite3'))
+    return folders
+
+
+def make_ingenico_download(base_folder, name, total_jobs):
+    folder = base_folder / name
+    folder.mkdir()
+    data = {'metadata': {'fetch_timestamp': name[:15], 'total_jobs': total_jobs,
+                         'filters': {'from_date': '01/10/25', 'to_date': '31/10/25'}}, 'jobs': []}
+    (folder / f'closed_jobs_{name}.json').write_text(json.dumps(data), encoding='utf-8')
+    (folder / f'closed_jobs_{name}.html').write_text('<html></html>', encoding='utf-8')
+    return folder
+
+
+def make_invoice(base_folder, name):
+    folder = base_folder / name
+    folder.mkdir()
+    html_file = folder / f'{name}.html'
+    html_file.write_text('<html></html>', encoding='utf-8')
+    return folder, html_file
+
+
+def test_backfills_existing_history_then_pages(catalog_env):
+    for day in range(1, 8):
+        make_ingenico_download(catalog_env[INGENICO_CLOSED_JOBS], f'2025110{day}_120000_01-10-25to31-10-25', day)
+
+    with RunCatalog() as catalog:
+        runs, total = catalog.list_runs(INGENICO_CLOSED_JOBS, limit=3, offset=0)
+        assert total == 7
+        assert [run['total'] for run in runs] == [7, 6, 5]
+        assert runs[0]['date_range'] == '01/10/25 - 31/10/25'
+
+        runs, _ = catalog.list_runs(INGENICO_CLOSED_JOBS, limit=3, offset=6)
+        assert [run['total'] for run in runs] == [1]
+
+    # Las carpetas nuevas ya no se indexan recorriendo el disco: se registran al terminar la ejecución
+    folder = make_ingenico_download(catalog_env[INGENICO_CLOSED_JOBS], '20251108_120000_01-10-25to31-10-25', 8)
+    with RunCatalog() as catalog:
+        assert catalog.list_runs(INGENICO_CLOSED_JOBS)[1] == 7
+        catalog.record_run(INGENICO_CLOSED_JOBS, folder, total=8)
+        assert catalog.list_runs(INGENICO_CLOSED_JOBS, limit=1)[0][0]['total'] == 8
+
+
+def test_latest_invoice_skips_runs_without_html(catalog_env):
+    base = catalog_env[VERIFONE_INVOICE]
+    older, older_html = make_invoice(base, 'invoice_2025-11-01T10-00-00-0')
+
+    with RunCatalog() as catalog:
+        assert catalog.latest(VERIFONE_INVOICE)['html_file'] == str(older_html.resolve())
+
+        newer, newer_html = make_invoice(base, 'invoice_2025-11-02T10-00-00-0')
+        catalog.record_run(VERIFONE_INVOICE, newer, total=3, html_file=newer_html)
+        failed = base / 'invoice_2025-11-03T10-00-00-0'
+        failed.mkdir()
+        catalog.record_run(VERIFONE_INVOICE, failed)
+
+        assert catalog.latest(VERIFONE_INVOICE)['folder'] == str(newer.resolve())
+
+
+def test_endpoints_answer_from_catalog(catalog_env):
+    from app import app
+
+    for day in range(1, 4):
+        make_ingenico_download(catalog_env[INGENICO_CLOSED_JOBS], f'2025110{day}_120000_01-10-25to31-10-25', day)
+    _, html_file = make_invoice(catalog_env[VERIFONE_INVOICE], 'invoice_2025-11-01T10-00-00-0')
+
+    client = app.test_client()
+    data = client.get('/api/ingenico/list-downloads?limit=2&offset=1').get_json()
+    assert data['success'] and data['total'] == 3
+    assert [download['total_jobs'] for download in data['downloads']] == [2, 1]
+    assert data['downloads'][0]['folder'] == '20251102_120000_01-10-25to31-10-25'
+
+    data = client.get('/api/get-latest-invoice').get_json()
+    assert data['file'] == str(html_file.resolve())
+
+    # Sin limit: todas las descargas, como antes del catálogo
+    data = client.get('/api/ingenico/list-downloads').get_json()
+    assert data['total'] == 3 and len(data['downloads']) == 3 and data['limit'] is None
+
+
+def test_list_runs_prunes_deleted_folders(catalog_env):
+    base = catalog_env[INGENICO_CLOSED_JOBS]
+    folders = [make_ingenico_download(base, f'2025110{day}_120000_01-10-25to31-10-25', day) for day in range(1, 4)]
+
+    with RunCatalog() as catalog:
+        assert catalog.list_runs(INGENICO_CLOSED_JOBS)[1] == 3
+
+        # Una carpeta borrada a mano desaparece del índice; una compactada se conserva
+        shutil.rmtree(folders[0])
+        compact_run(folders[1], month='2025-11')
+        runs, total = catalog.list_runs(INGENICO_CLOSED_JOBS)
+        assert total == 2
+        assert [run['total'] for run in runs] == [3, 2]
+
+
+def test_latest_invoice_looks_past_missing_runs(catalog_env):
+    base = catalog_env[VERIFONE_INVOICE]
+    _, html_file = make_invoice(base, 'invoice_2025-11-01T10-00-00-0')
+
+    with RunCatalog() as catalog:
+        catalog.latest(VERIFONE_INVOICE)
+        # Más de 5 ejecuciones posteriores cuyo HTML ya no existe
+        for day in range(2, 10):
+            folder = base / f'invoice_2025-11-0{day}T10-00-00-0'
+            catalog.record_run(VERIFONE_INVOICE, folder, html_file=folder / 'invoice.html')
+
+        assert catalog.latest(VERIFONE_INVOICE)['html_file'] == str(html_file.resolve())
+
+
+def test_compacted_runs_are_served_from_archive(catalog_env):
+    from app import app
+
+    downloads = [make_ingenico_download(catalog_env[INGENICO_CLOSED_JOBS], f'2025110{day}_120000_01-10-25to31-10-25', day)
+                 for day in range(1, 3)]
+    invoice, html_file = make_invoice(catalog_env[VERIFONE_INVOICE], 'invoice_2025-11-01T10-00-00-0')
+    html_file.write_text('<html>invoice</html>', encoding='utf-8')
+
+    client = app.test_client()
+    # Catálogo ya indexado antes de compactar (las rutas registradas dejan de existir)
+    assert client.get('/api/ingenico/list-downloads').get_json()['total'] == 2
+    assert client.get('/api/get-latest-invoice').status_code == 200
+
+    for folder in downloads + [invoice]:
+        compact_run(folder, month='2025-11')
+        assert not folder.exists()
+
+    data = client.get('/api/ingenico/list-downloads').get_json()
+    assert [download['total_jobs'] for download in data['downloads']] == [2, 1]
+    for download in data['downloads']:
+        response = client.get(download['json_url'])
+        assert response.status_code == 200 and response.mimetype == 'application/json'
+        assert response.get_json()['metadata']['total_jobs'] == download['total_jobs']
+        response = client.get(download['html_url'])
+        assert response.status_code == 200 and response.data == b'<html></html>'
+
+    data = client.get('/api/get-latest-invoice').get_json()
+    assert data['success'] and data['folder'] == str(invoice.resolve())
+    response = client.get(data['url'])
+    assert response.status_code == 200 and response.data == b'<html>invoice</html>'
+
+    assert client.get(f"/api/runs/{VERIFONE_INVOICE}/{invoice.name}/missing.html").status_code == 404
+    assert client.get(f"/api/runs/{VERIFONE_INVOICE}/_archive/index.json").status_code == 404
+    assert client.get(f"/api/runs/{VERIFONE_INVOICE}/{invoice.name}/../../run_catalog.sqlite3").status_code == 404
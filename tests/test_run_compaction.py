@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la compactación de ejecuciones antiguas (app/run_compaction.py).
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from aura_stub import AuraStubServer
+from generate_invoice import ThreadedFetchEngine, save_raw_response
+from raw_archive import read_raw_response
+from raw_writer import RawResponseWriter
+import replay_invoice
+from replay_invoice import load_archived_work_orders
+import run_catalog
+from run_catalog import INGENICO_CLOSED_JOBS, VERIFONE_INVOICE, RunCatalog
+from run_compaction import ARCHIVE_FOLDER, compact_base_folder, find_compacted_run, folder_size
+
+
+def age(folder, days=None, when=None):
+    past = when.timestamp() if when else time.time() - days * 86400
+    for path in [folder, *folder.rglob('*')]:
+        os.utime(path, (past, past))
+
+
+def archive_invoice_run(run_folder):
+    """Ejecución contra el servidor local: respuestas raw en el archivo + header.json antiguo + HTML."""
+    run_folder.mkdir(parents=True)
+    results = []
+    with AuraStubServer(total_records=12):
+        engine = ThreadedFetchEngine(max_workers=4)
+        try:
+            ids, header_response = engine.fetch_all_work_order_ids(page_size=50)
+            engine.process_work_orders(ids, run_folder, results.append)
+        finally:
+            engine.close()
+    with RawResponseWriter(run_folder):
+        save_raw_response(run_folder, 'header', 1, header_response)
+    (run_folder / 'header.json').write_text(json.dumps(header_response, indent=2), encoding='utf-8')
+    (run_folder / 'invoice.html').write_text('<html>invoice</html>', encoding='utf-8')
+    return ids, [result['data'] for result in results]
+
+
+def test_compacted_runs_stay_readable_and_deduplicated(tmp_path):
+    base = tmp_path / 'VerifoneWorkOrders'
+    ids, live_data = archive_invoice_run(base / 'invoice_2025-09-01T10-00-00-0')
+    archive_invoice_run(base / 'invoice_2025-09-02T10-00-00-0')
+    archive_invoice_run(base / 'invoice_2025-11-01T10-00-00-0')
+    for name in ('invoice_2025-09-01T10-00-00-0', 'invoice_2025-09-02T10-00-00-0'):
+        age(base / name, 60)
+    original = folder_size(base / 'invoice_2025-09-01T10-00-00-0')
+
+    stats = compact_base_folder(base, older_than_days=30)
+
+    assert stats['runs'] == 2
+    assert sorted(path.name for path in base.iterdir()) == [ARCHIVE_FOLDER, 'invoice_2025-11-01T10-00-00-0']
+    # La segunda ejecución repite las mismas respuestas: no agrega contenidos nuevos
+    assert stats['stored_bytes'] < original
+
+    compacted = base / 'invoice_2025-09-01T10-00-00-0'
+    assert read_raw_response(compacted, 'pii', ids[0])['actions']
+    assert find_compacted_run(compacted).read_bytes('invoice.html') == b'<html>invoice</html>'
+    replayed, missing = load_archived_work_orders(compacted, workers=1)
+    assert missing == []
+    key = lambda wo: wo['job_id']
+    assert sorted(replayed, key=key) == sorted(live_data, key=key)
+
+
+def test_replay_cli_accepts_compacted_run(tmp_path, monkeypatch):
+    monkeypatch.setenv('RUN_CATALOG_PATH', str(tmp_path / 'run_catalog.sqlite3'))
+    base = tmp_path / 'VerifoneWorkOrders'
+    run_folder = base / 'invoice_2025-09-01T10-00-00-0'
+    archive_invoice_run(run_folder)
+    age(run_folder, 60)
+    compact_base_folder(base, older_than_days=30)
+    assert not run_folder.exists()
+
+    monkeypatch.setattr('sys.argv', ['replay_invoice.py', str(run_folder), '--workers', '1'])
+    replay_invoice.main()
+
+    html_files = list((base / 'invoice_2025-09-01T10-00-00-0_replay').glob('*.html'))
+    assert len(html_files) == 1
+    assert 'T00001' in html_files[0].read_text(encoding='utf-8')
+
+    monkeypatch.setattr('sys.argv', ['replay_invoice.py', str(base / 'invoice_2025-09-09T10-00-00-0')])
+    with pytest.raises(SystemExit):
+        replay_invoice.main()
+
+
+def test_catalog_indexes_compacted_downloads(tmp_path, monkeypatch):
+    base = tmp_path / 'closedJobIngenico'
+    folder = base / '20250901_120000_01-08-25to31-08-25'
+    folder.mkdir(parents=True)
+    metadata = {'fetch_timestamp': '20250901_120000', 'total_jobs': 4,
+                'filters': {'from_date': '01/08/25', 'to_date': '31/08/25'}}
+    (folder / 'closed_jobs.json').write_text(json.dumps({'metadata': metadata, 'jobs': []}, indent=2), encoding='utf-8')
+    (folder / 'closed_jobs.html').write_text('<table></table>', encoding='utf-8')
+    age(folder, 90)
+    compact_base_folder(base, older_than_days=30)
+    assert not folder.exists()
+
+    monkeypatch.setitem(run_catalog.RUN_FOLDERS, INGENICO_CLOSED_JOBS, base)
+    monkeypatch.setitem(run_catalog.RUN_FOLDERS, VERIFONE_INVOICE, tmp_path / 'missing')
+    with RunCatalog(tmp_path / 'catalog.sqlite3') as catalog:
+        runs, total = catalog.list_runs(INGENICO_CLOSED_JOBS)
+
+    assert total == 1
+    assert runs[0]['total'] == 4
+    assert runs[0]['date_range'] == '01/08/25 - 31/08/25'
+
+
+@pytest.mark.parametrize('budget_bytes, removed', [(10 ** 9, []), (1, ['2025-01'])])
+def test_disk_budget_drops_oldest_months(tmp_path, budget_bytes, removed):
+    base = tmp_path / 'closedJobIngenico'
+    for name in ('20250101_120000_a', '20250102_120000_b'):
+        folder = base / name
+        folder.mkdir(parents=True)
+        (folder / 'jobs.html').write_bytes(os.urandom(4096))
+        age(folder, when=datetime(2025, 1, 15))
+
+    dropped = []
+    stats = compact_base_folder(base, older_than_days=30, budget_bytes=budget_bytes, on_removed=dropped.append)
+
+    assert stats['removed_months'] == removed
+    if removed:
+        assert sorted(path.name for path in dropped) == ['20250101_120000_a', '20250102_120000_b']
+        assert find_compacted_run(base / '20250101_120000_a') is None
+    else:
+        assert find_compacted_run(base / '20250101_120000_a') is not None
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Pruebas del cache local de work orders (app/work_order_cache.py) contra el servidor Aura local.
+"""
+import time
+
+from aura_stub import AuraStubServer
+from generate_invoice import ThreadedFetchEngine
+from work_order_cache import WorkOrderCache, extract_work_order_signatures
+
+
+def list_and_process(cache, output_folder):
+    results = []
+    engine = ThreadedFetchEngine(max_workers=4, cache=cache)
+    try:
+        engine.list_and_process_work_orders('', 50, 0, output_folder, lambda ids, _: ids, results.append)
+    finally:
+        engine.close()
+    return results
+
+
+def test_freshness_policy(tmp_path):
+    with WorkOrderCache(tmp_path / 'cache.sqlite3', max_age_hours=1) as cache:
+        cache.put('WO1', 'LastModifiedDate=2025-08-01', {'job_id': '1'})
+        cache.put('WO2', None, {'job_id': '2'})
+        cache.put('WO4', 'Status=Completed', {'job_id': '4'})
+
+        assert cache.get('WO1', 'LastModifiedDate=2025-08-01') == {'job_id': '1'}
+        assert cache.get('WO1', 'LastModifiedDate=2025-08-02') is None
+        assert cache.get('WO2') == {'job_id': '2'}
+        assert cache.get('WO3') is None
+        assert cache.get('WO4', 'Status=Completed') == {'job_id': '4'}
+        assert cache.get('WO4', 'Status=Failed') is None
+
+        cache.max_age = 0
+        time.sleep(0.01)
+        assert cache.get('WO2') is None
+        # Con solo Status la firma no prueba que el registro no cambió: también vence
+        assert cache.get('WO4', 'Status=Completed') is None
+        assert cache.get('WO1', 'LastModifiedDate=2025-08-01') == {'job_id': '1'}
+        assert cache.report() == {'hits': 4, 'misses': 5, 'max_age_hours': 0}
+
+
+def test_warm_rerun_only_fetches_changed_records(tmp_path):
+    cache = WorkOrderCache(tmp_path / 'cache.sqlite3')
+    try:
+        with AuraStubServer(total_records=12) as server:
+            cold = list_and_process(cache, tmp_path)
+            cold_posts = server.count('/detail') + server.count('/pii')
+
+            server.modified[server.ids[3]] = '2025-08-20T10:00:00.000Z'
+            warm = list_and_process(cache, tmp_path)
+            warm_posts = server.count('/detail') + server.count('/pii') - cold_posts
+    finally:
+        cache.close()
+
+    assert cold_posts == 24
+    assert warm_posts == 2
+    assert all(result['success'] for result in warm)
+    by_id = {result['wo_id']: result['data'] for result in cold}
+    assert {result['wo_id']: result['data'] for result in warm} == by_id
+
+
+def test_process_work_orders_consults_cache(tmp_path):
+    with AuraStubServer(total_records=3) as server, WorkOrderCache(tmp_path / 'cache.sqlite3') as cache:
+        wo_id = server.ids[0]
+        results = []
+        engine = ThreadedFetchEngine(max_workers=1, cache=cache)
+        engine.signatures[wo_id] = 'v1'
+        try:
+            engine.process_work_orders([wo_id], tmp_path, results.append)
+            engine.process_work_orders([wo_id], tmp_path, results.append)
+        finally:
+            engine.close()
+        first, second = results
+        posts = len(server.requests)
+
+    assert posts == 2
+    assert second['data'] == first['data']
+    assert second['data']['terminal_id'] == 'T00001'
+
+
+def test_signatures_from_list_view():
+    response = {'context': {'globalValueProviders': [{}, {}, {'values': {'records': {
+        'WO1': {'WorkOrder': {'record': {'fields': {'LastModifiedDate': {'value': '2025-08-01'},
+                                                    'Status': {'value': 'Completed'}}}}},
+        'WO2': {},
+    }}}]}}
+
+    assert extract_work_order_signatures(response) == {'WO1': 'LastModifiedDate=2025-08-01|Status=Completed', 'WO2': None}
+    assert extract_work_order_signatures({}) == {}
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Pruebas del registro compacto de work orders (app/work_order_record.py).
+"""
+import json
+import pickle
+
+import pytest
+
+from aura_stub import AuraStubServer
+from generate_invoice import ThreadedFetchEngine
+from work_order_cache import WorkOrderCache
+from work_order_record import FIELDS, WorkOrder
+
+
+def test_behaves_like_the_original_dict():
+    data = {field: '' for field in FIELDS}
+    data.update(job_id='00012345', area='Metro', is_onsite=True, onsite_timestamp='2025-08-26T15:46')
+    wo = WorkOrder.from_dict(data)
+
+    assert wo == data
+    assert list(wo) == list(data)
+    assert wo['area'] == 'Metro' and wo.get('missing', 'x') == 'x'
+    assert 'job_id' in wo and 'missing' not in wo
+
+    wo['suburb'] = 'Adelaide'
+    wo['charge_notes'] = 'extra'
+    assert dict(wo)['charge_notes'] == 'extra'
+    assert len(wo) == len(FIELDS) + 1
+    del wo['charge_notes']
+    with pytest.raises(KeyError):
+        del wo['job_id']
+    with pytest.raises(AttributeError):
+        wo.__dict__
+
+
+def test_legacy_records_get_uncomputed_defaults():
+    wo = WorkOrder.from_dict({'job_id': '1', 'onsite_datetime': '26/08/2025 3:46 PM'})
+
+    assert wo['onsite_timestamp'] is None and wo['filter_date'] is None
+    assert wo['is_onsite'] is False and wo['fsp'] == ''
+
+
+def test_categorical_values_are_shared():
+    first = WorkOrder(area=''.join(['Me', 'tro']), job_type=''.join(['Ins', 'tall']))
+    second = WorkOrder(area=''.join(['Met', 'ro']), job_type=''.join(['Inst', 'all']))
+
+    assert first['area'] is second['area']
+    assert first['job_type'] is second['job_type']
+
+
+def test_pickle_and_cache_round_trip(tmp_path):
+    wo = WorkOrder(job_id='1', area='Metro', note='extra')
+    assert pickle.loads(pickle.dumps(wo)) == wo
+
+    with WorkOrderCache(tmp_path / 'cache.sqlite3') as cache:
+        cache.put('WO1', 'sig', wo)
+        cached = cache.get('WO1', 'sig')
+    assert cached == json.loads(json.dumps(dict(wo)))
+    assert WorkOrder.from_dict(cached) == wo
+
+
+def test_engine_results_are_work_orders(tmp_path):
+    results = []
+    with AuraStubServer(total_records=5):
+        engine = ThreadedFetchEngine(max_workers=2)
+        try:
+            ids, _ = engine.fetch_all_work_order_ids(page_size=50)
+            engine.process_work_orders(ids, tmp_path, results.append)
+        finally:
+            engine.close()
+
+    assert all(isinstance(result['data'], WorkOrder) for result in results)
+    assert all(result['data']['terminal_id'] for result in results)